@@ -1,35 +1,135 @@
-from flask import Flask, request, jsonify
+"""
+The Transparency Ledger API.
+
+``create_app()`` builds a configured application without touching the
+database; all routes live on the ``api`` blueprint. Creating tables, the
+search index and the default admin is an explicit step:
+
+    flask --app app bootstrap
+
+``python app.py`` bootstraps and then starts the development server.
+``from app import app`` still works and builds a default application on
+first access.
+"""
+
+import os
+import threading
+import re
+from datetime import datetime
+from decimal import Decimal
+from itertools import chain
+
+import click
+from flask import Flask, Blueprint, current_app, request, jsonify, Response, g
+from flask.cli import with_appcontext
 from flask_cors import CORS
-from models import db, User, Department, Transaction, UserRole, TransactionStatus
-from utils import compute_transaction_hash, hash_password, verify_password
+from sqlalchemy.orm import aliased
+
+from models import db, User, Department, Transaction, UserRole, TransactionStatus, Feedback, FeedbackSummary, is_anomalous
+from utils import hash_transaction, hash_password, verify_password, DEFAULT_HASH_VERSION, LEGACY_HASH_VERSION
 from local_auth import jwt_required, get_current_user, generate_token
-import uuid
-from datetime import datetime, timedelta
-from functools import wraps
-import logging
-import re
-import requests
-import os
-from models import Feedback
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from query_metrics import init_query_metrics
+from ratelimit import init_rate_limits, DEFAULT_LIMITS, DEFAULT_MAX_INFLIGHT, DEFAULT_MAX_QUEUE_MS
+from profiling import init_profiling, list_profiles, profile_path, hot_functions, DEFAULT_KEEP as DEFAULT_PROFILE_KEEP
+from search import ensure_search_index, search_supported, search, SearchError
+from ledger_archive import iter_archived_transactions, archived_totals, ArchiveError
+from dashboard import department_balances, cached_summary, install_cache_invalidation, DEFAULT_CACHE_TTL
+from rollups import install_rollup_listeners, timeseries, department_balance, exceeds_budget, RollupError
+from inbox import headed_departments, pending_inbox, InboxError
+from transaction_list import list_transactions, TransactionListError, FILTERS as TRANSACTION_FILTERS
+from ledger_chain import chain_head, lock_chain, verify_ledger, ChainError
+from blockchain_client import anchor_payload, anchor_transaction, anchor_batch, BlockchainError, MAX_BATCH
+from approvals import prepare_approval, complete_approval, ApprovalError
+from reconcile import open_issues as open_reconciliation_issues
+from listing import list_rows, USERS, DEPARTMENTS, ListingError
+from feedback import (init_feedback, save_feedback, bulk_feedback, parse_ids, feedback_json, summary_fields, transaction_exists,
+                      FeedbackError, DEFAULT_BATCH_SIZE as DEFAULT_FEEDBACK_BATCH_SIZE, DEFAULT_FLUSH_MS as DEFAULT_FEEDBACK_FLUSH_MS)
+from snapshots import snapshot_response, page_payload, load_manifest, install_snapshot_publisher, publish as publish_snapshots, DEFAULT_PAGE_SIZE, DEFAULT_DEBOUNCE, DEFAULT_MAX_DELAY
+from cache import init_cache, DEFAULT_TTL as DEFAULT_LOOKUP_TTL, cached_user, cached_department, cached_headed_department
+
+DEFAULT_ADMIN_EMAIL = 'admin@transparency.com'
+
+api = Blueprint('api', __name__)
+
+def create_app(config=None):
+    """
+    Build and configure a Flask application.
+
+    Does no database I/O, so it is cheap to call in every worker, test and
+    CLI tool. Run ``bootstrap_database()`` (or ``flask --app app
+    bootstrap``) once to create the schema and the default admin.
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///transparency_ledger.db'  # Using SQLite for simplicity
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
+    Args:
+        config: Optional dict of settings applied after the defaults
 
-db.init_app(app)
-CORS(app)
+    Returns:
+        The Flask application
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///transparency_ledger.db')  # Using SQLite for simplicity
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
+    app.config['LEDGER_HASH_VERSION'] = int(os.environ.get('LEDGER_HASH_VERSION', DEFAULT_HASH_VERSION))  # 2 = SHA-256, 3 = BLAKE2b
+    app.config['LEDGER_VERIFY_WORKERS'] = int(os.environ.get('LEDGER_VERIFY_WORKERS', 4))  # Shards verified concurrently in sharded mode
+    app.config['DASHBOARD_CACHE_TTL'] = int(os.environ.get('DASHBOARD_CACHE_TTL', DEFAULT_CACHE_TTL))  # Seconds a dashboard summary is reused
+    app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'lru')  # lru, redis, local or none (see cache.py)
+    app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', DEFAULT_LOOKUP_TTL))  # Seconds a cached user/department is reused
+    if os.environ.get('CACHE_REDIS_URL'):
+        app.config['CACHE_REDIS_URL'] = os.environ['CACHE_REDIS_URL']
+    app.config['PUBLIC_SNAPSHOTS'] = os.environ.get('PUBLIC_SNAPSHOTS', 'true').lower() == 'true'  # Serve public views from snapshots.py files
+    app.config['SNAPSHOT_PAGE_SIZE'] = int(os.environ.get('SNAPSHOT_PAGE_SIZE', DEFAULT_PAGE_SIZE))
+    app.config['SNAPSHOT_DEBOUNCE'] = float(os.environ.get('SNAPSHOT_DEBOUNCE', DEFAULT_DEBOUNCE))  # Quiet seconds before republishing
+    app.config['SNAPSHOT_MAX_DELAY'] = float(os.environ.get('SNAPSHOT_MAX_DELAY', DEFAULT_MAX_DELAY))  # Longest a write waits to be published
+    if os.environ.get('SNAPSHOT_DIR'):
+        app.config['SNAPSHOT_DIR'] = os.environ['SNAPSHOT_DIR']
+    app.config['RATE_LIMIT_STORE'] = os.environ.get('RATE_LIMIT_STORE', 'sqlite')  # sqlite (shared by workers) or memory
+    app.config['RATE_LIMIT_CHATBOT'] = os.environ.get('RATE_LIMIT_CHATBOT', DEFAULT_LIMITS['chatbot'])  # Per client IP, e.g. 5/minute or off
+    app.config['RATE_LIMIT_FEEDBACK'] = os.environ.get('RATE_LIMIT_FEEDBACK', DEFAULT_LIMITS['feedback'])
+    app.config['SHED_CHATBOT_INFLIGHT'] = int(os.environ.get('SHED_CHATBOT_INFLIGHT', DEFAULT_MAX_INFLIGHT['chatbot']))  # Per process, 0 = no cap
+    app.config['SHED_FEEDBACK_INFLIGHT'] = int(os.environ.get('SHED_FEEDBACK_INFLIGHT', DEFAULT_MAX_INFLIGHT['feedback']))
+    app.config['SHED_MAX_QUEUE_MS'] = float(os.environ.get('SHED_MAX_QUEUE_MS', DEFAULT_MAX_QUEUE_MS))  # Needs a proxy sending X-Request-Start
+    app.config['PROXY_HOPS'] = int(os.environ.get('PROXY_HOPS', 0))  # Proxies appending to X-Forwarded-For
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # Fraction of requests profiled, 0 = only X-Profile
+    app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', DEFAULT_PROFILE_KEEP))  # Newest .prof files kept
+    if os.environ.get('PROFILE_DIR'):
+        app.config['PROFILE_DIR'] = os.environ['PROFILE_DIR']
+    app.config['FEEDBACK_BUFFER'] = os.environ.get('FEEDBACK_BUFFER', 'true').lower() == 'true'  # Batch feedback commits (see feedback.py)
+    app.config['FEEDBACK_BATCH_SIZE'] = int(os.environ.get('FEEDBACK_BATCH_SIZE', DEFAULT_FEEDBACK_BATCH_SIZE))
+    app.config['FEEDBACK_FLUSH_MS'] = float(os.environ.get('FEEDBACK_FLUSH_MS', DEFAULT_FEEDBACK_FLUSH_MS))  # Longest a comment waits for its batch
+    app.config['FEEDBACK_WAIT'] = os.environ.get('FEEDBACK_WAIT', 'true').lower() == 'true'  # false = answer 202 once queued
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    CORS(app)
+    init_query_metrics(app)
+    init_rate_limits(app)
+    init_profiling(app)
+    install_rollup_listeners()
+    init_feedback(app)
+    install_cache_invalidation()
+    init_cache(app)
+    install_snapshot_publisher()
+    app.register_blueprint(api)
+    app.cli.add_command(bootstrap_command)
+    return app
 
-# Initialize database tables
-with app.app_context():
+def bootstrap_database():
+    """
+    Create missing tables, the search index and the default admin user,
+    and publish the public snapshots. Safe to run repeatedly. Must be
+    called inside an application context.
+    """
     db.create_all()
+    ensure_search_index()
     # Create default admin user if doesn't exist
     try:
-        existing_admin = User.query.filter_by(email='admin@transparency.com').first()
+        existing_admin = User.query.filter_by(email=DEFAULT_ADMIN_EMAIL).first()
         if not existing_admin:
             admin = User(
                 name='System Administrator',
-                email='admin@transparency.com',
+                email=DEFAULT_ADMIN_EMAIL,
                 password_hash=hash_password('admin123'),
                 role=UserRole.Admin
             )
@@ -38,10 +138,33 @@ with app.app_context():
     except Exception as e:
         # If there's an error (like missing columns), just create tables and continue
         print(f"Warning: Could not create default admin user: {e}")
-        pass
+    # Serve the public views from files from the first request on
+    if current_app.config['PUBLIC_SNAPSHOTS']:
+        publish_snapshots()
+
+@click.command('bootstrap')
+@with_appcontext
+def bootstrap_command():
+    """Create tables, the search index and the default admin user."""
+    bootstrap_database()
+    click.echo('Database bootstrapped.')
+
+_default_app = None
+_default_app_lock = threading.Lock()
+
+def __getattr__(name):
+    # ``from app import app`` builds the default application on first use
+    # instead of at import time.
+    global _default_app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+    return _default_app
 
 # Authentication Routes
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def register():
     try:
         data = request.get_json()
@@ -67,7 +190,7 @@ def register():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
@@ -94,28 +217,37 @@ def login():
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Public Routes (No authentication required)
-@app.route('/api/public/transactions', methods=['GET'])
+@api.route('/api/public/transactions', methods=['GET'])
 def get_public_transactions():
     """
     Get all transactions for public view (read-only)
     """
+    page = request.args.get('page', type=int)
+    snapshot = snapshot_response('public_transactions', page)
+    if snapshot:
+        return snapshot
     try:
-        transactions = Transaction.query.order_by(Transaction.created_at.desc()).all()
+        transactions = (
+            db.session.query(Transaction, FeedbackSummary)
+            .outerjoin(FeedbackSummary, FeedbackSummary.transaction_id == Transaction.transaction_id)
+            .order_by(Transaction.created_at.desc())
+            .all()
+        )
         result = []
         
-        for trans in transactions:
+        for trans, feedback_summary in transactions:
             # Get department info
-            department = Department.query.get(trans.dept_id) if trans.dept_id else None
+            department = cached_department(trans.dept_id)
 
             # Get fromDept and toDept
             # You already set fromDept and toDept when creating the transaction on the blockchain,
             # so you should store them in your Transaction model.
             # If not, you can reconstruct them here as below:
-            creator = User.query.get(trans.created_by_id)
+            creator = cached_user(trans.created_by_id)
             if creator and creator.role == UserRole.Admin:
                 from_dept = "Admin"
             elif creator and creator.role == UserRole.DeptHead:
-                headed_dept = Department.query.filter_by(head_user_id=creator.user_id).first()
+                headed_dept = cached_headed_department(creator.user_id)
                 from_dept = headed_dept.name if headed_dept else creator.name
             else:
                 from_dept = creator.name if creator else "Unknown"
@@ -131,9 +263,14 @@ def get_public_transactions():
                 "created_at": trans.created_at.isoformat(),
                 "transaction_hash": trans.blockchain_hash,
                 "rejection_reason": trans.rejection_reason,
-                "anomaly": trans.anomaly,
+                "anomaly": is_anomalous(trans),
+                "anomaly_score": trans.anomaly_score,
+                "anomaly_reasons": trans.anomaly_reasons,
+                **summary_fields(feedback_summary),
             })
         
+        if page:
+            return jsonify(page_payload('public_transactions', result, page, current_app.config['SNAPSHOT_PAGE_SIZE'])), 200
         return jsonify({
             "success": True,
             "transactions": result,
@@ -143,8 +280,21 @@ def get_public_transactions():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
     
+@api.route('/api/public/snapshot', methods=['GET'])
+def get_public_snapshot():
+    """
+    Manifest of the published public snapshots: generation, ledger head and pages per view
+    """
+    manifest = load_manifest()
+    if not manifest:
+        return jsonify({"success": False, "message": "No snapshot published"}), 404
+    # Bookkeeping for incremental publishes stays internal
+    views = {name: {k: v for k, v in entry.items() if k != "digests"} for name, entry in manifest["views"].items()}
+    return jsonify({"success": True, **{k: v for k, v in manifest.items() if k not in ("database", "verified")},
+                    "views": views}), 200
+
 # Protected User Profile Route
-@app.route('/api/profile', methods=['GET'])
+@api.route('/api/profile', methods=['GET'])
 @jwt_required
 def get_user_profile():
     """
@@ -152,7 +302,7 @@ def get_user_profile():
     """
     try:
         current_user_info = get_current_user()
-        user = User.query.get(current_user_info['user_id'])
+        user = cached_user(current_user_info['user_id'])
         
         if not user:
             return jsonify({"success": False, "message": "User not found"}), 404
@@ -172,13 +322,13 @@ def get_user_profile():
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Department Management Routes
-@app.route('/api/departments', methods=['POST'])
+@api.route('/api/departments', methods=['POST'])
 @jwt_required
 def create_department():
     try:
         data = request.get_json()
         current_user_info = get_current_user()
-        admin_user = User.query.get(current_user_info['user_id'])
+        admin_user = db.session.get(User, current_user_info['user_id'])
         if not admin_user or admin_user.role != UserRole.Admin:
             return jsonify({"success": False, "message": "Only admin can create departments"}), 403
 
@@ -233,49 +383,34 @@ def create_department():
         return jsonify({"success": False, "message": str(e)}), 500
     
 
-@app.route('/api/departments', methods=['GET'])
+@api.route('/api/departments', methods=['GET'])
 @jwt_required
 def get_departments():
+    """
+    List departments; ?fields=, ?sort= (name, created_at, -desc), ?limit= and ?cursor= (see listing.py)
+    """
     try:
-        departments = Department.query.all()
-        result = []
-        for dept in departments:
-            head_user = User.query.get(dept.head_user_id) if dept.head_user_id else None
-            result.append({
-                "dept_id": str(dept.dept_id),
-                "name": dept.name,
-                "description": dept.description,
-                "parent_dept_id": str(dept.parent_dept_id) if dept.parent_dept_id else None,
-                "head_user_id": str(dept.head_user_id) if dept.head_user_id else None,
-                "head_user_name": head_user.name if head_user else None,
-                "allocated_budget": float(dept.allocated_budget or 0),
-                "created_at": dept.created_at.isoformat()
-            })
+        page = list_rows(DEPARTMENTS, request.args.get('fields'), request.args.get('sort'),
+                         request.args.get('limit'), request.args.get('cursor'))
         # FIX: Return as {departments: [...]}
-        return jsonify({"departments": result, "success": True}), 200
+        return jsonify({"departments": page['items'], "next_cursor": page['next_cursor'], "success": True}), 200
+    except ListingError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
     
-@app.route('/api/departments/<dept_id>', methods=['GET'])
+@api.route('/api/departments/<dept_id>', methods=['GET'])
 def get_department(dept_id):
     try:
-        dept = Department.query.get(dept_id)
+        dept = cached_department(dept_id)
         if not dept:
             return jsonify({"success": False, "message": "Department not found"}), 404
         
-        head_user = User.query.get(dept.head_user_id) if dept.head_user_id else None
+        head_user = cached_user(dept.head_user_id)
         
         # Get sub-departments
-        sub_departments = Department.query.filter_by(parent_dept_id=dept.dept_id).all()
-        sub_dept_list = []
-        for sub_dept in sub_departments:
-            sub_head = User.query.get(sub_dept.head_user_id) if sub_dept.head_user_id else None
-            sub_dept_list.append({
-                "dept_id": str(sub_dept.dept_id),
-                "name": sub_dept.name,
-                "head_user_name": sub_head.name if sub_head else None,
-                "allocated_budget": float(sub_dept.allocated_budget or 0)
-            })
+        sub_dept_list = list_rows(DEPARTMENTS, "dept_id,name,head_user_name,allocated_budget",
+                                  where=Department.parent_dept_id == dept.dept_id)['items']
         
         result = {
             "dept_id": str(dept.dept_id),
@@ -293,39 +428,11 @@ def get_department(dept_id):
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Transaction Management Routes
-@app.route('/api/transactions', methods=['POST'])
+@api.route('/api/transactions', methods=['POST'])
 @jwt_required
 def create_transaction():
     try:
         data = request.get_json()
-        dept_id = data.get('dept_id')
-        if not dept_id:
-            return jsonify({"success": False, "message": "Department ID is required"}), 400
-
-        dept = Department.query.get(dept_id)
-        if not dept:
-            return jsonify({"success": False, "message": "Department not found"}), 400
-
-        # Calculate department's current balance
-        transactions = Transaction.query.filter(
-            Transaction.dept_id == dept_id,
-            Transaction.status.in_([TransactionStatus.Settled, TransactionStatus.Approved])
-        ).all()
-        dept_in = sum(float(tx.amount) for tx in transactions if tx.dept_id == dept_id)
-        dept_out = 0  # If you have outgoing logic, add here
-        current_balance = dept_in - dept_out
-
-        allocated_budget = float(dept.allocated_budget or 0)
-        amount = float(data['amount'])
-
-        # If spending more than budget, tag as anomaly and set status
-        is_anomaly = False
-        if amount > allocated_budget:
-            is_anomaly = True
-            status = TransactionStatus.Rejected  # Or create a new status "Anomaly"
-        else:
-            status = TransactionStatus.Pending
-        data = request.get_json()
         current_user_info = get_current_user()
         created_by_id = current_user_info['user_id']
 
@@ -333,41 +440,47 @@ def create_transaction():
         if not dept_id:
             return jsonify({"success": False, "message": "Department ID is required"}), 400
 
-        dept = Department.query.get(dept_id)
+        # Hold the chain's write lock from here to the commit, so the
+        # balance check, the head read and the insert see no concurrent append
+        lock_chain()
+        dept = db.session.get(Department, dept_id)
         if not dept:
             return jsonify({"success": False, "message": "Department not found"}), 400
 
-        creator = User.query.get(created_by_id)
+        creator = db.session.get(User, created_by_id)
         if not creator:
             return jsonify({"success": False, "message": "Creator user not found"}), 400
 
-        # Prepare transaction data (do NOT call blockchain yet)
-        if creator.role == UserRole.Admin:
-            fromDept = "Admin"
-        elif creator.role == UserRole.DeptHead:
-            headed_dept = Department.query.filter_by(head_user_id=creator.user_id).first()
-            fromDept = headed_dept.name if headed_dept else creator.name
-        else:
-            fromDept = creator.name
+        # Running balance from the maintained monthly rollups: the cost
+        # depends on the number of months, not on the department's history
+        current_balance = department_balance(dept_id)
 
-        toDept = dept.name
-        amount = float(data['amount'])
+        allocated_budget = float(dept.allocated_budget or 0)
+        amount = Decimal(str(data['amount'])).quantize(Decimal('0.0001'))
         purpose = data['purpose']
 
-        last_tx = Transaction.query.order_by(Transaction.created_at.desc()).first()
-        previous_hash = last_tx.current_hash if last_tx else ""
+        # If this spend takes the department past its budget, tag as anomaly and set status
+        is_anomaly = False
+        if exceeds_budget(current_balance, float(amount), allocated_budget):
+            is_anomaly = True
+            status = TransactionStatus.Rejected  # Or create a new status "Anomaly"
+        else:
+            status = TransactionStatus.Pending
+
+        # Global chain head, or the department's own chain in sharded mode
+        previous_hash, shard_id = chain_head(dept_id)
 
-        tx_data = {
-            "dept_id": str(dept_id),
-            "amount": str(amount),
+        # Hash exactly the values that are stored, so verification recomputes the same digest
+        created_at = datetime.utcnow()
+        hash_version = current_app.config['LEDGER_HASH_VERSION']
+        current_hash = hash_transaction({
+            "dept_id": dept_id,
+            "amount": amount,
             "purpose": purpose,
-            "status": "Pending",
-            "created_by_id": str(created_by_id),
-            "approved_by_id": "",
-            "invoice_url": "",
-            "created_at": datetime.utcnow().isoformat()
-        }
-        current_hash = compute_transaction_hash(tx_data, previous_hash)
+            "created_by_id": created_by_id,
+            "invoice_url": None,
+            "created_at": created_at
+        }, previous_hash, hash_version)
 
         transaction = Transaction(
             dept_id=dept_id,
@@ -377,8 +490,11 @@ def create_transaction():
             created_by_id=created_by_id,
             approved_by_id=None,
             invoice_url=None,
+            created_at=created_at,
             previous_hash=previous_hash,
             current_hash=current_hash,
+            hash_version=hash_version,
+            shard_id=shard_id,
             blockchain_hash=None,
             rejection_reason="Budget overrun" if is_anomaly else None,
             anomaly=is_anomaly
@@ -391,62 +507,68 @@ def create_transaction():
             "success": True,
             "transaction_id": transaction.transaction_id,
             "current_hash": current_hash,
+            "department_balance": current_balance,
             "message": "Transaction created and pending approval"
         }), 201
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
-@app.route('/api/transactions/<int:transaction_id>/approve', methods=['POST'])
+@api.route('/api/inbox', methods=['GET'])
 @jwt_required
-def approve_transaction(transaction_id):
+def get_approval_inbox():
+    """
+    Pending transactions awaiting approval by the caller's department(s)
+    """
     try:
         current_user_info = get_current_user()
-        user = User.query.get(current_user_info['user_id'])
-        tx = Transaction.query.get(transaction_id)
-        if not tx or tx.status != TransactionStatus.Pending:
-            return jsonify({"success": False, "message": "Transaction not found or not pending"}), 404
+        departments = headed_departments(current_user_info['user_id'])
+        if not departments:
+            return jsonify({"success": False, "message": "Only department heads have an approval inbox"}), 403
+        result = pending_inbox(
+            departments,
+            limit=request.args.get('limit', 20, type=int),
+            cursor=request.args.get('cursor')
+        )
+        return jsonify({"success": True, **result}), 200
+    except InboxError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
 
-        # Only the receiver (toDept) can approve
-        dept = Department.query.get(tx.dept_id)
-        if not dept or dept.head_user_id != user.user_id:
-            return jsonify({"success": False, "message": "Only the receiving department head can approve"}), 403
+@api.route('/api/transactions/<int:transaction_id>/approve', methods=['POST'])
+@jwt_required
+def approve_transaction(transaction_id):
+    try:
+        current_user_info = get_current_user()
+        payload = prepare_approval(current_user_info['user_id'], transaction_id)
 
         # Call blockchain API
-        payload = {
-            "fromDept": tx.creator.name if tx.created_by_id else "Unknown",
-            "toDept": dept.name,
-            "amount": str(tx.amount),
-            "purpose": tx.purpose
-        }
-        blockchain_base = os.getenv("BLOCKCHAIN_API_URL", "http://localhost:3001")
-        blockchain_api_url = f"{blockchain_base}/api/transactions"
-        bc_response = requests.post(blockchain_api_url, json=payload)
-        bc_data = bc_response.json()
-        if not bc_data.get("success"):
-            return jsonify({"success": False, "message": "Blockchain error: " + bc_data.get("error", "Unknown error")}), 500
-
-        tx.status = TransactionStatus.Settled
-        tx.approved_by_id = user.user_id
-        tx.blockchain_hash = bc_data.get("transactionHash")
-        db.session.commit()
+        try:
+            transaction_hash = anchor_transaction(payload)
+        except BlockchainError as e:
+            return jsonify({"success": False, "message": "Blockchain error: " + str(e)}), 500
+
+        complete_approval(current_user_info['user_id'], transaction_id, transaction_hash)
         return jsonify({"success": True, "message": "Transaction approved and added to blockchain"})
+    except ApprovalError as e:
+        return jsonify({"success": False, "message": e.message}), e.status
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
-@app.route('/api/transactions/<int:transaction_id>/reject', methods=['POST'])
+@api.route('/api/transactions/<int:transaction_id>/reject', methods=['POST'])
 @jwt_required
 def reject_transaction(transaction_id):
     try:
         data = request.get_json()
         reason = data.get("reason", "")
         current_user_info = get_current_user()
-        user = User.query.get(current_user_info['user_id'])
+        user = db.session.get(User, current_user_info['user_id'])
         tx = Transaction.query.get(transaction_id)
         if not tx or tx.status != TransactionStatus.Pending:
             return jsonify({"success": False, "message": "Transaction not found or not pending"}), 404
 
-        dept = Department.query.get(tx.dept_id)
-        if not dept or dept.head_user_id != user.user_id:
+        dept = db.session.get(Department, tx.dept_id)
+        if not dept or not user or dept.head_user_id != user.user_id:
             return jsonify({"success": False, "message": "Only the receiving department head can reject"}), 403
 
         tx.status = TransactionStatus.Rejected
@@ -457,17 +579,137 @@ def reject_transaction(transaction_id):
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
         
+@api.route('/api/transactions/batch', methods=['POST'])
+@jwt_required
+def batch_review_transactions():
+    """
+    Approve and reject many pending transactions in one request.
+
+    Body: {"items": [{"transaction_id": 1, "action": "approve"},
+                     {"transaction_id": 2, "action": "reject", "reason": "..."}]}
+    Authorization is checked for all items in one query, approvals are
+    anchored on the blockchain in one grouped call and every change is
+    committed together. Returns a result per item.
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get("items")
+        if not isinstance(items, list) or not items:
+            return jsonify({"success": False, "message": "items must be a non-empty list"}), 400
+        if len(items) > MAX_BATCH:
+            return jsonify({"success": False, "message": f"At most {MAX_BATCH} items per batch"}), 400
+        user_id = get_current_user()['user_id']
+
+        results = []
+        seen = set()
+        for item in items:
+            item = item if isinstance(item, dict) else {}
+            result = {"transaction_id": item.get("transaction_id"), "action": item.get("action"), "success": False}
+            if type(result["transaction_id"]) is not int or result["action"] not in ("approve", "reject"):
+                result["message"] = "Each item needs an integer transaction_id and an action of approve or reject"
+            elif result["transaction_id"] in seen:
+                result["message"] = "Duplicate transaction in batch"
+            else:
+                seen.add(result["transaction_id"])
+            results.append(result)
+
+        # One query loads every transaction with its receiving department and creator
+        creator = aliased(User)
+        rows = {
+            tx.transaction_id: (tx, head_user_id, dept_name, creator_name)
+            for tx, head_user_id, dept_name, creator_name in db.session.query(
+                Transaction, Department.head_user_id, Department.name, creator.name
+            )
+            .outerjoin(Department, Department.dept_id == Transaction.dept_id)
+            .outerjoin(creator, creator.user_id == Transaction.created_by_id)
+            .filter(Transaction.transaction_id.in_(seen))
+        } if seen else {}
+
+        to_anchor = []
+        for item, result in zip(items, results):
+            if "message" in result:
+                continue
+            row = rows.get(result["transaction_id"])
+            if not row or row[0].status != TransactionStatus.Pending:
+                result["message"] = "Transaction not found or not pending"
+            elif row[1] != user_id:
+                result["message"] = f"Only the receiving department head can {result['action']}"
+            elif result["action"] == "reject":
+                tx = row[0]
+                tx.status = TransactionStatus.Rejected
+                tx.approved_by_id = user_id
+                tx.rejection_reason = item.get("reason", data.get("reason", ""))
+                result.update(success=True, status=tx.status.value)
+            else:
+                to_anchor.append((row, result))
+
+        # Anchor the approved set in one grouped call; failures stay pending
+        if to_anchor:
+            try:
+                anchored = anchor_batch([
+                    anchor_payload(tx, creator_name or "Unknown", dept_name)
+                    for (tx, _, dept_name, creator_name), _ in to_anchor
+                ])
+            except BlockchainError as e:
+                anchored = [{"success": False, "error": str(e)}] * len(to_anchor)
+
+            # Anchoring is slow: re-read the anchored rows under a write lock
+            # and only settle those nobody approved or rejected meanwhile
+            # (FOR UPDATE is a no-op on SQLite, so take its write lock too)
+            lock_chain()
+            anchored_ids = [tx.transaction_id for ((tx, _, _, _), _), outcome in zip(to_anchor, anchored)
+                            if outcome.get("success")]
+            still_pending = {
+                tx.transaction_id for tx in Transaction.query
+                .filter(Transaction.transaction_id.in_(anchored_ids))
+                .with_for_update()
+                .populate_existing()
+                if tx.status == TransactionStatus.Pending
+            } if anchored_ids else set()
+            for ((tx, _, _, _), result), outcome in zip(to_anchor, anchored):
+                if outcome.get("success") and tx.transaction_id not in still_pending:
+                    result["message"] = "Transaction was approved or rejected while it was being anchored"
+                elif outcome.get("success"):
+                    tx.status = TransactionStatus.Settled
+                    tx.approved_by_id = user_id
+                    tx.blockchain_hash = outcome.get("transactionHash")
+                    result.update(success=True, status=tx.status.value, transaction_hash=tx.blockchain_hash)
+                else:
+                    result["message"] = "Blockchain error: " + outcome.get("error", "Unknown error")
+
+        db.session.commit()
+        approved = sum(1 for r in results if r["success"] and r["action"] == "approve")
+        rejected = sum(1 for r in results if r["success"] and r["action"] == "reject")
+        return jsonify({
+            "success": True,
+            "approved": approved,
+            "rejected": rejected,
+            "failed": len(results) - approved - rejected,
+            "results": results
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "message": str(e)}), 500
+
 # Public Ledger Routes
-@app.route('/api/ledger', methods=['GET'])
+@api.route('/api/ledger', methods=['GET'])
 def get_public_ledger():
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+    page = request.args.get('page', type=int)
+    snapshot = None if include_archived else snapshot_response('ledger', page)
+    if snapshot:
+        return snapshot
     try:
         transactions = Transaction.query.order_by(Transaction.created_at.asc()).all()
+        # Archived history is only read when a full export is requested
+        if include_archived:
+            transactions = chain(iter_archived_transactions(), transactions)
         result = []
         
         for tx in transactions:
-            dept = Department.query.get(tx.dept_id)
-            creator = User.query.get(tx.created_by_id)
-            approver = User.query.get(tx.approved_by_id) if tx.approved_by_id else None
+            dept = cached_department(tx.dept_id)
+            creator = cached_user(tx.created_by_id)
+            approver = cached_user(tx.approved_by_id)
             
             result.append({
                 "transaction_id": tx.transaction_id,
@@ -480,70 +722,59 @@ def get_public_ledger():
                 "approved_by": approver.name if approver else None,
                 "created_at": tx.created_at.isoformat(),
                 "current_hash": tx.current_hash,
+                "hash_version": getattr(tx, 'hash_version', None) or LEGACY_HASH_VERSION,
                 "rejection_reason": tx.rejection_reason,
-                "anomaly": tx.anomaly
+                "anomaly": is_anomalous(tx),
+                "anomaly_score": tx.anomaly_score,
+                "anomaly_reasons": tx.anomaly_reasons,
+                "archived": getattr(tx, 'archived', False)
             })
         
+        if page:
+            return jsonify(page_payload('ledger', result, page, current_app.config['SNAPSHOT_PAGE_SIZE'])), 200
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
-@app.route('/api/ledger/verify', methods=['GET'])
+@api.route('/api/ledger/verify', methods=['GET'])
 def verify_ledger_integrity():
+    snapshot = snapshot_response('ledger_verify')
+    if snapshot:
+        return snapshot
     try:
-        transactions = Transaction.query.order_by(Transaction.created_at.asc()).all()
-        
-        if not transactions:
-            return jsonify({"success": True, "message": "No transactions to verify", "is_valid": True}), 200
-        
-        for i, tx in enumerate(transactions):
-            if i == 0:
-                # First transaction should have no previous hash or genesis hash
-                expected_previous = None
-            else:
-                expected_previous = transactions[i-1].current_hash
-            
-            if tx.previous_hash != expected_previous:
-                return jsonify({
-                    "success": False, 
-                    "message": f"Chain broken at transaction {tx.transaction_id}",
-                    "is_valid": False
-                }), 200
-            
-            # Recalculate hash to verify integrity
-            tx_data = {
-                "dept_id": str(tx.dept_id),
-                "amount": str(tx.amount),
-                "purpose": tx.purpose,
-                "status": tx.status.value,
-                "created_by_id": str(tx.created_by_id),
-                "approved_by_id": str(tx.approved_by_id) if tx.approved_by_id else None,
-                "invoice_url": tx.invoice_url,
-                "created_at": tx.created_at.isoformat()
-            }
-            
-            expected_hash = compute_transaction_hash(tx_data, tx.previous_hash)
-            if tx.current_hash != expected_hash:
-                return jsonify({
-                    "success": False,
-                    "message": f"Hash mismatch at transaction {tx.transaction_id}",
-                    "is_valid": False
-                }), 200
-        
+        # Archived segments come first in the global chain; in sharded mode
+        # the department shards and checkpoints are verified as well. A
+        # snapshot publish resumes from the heads its previous publish verified.
+        generated_at = datetime.utcnow().isoformat()
+        result = verify_ledger(workers=current_app.config['LEDGER_VERIFY_WORKERS'],
+                               since=g.get('snapshot_verify_since'))
+        g.snapshot_verified = result["verified"]
+        if not result["total_transactions"]:
+            return jsonify({"success": True, "message": "No transactions to verify", "is_valid": True,
+                            "generated_at": generated_at}), 200
+
         return jsonify({
             "success": True, 
             "message": "Ledger integrity verified", 
             "is_valid": True,
-            "total_transactions": len(transactions)
+            "total_transactions": result["total_transactions"],
+            "mode": result["mode"],
+            "shards": result["shards"],
+            "checkpoints": result["checkpoints"],
+            "generated_at": generated_at,
+            "head_transaction_id": result["head_transaction_id"],
+            "head_hash": result["head_hash"]
         }), 200
+    except (ChainError, ArchiveError) as e:
+        return jsonify({"success": False, "message": str(e), "is_valid": False, "generated_at": generated_at}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Reporting Routes
-@app.route('/api/reports/department/<dept_id>/budget', methods=['GET'])
+@api.route('/api/reports/department/<dept_id>/budget', methods=['GET'])
 def get_department_budget_report(dept_id):
     try:
-        dept = Department.query.get(dept_id)
+        dept = cached_department(dept_id)
         if not dept:
             return jsonify({"success": False, "message": "Department not found"}), 404
         
@@ -570,19 +801,39 @@ def get_department_budget_report(dept_id):
             "total_spent": abs(total_spent),
             "remaining_budget": float(dept.allocated_budget) + total_received + total_spent,
             "sub_department_spending": sub_dept_spending,
-            "transaction_count": len(transactions)
+            "transaction_count": len(transactions) + archived_totals()["count"].get(str(dept.dept_id), 0)
         }
         
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
-@app.route('/api/departments/<dept_id>/budget', methods=['PUT'])
+@api.route('/api/reports/timeseries', methods=['GET'])
+def get_spending_timeseries():
+    """
+    Spending per department per day or month, served from the rollup tables
+    """
+    try:
+        statuses = request.args.get('status')
+        result = timeseries(
+            granularity=request.args.get('granularity', 'day'),
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            dept_id=request.args.get('dept_id'),
+            statuses=statuses.split(',') if statuses else None
+        )
+        return jsonify({"success": True, **result}), 200
+    except RollupError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@api.route('/api/departments/<dept_id>/budget', methods=['PUT'])
 @jwt_required
 def update_department_budget(dept_id):
     try:
         current_user_info = get_current_user()
-        admin_user = User.query.get(current_user_info['user_id'])
+        admin_user = db.session.get(User, current_user_info['user_id'])
         if not admin_user or admin_user.role != UserRole.Admin:
             return jsonify({"success": False, "message": "Only admin can update budgets"}), 403
 
@@ -599,113 +850,71 @@ def update_department_budget(dept_id):
         db.session.rollback()
         return jsonify({"success": False, "message": str(e)}), 500
     
-@app.route('/api/departments/balances', methods=['GET'])
+@api.route('/api/departments/balances', methods=['GET'])
 @jwt_required
 def get_department_balances():
     """
     Returns balances, budgets, and anomaly alerts for all departments and admin.
     """
     try:
-        departments = Department.query.all()
-        transactions = Transaction.query.filter(Transaction.status.in_([TransactionStatus.Settled, TransactionStatus.Approved])).all()
-        result = []
-        alerts = []
-
-        # Calculate admin balance (admin is sender for all outgoing tx)
-        admin_out = 0
-        admin_in = 0
-        for tx in transactions:
-            creator = User.query.get(tx.created_by_id)
-            if creator and creator.role == UserRole.Admin:
-                from_dept = "Admin"
-            elif creator and creator.role == UserRole.DeptHead:
-                headed_dept = Department.query.filter_by(head_user_id=creator.user_id).first()
-                from_dept = headed_dept.name if headed_dept else creator.name
-            else:
-                from_dept = creator.name if creator else "Unknown"
-            to_dept = Department.query.get(tx.dept_id).name if tx.dept_id else "Unknown"
-            if from_dept == "Admin":
-                admin_out += float(tx.amount)
-            if to_dept == "Admin":
-                admin_in += float(tx.amount)
-        admin_budget = 100_000_000  # Admin preset budget
-        admin_balance = 500_000_000 + admin_in - admin_out  # Admin preset balance plus net in/out
-
-        # Anomaly for admin
-        if admin_budget and admin_out > admin_budget:
-            alerts.append({
-                "type": "overrun",
-                "entity": "Admin",
-                "amount": admin_out,
-                "budget": admin_budget,
-                "message": f"Admin has spent {admin_out}, which exceeds the budget of {admin_budget}."
-            })
+        return jsonify({"success": True, **department_balances()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
 
-        # For each department
-        for dept in departments:
-            dept_in = 0
-            dept_out = 0
-            for tx in transactions:
-                creator = User.query.get(tx.created_by_id)
-                if creator and creator.role == UserRole.Admin:
-                    from_dept = "Admin"
-                elif creator and creator.role == UserRole.DeptHead:
-                    headed_dept = Department.query.filter_by(head_user_id=creator.user_id).first()
-                    from_dept = headed_dept.name if headed_dept else creator.name
-                else:
-                    from_dept = creator.name if creator else "Unknown"
-                to_dept = Department.query.get(tx.dept_id).name if tx.dept_id else "Unknown"
-                if to_dept == dept.name:
-                    dept_in += float(tx.amount)
-                if from_dept == dept.name:
-                    dept_out += float(tx.amount)
-            balance = dept_in - dept_out
-            budget = float(dept.allocated_budget or 0)
-            result.append({
-                "dept_id": str(dept.dept_id),
-                "name": dept.name,
-                "budget": budget,
-                "balance": balance
-            })
-            if budget and balance < 0:
-                alerts.append({
-                    "type": "overrun",
-                    "entity": dept.name,
-                    "amount": abs(balance),
-                    "budget": budget,
-                    "message": f"{dept.name} has overspent by {abs(balance):,.2f} (budget: {budget:,.2f})."
-                })
+@api.route('/api/dashboard/summary', methods=['GET'])
+@jwt_required
+def get_dashboard_summary():
+    """
+    Totals, balances, pending counts, recent anomalies and recent activity in one response
+    """
+    try:
+        summary, age = cached_summary(
+            recent=request.args.get('recent', 50, type=int),
+            anomalies=request.args.get('anomalies', 10, type=int)
+        )
+        response = jsonify({"success": True, **summary})
+        response.headers['Cache-Control'] = 'private, max-age=%d' % current_app.config['DASHBOARD_CACHE_TTL']
+        response.headers['Age'] = str(int(age))
+        return response, 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
 
-        return jsonify({
-            "success": True,
-            "departments": result,
-            "admin": {
-                "balance": admin_balance,
-                "budget": admin_budget
-            },
-            "alerts": alerts
-        }), 200
+@api.route('/api/transactions', methods=['GET'])
+@jwt_required
+def get_transactions():
+    """
+    Filtered, keyset-paginated transactions for the dashboard table, newest first
+    """
+    try:
+        result = list_transactions(
+            {name: request.args.get(name) for name in TRANSACTION_FILTERS},
+            limit=request.args.get('limit', 20, type=int),
+            cursor=request.args.get('cursor')
+        )
+        return jsonify({"success": True, **result}), 200
+    except TransactionListError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
-@app.route('/api/users', methods=['GET'])
+@api.route('/api/users', methods=['GET'])
 def get_users():
+    """
+    List users; ?fields=, ?sort= (created_at, name, email, -desc), ?limit= and ?cursor= (see listing.py)
+    """
     try:
-        users = User.query.all()
-        result = []
-        for user in users:
-            result.append({
-                "user_id": str(user.user_id),
-                "name": user.name,
-                "email": user.email,
-                "role": user.role.value,
-                "created_at": user.created_at.isoformat()
-            })
-        return jsonify(result), 200
+        page = list_rows(USERS, request.args.get('fields'), request.args.get('sort'),
+                         request.args.get('limit'), request.args.get('cursor'))
+        if not (request.args.get('limit') or request.args.get('cursor')):
+            # Unpaged requests keep the original bare-list response
+            return jsonify(page['items']), 200
+        return jsonify({"success": True, "users": page['items'], "next_cursor": page['next_cursor']}), 200
+    except ListingError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
     
-@app.route('/api/chatbot', methods=['POST'])
+@api.route('/api/chatbot', methods=['POST'])
 def chatbot():
     """
     Gemini-powered chatbot for public Q&A about budget/transactions.
@@ -716,101 +925,158 @@ def chatbot():
         if not question:
             return jsonify({"answer": "Please ask a question."}), 400
 
-        # Fetch relevant data from the database (example: all departments and budgets)
-        departments = Department.query.all()
-        transactions = Transaction.query.order_by(Transaction.created_at.desc()).limit(20).all()
-        dept_info = [
-            f"{d.name}: Budget ${d.allocated_budget}" for d in departments
-        ]
-        tx_info = []
-        for t in transactions:
-            # Get fromDept and toDept logic (same as in your public transactions endpoint)
-            creator = User.query.get(t.created_by_id)
-            if creator and creator.role == UserRole.Admin:
-                from_dept = "Admin"
-            elif creator and creator.role == UserRole.DeptHead:
-                headed_dept = Department.query.filter_by(head_user_id=creator.user_id).first()
-                from_dept = headed_dept.name if headed_dept else creator.name
-            else:
-                from_dept = creator.name if creator else "Unknown"
-            to_dept = Department.query.get(t.dept_id).name if t.dept_id else "Unknown"
-            tx_info.append(
-                f"{t.created_at.date()} | From: {from_dept} | To: {to_dept} | Purpose: {t.purpose} | Amount: {t.amount} | Status: {t.status.value}"
-            )
-
-        # Compose context for Gemini
-        context = (
-            "Departments and Budgets:\n" +
-            "\n".join(dept_info) +
-            "\n\nRecent Transactions:\n" +
-            "\n".join(tx_info)
-        )
-
-        # Call Gemini API (replace with your actual Gemini endpoint and key)
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        if not GEMINI_API_KEY:
-            return jsonify({"answer": "Gemini API key not set."}), 500
-        
-
-        gemini_payload = {
-            "contents": [
-                {"role": "user", "parts": [{
-                    "text": (
-                        "You are a helpful assistant for transparency and budget queries. "
-                        "Always answer in 2-4 sentences, be concise, and use bullet points if listing items. "
-                        "If the user asks for a summary or comparison, give only the most important facts. "
-                        "If the question is unclear, politely ask for clarification. "
-                        f"\n\nUser question: {question}\n\nContext:\n{context}"
-                    )
-                }]}
-            ]
-        }
-        gemini_headers = {
-            "Content-Type": "application/json"
-        }
-        gemini_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-        r = requests.post(gemini_url, headers=gemini_headers, json=gemini_payload)
-        print("Gemini API status:", r.status_code)
-        print("Gemini API response:", r.text)
-        if r.status_code == 200:
-            answer = r.json().get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "Sorry, I couldn't find an answer.")
-            # Trim long answers
-            max_chars = 400
-            if len(answer) > max_chars:
-                trimmed = answer[:max_chars]
-                last_period = trimmed.rfind('.')
-                if last_period != -1:
-                    answer = trimmed[:last_period+1]
-                else:
-                    answer = trimmed + "..."
-        else:
-            answer = "Sorry, there was an error contacting Gemini."
-        return jsonify({"answer": answer})
+        # Imported on first use: only this endpoint needs the HTTP client
+        from chatbot import answer_question
+        answer, status = answer_question(question)
+        return jsonify({"answer": answer}), status
     except Exception as e:
         return jsonify({"answer": f"Error: {str(e)}"}), 500
     
-@app.route('/api/feedback/<int:transaction_id>', methods=['GET'])
+@api.route('/api/feedback', methods=['GET'])
+def get_feedback_bulk():
+    """
+    Feedback for many transactions: ?ids=1,2,3 (at most 500), newest first, ?limit= per transaction
+    """
+    try:
+        ids = parse_ids(request.args.get('ids'))
+        limit = request.args.get('limit', type=int)
+        feedback = bulk_feedback(ids, limit if limit and limit > 0 else None)
+        return jsonify({
+            "success": True,
+            "feedback": {str(tx_id): entry for tx_id, entry in feedback.items()}
+        }), 200
+    except FeedbackError as e:
+        return jsonify({"success": False, "message": e.message}), e.status
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@api.route('/api/feedback/<int:transaction_id>', methods=['GET'])
 def get_feedback(transaction_id):
     feedbacks = Feedback.query.filter_by(transaction_id=transaction_id).order_by(Feedback.created_at.desc()).all()
-    return jsonify([
-        {
-            "feedback_id": f.feedback_id,
-            "comment": f.comment,
-            "created_at": f.created_at.isoformat()
-        } for f in feedbacks
-    ]), 200
-
-@app.route('/api/feedback/<int:transaction_id>', methods=['POST'])
+    return jsonify([feedback_json(f) for f in feedbacks]), 200
+
+@api.route('/api/feedback/<int:transaction_id>', methods=['POST'])
 def add_feedback(transaction_id):
-    data = request.get_json()
-    comment = data.get('comment', '').strip()
+    data = request.get_json(silent=True) or {}
+    comment = (data.get('comment') or '').strip()
     if not comment:
         return jsonify({"success": False, "message": "Comment required"}), 400
-    feedback = Feedback(transaction_id=transaction_id, comment=comment)
-    db.session.add(feedback)
-    db.session.commit()
-    return jsonify({"success": True, "message": "Feedback added"}), 201
+    try:
+        writer = current_app.extensions.get("feedback_writer")
+        if writer is None:
+            feedback = save_feedback(transaction_id, comment)
+        else:
+            wait = current_app.config['FEEDBACK_WAIT']
+            # Without waiting for the batch, unknown transactions are refused up front
+            if not wait and not transaction_exists(transaction_id):
+                raise FeedbackError("Transaction not found", 404)
+            feedback = writer.submit(transaction_id, comment, wait)
+        if feedback is None:
+            return jsonify({"success": True, "message": "Feedback queued"}), 202
+        return jsonify({"success": True, "message": "Feedback added", "feedback": feedback_json(feedback)}), 201
+    except FeedbackError as e:
+        return jsonify({"success": False, "message": e.message}), e.status
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@api.route('/api/search', methods=['GET'])
+def search_ledger():
+    """
+    Ranked full-text search over transaction purposes, department names and feedback
+    """
+    try:
+        if not search_supported():
+            return jsonify({"success": False, "message": "Search requires SQLite FTS5"}), 501
+        result = search(
+            request.args.get('q', ''),
+            kind=request.args.get('type'),
+            status=request.args.get('status'),
+            dept_id=request.args.get('dept_id'),
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            limit=request.args.get('limit', 20, type=int),
+            cursor=request.args.get('cursor')
+        )
+        return jsonify({"success": True, **result}), 200
+    except SearchError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Per-endpoint request and SQL query histograms in Prometheus text format
+    """
+    return Response(REGISTRY.render(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+@api.route('/api/admin/profiles', methods=['GET'])
+@jwt_required
+def get_request_profiles():
+    """
+    List stored request profiles and the hottest functions across them
+    """
+    try:
+        current_user_info = get_current_user()
+        admin_user = db.session.get(User, current_user_info['user_id'])
+        if not admin_user or admin_user.role != UserRole.Admin:
+            return jsonify({"success": False, "message": "Only admin can view profiles"}), 403
+
+        endpoint = request.args.get('endpoint')
+        limit = request.args.get('limit', 20, type=int)
+        sort = request.args.get('sort', 'tottime')
+        profiles = list_profiles(endpoint)
+        paths = [profile_path(p['name']) for p in profiles]
+        return jsonify({
+            "success": True,
+            "profiles": profiles,
+            "hot_functions": hot_functions([p for p in paths if p], limit, sort)
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@api.route('/api/admin/profiles/<name>', methods=['GET'])
+@jwt_required
+def get_request_profile(name):
+    try:
+        current_user_info = get_current_user()
+        admin_user = db.session.get(User, current_user_info['user_id'])
+        if not admin_user or admin_user.role != UserRole.Admin:
+            return jsonify({"success": False, "message": "Only admin can view profiles"}), 403
+
+        path = profile_path(name)
+        if not path:
+            return jsonify({"success": False, "message": "Profile not found"}), 404
+        limit = request.args.get('limit', 20, type=int)
+        sort = request.args.get('sort', 'tottime')
+        return jsonify({
+            "success": True,
+            "name": name,
+            "hot_functions": hot_functions([path], limit, sort)
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@api.route('/api/admin/reconciliation', methods=['GET'])
+@jwt_required
+def get_reconciliation_issues():
+    """
+    Open blockchain reconciliation issues found by reconcile.py
+    """
+    try:
+        current_user_info = get_current_user()
+        admin_user = db.session.get(User, current_user_info['user_id'])
+        if not admin_user or admin_user.role != UserRole.Admin:
+            return jsonify({"success": False, "message": "Only admin can view reconciliation issues"}), 403
+
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        return jsonify({"success": True, **open_reconciliation_issues(limit)}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
 
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        bootstrap_database()
     # Bind to 0.0.0.0 for Docker container networking
     app.run(host='0.0.0.0', port=int(os.environ.get('PYTHON_PORT', 5000)), debug=True)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Single-transaction approval, split around the blockchain call.
+
+``prepare_approval()`` checks the caller and builds the anchor payload;
+``complete_approval()`` records the blockchain hash. The WSGI route runs
+both around a blocking ``anchor_transaction()``, while the ASGI handler
+in asgi.py awaits the anchor call between them, so the slow network
+round trip never holds a database session or a thread.
+
+Who may approve is always read from the database: a department's head can
+change at any time, so the lookup cache only supplies the creator's name
+for the payload.
+"""
+
+from models import db, Transaction, TransactionStatus, Department
+from blockchain_client import anchor_payload
+from cache import cached_user
+from ledger_chain import lock_chain
+
+class ApprovalError(Exception):
+    """Raised when a transaction cannot be approved; carries the HTTP status."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def prepare_approval(user_id, transaction_id):
+    """
+    Check that ``user_id`` may approve the transaction.
+
+    Args:
+        user_id: Approving user (from the JWT)
+        transaction_id: Transaction to approve
+
+    Returns:
+        Payload for ``anchor_transaction()``
+
+    Raises:
+        ApprovalError: 404 if the transaction is missing or not pending,
+            403 if the caller does not head the receiving department
+    """
+    tx = db.session.get(Transaction, transaction_id)
+    if not tx or tx.status != TransactionStatus.Pending:
+        raise ApprovalError("Transaction not found or not pending", 404)
+
+    # Only the receiver (toDept) can approve
+    dept = db.session.get(Department, tx.dept_id)
+    if not dept or dept.head_user_id != user_id:
+        raise ApprovalError("Only the receiving department head can approve", 403)
+
+    creator = cached_user(tx.created_by_id) if tx.created_by_id else None
+    return anchor_payload(tx, creator.name if creator else "Unknown", dept.name)
+
+def complete_approval(user_id, transaction_id, transaction_hash):
+    """
+    Settle an anchored transaction.
+
+    The row is re-read under the chain write lock (FOR UPDATE is a no-op on
+    SQLite), as batch approvals do, so an approval or rejection committed
+    while this one was being anchored is seen rather than overwritten.
+
+    Raises:
+        ApprovalError: 409 if the transaction stopped being pending while
+            it was being anchored, 403 if the caller no longer heads the
+            receiving department
+    """
+    lock_chain()
+    tx = db.session.get(Transaction, transaction_id, with_for_update=True, populate_existing=True)
+    if not tx or tx.status != TransactionStatus.Pending:
+        raise ApprovalError("Transaction was approved or rejected while it was being anchored", 409)
+    dept = db.session.get(Department, tx.dept_id, populate_existing=True)
+    if not dept or dept.head_user_id != user_id:
+        raise ApprovalError("Only the receiving department head can approve", 403)
+    tx.status = TransactionStatus.Settled
+    tx.approved_by_id = user_id
+    tx.blockchain_hash = transaction_hash
+    db.session.commit()
@@ -0,0 +1,197 @@
+"""
+ASGI entry point with async handlers for the endpoints that wait on
+outbound HTTP.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+``POST /api/chatbot`` and ``POST /api/transactions/<id>/approve`` are
+served by coroutines that await their Gemini or blockchain call on one
+shared ``httpx.AsyncClient``, so hundreds of slow upstream calls can be in
+flight without holding a thread each. Their database work (building the
+prompt, checking and settling the approval) runs on a small bounded
+thread pool inside an app context.
+
+Every other request goes to the Flask app through asgiref's WSGI adapter,
+run on a separate thread pool, so ledger reads never queue behind the
+outbound calls.
+
+Settings (environment):
+    ASGI_DB_THREADS         Threads for the async handlers' DB work (default 8)
+    ASGI_WSGI_THREADS       Threads serving the regular Flask routes (default 16)
+    ASGI_HTTP_CONNECTIONS   Max concurrent outbound connections (default 500)
+
+The chatbot handler applies the same rate limits and load shedding as
+the Flask routes (see ratelimit.py); SHED_CHATBOT_INFLIGHT caps the
+chatbot calls this process keeps waiting on Gemini.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+
+from app import create_app
+from approvals import prepare_approval, complete_approval, ApprovalError
+from blockchain_client import anchor_transaction_async, BlockchainError
+from chatbot import answer_question_async
+from local_auth import verify_token
+from query_metrics import REQUEST_DURATION, REQUESTS_TOTAL
+from ratelimit import Rejected, RATE_LIMITED, client_address, rejection_body
+
+APPROVE_PATH = re.compile(r"^/api/transactions/(\d+)/approve$")
+
+flask_app = create_app()
+_limiter = flask_app.extensions["rate_limiter"]
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs every WSGI call on one shared thread by default; Flask
+    # requests are independent, so run them on the loop's thread pool.
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False)
+
+async def wsgi_app(scope, receive, send):
+    await _PooledWsgiInstance(flask_app)(scope, receive, send)
+
+_db_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("ASGI_DB_THREADS", 8)), thread_name_prefix="asgi-db")
+_client = None
+
+def _http_client():
+    global _client
+    if _client is None:
+        connections = int(os.environ.get("ASGI_HTTP_CONNECTIONS", 500))
+        _client = httpx.AsyncClient(limits=httpx.Limits(max_connections=connections,
+                                                        max_keepalive_connections=connections))
+    return _client
+
+async def run_db(fn, *args):
+    """Run ``fn(*args)`` in an app context on the DB thread pool."""
+    def call():
+        with flask_app.app_context():
+            return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(_db_pool, call)
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+async def _respond(send, status, payload, endpoint, started, headers=()):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*"),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+    REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=str(status))
+
+def _bearer_token(scope):
+    """Token from the Authorization header, or an error message as jwt_required gives."""
+    header = dict(scope["headers"]).get(b"authorization")
+    if not header:
+        return None, "Authorization header missing"
+    parts = header.decode("latin-1").split(" ")
+    if len(parts) < 2:
+        return None, "Invalid authorization header format"
+    return parts[1], None
+
+async def chatbot(scope, receive, send):
+    started = time.perf_counter()
+    # Same admission checks as the Flask route (ratelimit.py), before any work
+    headers = dict(scope["headers"])
+    client = client_address(scope["client"][0] if scope.get("client") else None,
+                            headers.get(b"x-forwarded-for", b"").decode("latin-1"),
+                            flask_app.config.get("PROXY_HOPS", 0))
+    request_start = headers.get(b"x-request-start", b"").decode("latin-1")
+    try:
+        # The bucket store may do disk or network I/O; keep it off the event loop
+        await run_db(_limiter.acquire, "chatbot", client, request_start)
+    except Rejected as e:
+        RATE_LIMITED.inc(route="chatbot", reason=e.reason)
+        return await _respond(send, e.status, rejection_body("chatbot", e.message), "chatbot", started,
+                              [(b"retry-after", str(e.retry_after).encode())])
+    try:
+        data = await _read_json(receive) or {}
+        question = data.get("question", "") if isinstance(data, dict) else ""
+        if not question:
+            return await _respond(send, 400, {"answer": "Please ask a question."}, "chatbot", started)
+        try:
+            answer, status = await answer_question_async(_http_client(), question, run_db)
+            await _respond(send, status, {"answer": answer}, "chatbot", started)
+        except Exception as e:
+            await _respond(send, 500, {"answer": f"Error: {str(e)}"}, "chatbot", started)
+    finally:
+        _limiter.release("chatbot")
+
+async def approve_transaction(scope, receive, send, transaction_id):
+    started = time.perf_counter()
+    endpoint = "approve_transaction"
+    token, error = _bearer_token(scope)
+    if error:
+        return await _respond(send, 401, {"error": error}, endpoint, started)
+
+    def prepare():
+        user_info = verify_token(token)
+        if not user_info:
+            return None, None
+        return user_info["user_id"], prepare_approval(user_info["user_id"], transaction_id)
+
+    try:
+        user_id, payload = await run_db(prepare)
+        if user_id is None:
+            return await _respond(send, 401, {"error": "Invalid or expired token"}, endpoint, started)
+        try:
+            transaction_hash = await anchor_transaction_async(_http_client(), payload)
+        except BlockchainError as e:
+            return await _respond(send, 500, {"success": False, "message": "Blockchain error: " + str(e)}, endpoint, started)
+        await run_db(complete_approval, user_id, transaction_id, transaction_hash)
+        await _respond(send, 200, {"success": True, "message": "Transaction approved and added to blockchain"}, endpoint, started)
+    except ApprovalError as e:
+        await _respond(send, e.status, {"success": False, "message": e.message}, endpoint, started)
+    except Exception as e:
+        await _respond(send, 500, {"success": False, "message": str(e)}, endpoint, started)
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            threads = int(os.environ.get("ASGI_WSGI_THREADS", 16))
+            # Flask requests run on the loop's default executor
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi-wsgi"))
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _client is not None:
+                await _client.aclose()
+            _db_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] == "http" and scope["method"] == "POST":
+        if scope["path"] == "/api/chatbot":
+            return await chatbot(scope, receive, send)
+        match = APPROVE_PATH.match(scope["path"])
+        if match:
+            return await approve_transaction(scope, receive, send, int(match.group(1)))
+    await wsgi_app(scope, receive, send)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Slow-upstream benchmark: WSGI workers vs. the ASGI entry point.
+
+Starts a stub upstream that answers Gemini and blockchain calls after a
+fixed delay, then for each server mode keeps ``--inflight`` chatbot
+requests waiting on that upstream while measuring the latency of a
+stream of ledger reads against the same single server process.
+
+Under gunicorn (``wsgi``) every waiting chatbot request holds one of the
+worker's threads, so reads queue behind them. Under uvicorn (``asgi``)
+the chatbot requests wait on the event loop and reads keep their own
+thread pool.
+
+Example:
+    python bench_async.py --inflight 200 --upstream-delay 2 --modes wsgi,asgi
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+UPSTREAM_DELAY_ENV = "BENCH_UPSTREAM_DELAY"
+
+async def upstream(scope, receive, send):
+    """Stub Gemini / blockchain API (run with uvicorn bench_async:upstream)."""
+    if scope["type"] != "http":
+        return
+    while (await receive()).get("more_body"):
+        pass
+    await asyncio.sleep(float(os.environ.get(UPSTREAM_DELAY_ENV, 2)))
+    if scope["path"].startswith("/api/transactions"):
+        payload = {"success": True, "transactionHash": "0x" + "0" * 64}
+    else:
+        payload = {"candidates": [{"content": {"parts": [{"text": "Benchmark answer."}]}}]}
+    body = json.dumps(payload).encode()
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _start(command, env):
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.Popen(command, cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def _wait_ready(client, url, process):
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited during startup")
+        try:
+            await client.get(url, timeout=1)
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within 60s")
+
+async def run_mode(mode, args, env):
+    import httpx
+
+    port = _free_port()
+    if mode == "asgi":
+        command = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port), "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app",
+                   "--workers", "1", "--threads", str(args.threads), "--bind", f"127.0.0.1:{port}",
+                   "--pid", f"/tmp/bench_async_{port}.pid", "--access-logfile", "/dev/null",
+                   "--timeout", str(int(args.upstream_delay * 10 + 30))]
+    process = _start(command, env)
+    base = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.inflight + 16, max_keepalive_connections=args.inflight + 16)
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=args.upstream_delay * 20 + 60) as client:
+            await _wait_ready(client, base + "/api/users", process)
+
+            async def ask():
+                started = time.perf_counter()
+                response = await client.post(base + "/api/chatbot", json={"question": "What is the budget?"})
+                return response.status_code, time.perf_counter() - started
+
+            chat_started = time.perf_counter()
+            chats = [asyncio.create_task(ask()) for _ in range(args.inflight)]
+            await asyncio.sleep(min(0.5, args.upstream_delay / 2))
+
+            read_latencies = []
+            read_errors = 0
+
+            async def read():
+                nonlocal read_errors
+                started = time.perf_counter()
+                try:
+                    response = await client.get(base + args.read_path)
+                    if response.status_code >= 400:
+                        read_errors += 1
+                except httpx.HTTPError:
+                    read_errors += 1
+                read_latencies.append(time.perf_counter() - started)
+
+            # One read every --read-interval seconds while the chatbot calls are pending
+            reads = []
+            while len(reads) < args.reads:
+                reads.append(asyncio.create_task(read()))
+                await asyncio.sleep(args.read_interval)
+            await asyncio.gather(*reads)
+
+            results = await asyncio.gather(*chats, return_exceptions=True)
+            chat_wall = time.perf_counter() - chat_started
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+    chat_ok = [r for r in results if not isinstance(r, Exception) and r[0] == 200]
+    read_latencies.sort()
+    ms = lambda v: round(v * 1000, 1)
+    return {
+        "mode": mode,
+        "inflight": args.inflight,
+        "upstream_delay_s": args.upstream_delay,
+        "read_p50_ms": ms(statistics.median(read_latencies)),
+        "read_p95_ms": ms(read_latencies[int(len(read_latencies) * 0.95) - 1]),
+        "read_max_ms": ms(read_latencies[-1]),
+        "read_errors": read_errors,
+        "chat_ok": len(chat_ok),
+        "chat_failed": args.inflight - len(chat_ok),
+        "chat_wall_s": round(chat_wall, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reads while many slow upstream calls are in flight")
+    parser.add_argument("--database-url", default="sqlite:///async_benchmark.db",
+                        help="Database to seed and benchmark (never point this at real data)")
+    parser.add_argument("--modes", default="wsgi,asgi", help="Comma-separated server modes")
+    parser.add_argument("--inflight", type=int, default=200, help="Concurrent chatbot requests")
+    parser.add_argument("--upstream-delay", type=float, default=2.0, help="Seconds the stub upstream takes to answer")
+    parser.add_argument("--reads", type=int, default=40, help="Reads issued while the chatbot calls are in flight")
+    parser.add_argument("--read-interval", type=float, default=0.05, help="Seconds between reads")
+    parser.add_argument("--read-path", default="/api/users")
+    parser.add_argument("--threads", type=int, default=8, help="Threads of the single gunicorn worker (wsgi mode)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    from app import app
+    from bench_data import seed_database
+    with app.app_context():
+        seed_database(5, 2, 20, 500, 0, 42)
+
+    upstream_port = _free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    stub = _start([sys.executable, "-m", "uvicorn", "bench_async:upstream", "--port", str(upstream_port),
+                   "--log-level", "warning", "--limit-concurrency", "10000"],
+                  dict(os.environ, **{UPSTREAM_DELAY_ENV: str(args.upstream_delay)}))
+    # The benchmark floods the chatbot on purpose: no rate limits or shedding
+    env = dict(os.environ, GEMINI_API_KEY="benchmark", GEMINI_API_URL=upstream_url + "/gemini",
+               BLOCKCHAIN_API_URL=upstream_url, RATE_LIMIT_CHATBOT="off", SHED_CHATBOT_INFLIGHT="0")
+
+    results = []
+    try:
+        time.sleep(1)
+        for mode in args.modes.split(","):
+            result = asyncio.run(run_mode(mode, args, env))
+            results.append(result)
+            print(f"{mode:<5} inflight={result['inflight']} read p50={result['read_p50_ms']}ms "
+                  f"p95={result['read_p95_ms']}ms max={result['read_max_ms']}ms "
+                  f"chat ok={result['chat_ok']} failed={result['chat_failed']} in {result['chat_wall_s']}s")
+    finally:
+        stub.terminate()
+        stub.wait(timeout=60)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for The Transparency Ledger benchmarks.
+Seeds the database with a department hierarchy, users, a hash-chained
+transaction ledger and public feedback using bulk inserts.
+"""
+
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from models import db, User, Department, Transaction, Feedback, UserRole, TransactionStatus
+from utils import hash_transaction, hash_password, LEGACY_HASH_VERSION, DEFAULT_HASH_VERSION
+from search import ensure_search_index
+from rollups import rebuild_rollups, exceeds_budget
+from feedback import rebuild_feedback_summaries
+from cache import clear_cache
+from snapshots import discard as discard_snapshots
+
+CHUNK_SIZE = 5000
+
+DEPARTMENT_WORDS = [
+    "Engineering", "Finance", "Operations", "Research", "Facilities",
+    "Outreach", "Library", "Health", "Transport", "Housing", "Audit", "Sports"
+]
+
+PURPOSE_WORDS = [
+    "Equipment purchase", "Software licenses", "Lab consumables", "Travel grant",
+    "Event sponsorship", "Maintenance contract", "Consulting fees", "Scholarship fund",
+    "Office supplies", "Cloud hosting", "Training workshop", "Vendor payment"
+]
+
+STATUS_WEIGHTS = [
+    (TransactionStatus.Settled, 55),
+    (TransactionStatus.Pending, 20),
+    (TransactionStatus.Rejected, 15),
+    (TransactionStatus.Approved, 10),
+]
+
+def _bulk_insert(model, rows):
+    """Insert rows in chunks with executemany, bypassing the ORM unit of work."""
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(model.__table__.insert(), rows[start:start + CHUNK_SIZE])
+
+def _build_departments(rng, count, depth, start_time):
+    """Create department rows (and their head users) nested up to ``depth`` levels."""
+    departments = []
+    heads = []
+    levels = {}
+    password = hash_password("password123")
+
+    for i in range(count):
+        dept_id = str(uuid.uuid4())
+        head_id = str(uuid.uuid4())
+        candidates = [d for d in departments if levels[d["dept_id"]] < depth - 1]
+        if not candidates or rng.random() < 0.15:
+            parent = None
+            levels[dept_id] = 0
+        else:
+            parent = rng.choice(candidates)
+            levels[dept_id] = levels[parent["dept_id"]] + 1
+
+        name = f"{DEPARTMENT_WORDS[i % len(DEPARTMENT_WORDS)]} {i:04d}"
+        heads.append({
+            "user_id": head_id,
+            "name": f"{name} Head",
+            "email": f"dept{i:04d}@bench.transparency.com",
+            "password_hash": password,
+            "role": UserRole.DeptHead,
+            "created_at": start_time,
+        })
+        departments.append({
+            "dept_id": dept_id,
+            "name": name,
+            "description": f"Synthetic department at level {levels[dept_id]}",
+            "parent_dept_id": parent["dept_id"] if parent else None,
+            "head_user_id": head_id,
+            "allocated_budget": Decimal(rng.randint(50_000, 5_000_000)),
+            "created_at": start_time,
+        })
+    return departments, heads
+
+def seed_database(departments=10, depth=3, users=30, transactions=1000, feedback=500, seed=42,
+                  hash_version=DEFAULT_HASH_VERSION):
+    """
+    Drop and recreate all tables, then fill them with synthetic data.
+
+    Must be called inside an application context.
+
+    Args:
+        departments: Number of departments (each gets a DeptHead user)
+        depth: Maximum depth of the department hierarchy
+        users: Total number of non-admin users (at least one per department)
+        transactions: Number of ledger transactions
+        feedback: Number of feedback comments
+        seed: Random seed so runs are reproducible
+        hash_version: Hash version for the seeded chain (see utils.HASH_VERSIONS)
+
+    Returns:
+        Dictionary with the row counts that were inserted
+    """
+    rng = random.Random(seed)
+    start_time = datetime(2024, 1, 1)
+
+    db.drop_all()
+    db.create_all()
+
+    admin = {
+        "user_id": str(uuid.uuid4()),
+        "name": "System Administrator",
+        "email": "admin@transparency.com",
+        "password_hash": hash_password("admin123"),
+        "role": UserRole.Admin,
+        "created_at": start_time,
+    }
+    dept_rows, head_rows = _build_departments(rng, departments, depth, start_time)
+    manager_rows = [{
+        "user_id": str(uuid.uuid4()),
+        "name": f"Project Manager {i:04d}",
+        "email": f"pm{i:04d}@bench.transparency.com",
+        "password_hash": hash_password("password123"),
+        "role": UserRole.ProjectManager,
+        "created_at": start_time,
+    } for i in range(max(0, users - departments))]
+
+    _bulk_insert(User, [admin] + head_rows + manager_rows)
+    _bulk_insert(Department, dept_rows)
+
+    creators = [admin["user_id"]] * 3 + [u["user_id"] for u in head_rows + manager_rows]
+    statuses = [s for s, _ in STATUS_WEIGHTS]
+    weights = [w for _, w in STATUS_WEIGHTS]
+    step = timedelta(days=730) / max(transactions, 1)
+
+    # Legacy (version 1) hash inputs are formatted exactly as the verifier
+    # reads them back, so the seeded ledger verifies end to end.
+    previous_hash = None
+    tx_rows = []
+    balances = defaultdict(float)  # Running balance per department, for the budget rule
+    for i in range(transactions):
+        dept = rng.choice(dept_rows)
+        status = rng.choices(statuses, weights)[0]
+        amount = (Decimal(rng.randint(100, 2_500_000)) / 100).quantize(Decimal("0.0001"))
+        if rng.random() < 0.2:
+            amount = -amount
+        approved_by_id = dept["head_user_id"] if status != TransactionStatus.Pending else None
+        created_at = start_time + step * i + timedelta(microseconds=i % 997)
+        row = {
+            "transaction_id": i + 1,
+            "dept_id": dept["dept_id"],
+            "amount": amount,
+            "purpose": f"{rng.choice(PURPOSE_WORDS)} #{i}",
+            "status": status,
+            "created_by_id": rng.choice(creators),
+            "approved_by_id": approved_by_id,
+            "invoice_url": None,
+            "created_at": created_at,
+            "previous_hash": previous_hash,
+            "blockchain_hash": "0x" + uuid.UUID(int=rng.getrandbits(128)).hex * 2 if status == TransactionStatus.Settled else None,
+            "rejection_reason": "Synthetic rejection" if status == TransactionStatus.Rejected else None,
+            "anomaly": bool(exceeds_budget(balances[dept["dept_id"]], float(amount), float(dept["allocated_budget"] or 0))),
+        }
+        if status in (TransactionStatus.Settled, TransactionStatus.Approved):
+            balances[dept["dept_id"]] += float(amount)
+        if hash_version == LEGACY_HASH_VERSION:
+            hash_fields = {
+                "dept_id": row["dept_id"],
+                "amount": str(amount),
+                "purpose": row["purpose"],
+                "status": status.value,
+                "created_by_id": row["created_by_id"],
+                "approved_by_id": approved_by_id,
+                "invoice_url": None,
+                "created_at": created_at.isoformat(),
+            }
+        else:
+            hash_fields = row
+        row["hash_version"] = hash_version
+        row["current_hash"] = hash_transaction(hash_fields, previous_hash, hash_version)
+        previous_hash = row["current_hash"]
+        tx_rows.append(row)
+
+        if len(tx_rows) >= CHUNK_SIZE:
+            _bulk_insert(Transaction, tx_rows)
+            tx_rows = []
+    _bulk_insert(Transaction, tx_rows)
+
+    feedback_rows = [{
+        "transaction_id": rng.randint(1, transactions),
+        "comment": f"Synthetic feedback comment {i}",
+        "created_at": start_time + timedelta(minutes=i),
+    } for i in range(feedback if transactions else 0)]
+    _bulk_insert(Feedback, feedback_rows)
+
+    db.session.commit()
+    # drop_all removed the search triggers; recreate them and index the new rows.
+    ensure_search_index()
+    # Bulk inserts bypass the ORM hook that maintains the rollups.
+    rebuild_rollups()
+    rebuild_feedback_summaries()
+    # ...and the session hooks that invalidate cached users and departments.
+    clear_cache()
+    # Public reads go live until the snapshots of the new data are published
+    discard_snapshots()
+    return {
+        "departments": len(dept_rows),
+        "users": 1 + len(head_rows) + len(manager_rows),
+        "transactions": transactions,
+        "feedback": len(feedback_rows),
+    }
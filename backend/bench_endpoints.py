@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Endpoint load benchmark for The Transparency Ledger.
+
+Seeds a dedicated benchmark database with bench_data.py, then drives each
+endpoint through the Flask test client (or a running server with --url)
+at several concurrency levels. Latency percentiles, throughput and SQL
+query counts are written to a JSON results file that can be compared
+against a previous run with --compare.
+
+With --serve-workers the read endpoints are driven over HTTP against a
+local gunicorn started from gunicorn.conf.py once per worker count, to
+show how throughput scales with worker processes.
+
+The public views are served live unless --snapshots on is given. The
+mode is pinned for the whole run (and passed to gunicorn), so writes made
+by the benchmark never switch a run from live to snapshot serving halfway.
+
+Example:
+    python bench_endpoints.py --transactions 5000 --concurrency 1,4,16 \
+        --output bench_results.json --compare bench_baseline.json
+    python bench_endpoints.py --serve-workers 1,2,4 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# (name, method, path template, requires auth, JSON body)
+ENDPOINTS = [
+    ("public_transactions", "GET", "/api/public/transactions", False, None),
+    ("ledger", "GET", "/api/ledger", False, None),
+    ("ledger_verify", "GET", "/api/ledger/verify", False, None),
+    ("departments", "GET", "/api/departments", True, None),
+    ("department_detail", "GET", "/api/departments/{dept_id}", False, None),
+    ("department_balances", "GET", "/api/departments/balances", True, None),
+    ("department_budget_report", "GET", "/api/reports/department/{dept_id}/budget", False, None),
+    ("users", "GET", "/api/users", False, None),
+    ("feedback", "GET", "/api/feedback/{transaction_id}", False, None),
+    ("create_transaction", "POST", "/api/transactions", True,
+     {"dept_id": "{dept_id}", "amount": 125.5, "purpose": "Benchmark write"}),
+]
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+def fill(value, params):
+    if isinstance(value, str):
+        return value.format(**params)
+    if isinstance(value, dict):
+        return {k: fill(v, params) for k, v in value.items()}
+    return value
+
+class TestClientDriver:
+    """Sends requests in-process through the Flask test client."""
+
+    def __init__(self, flask_app):
+        from query_metrics import collect_queries
+        self.app = flask_app
+        self.collect_queries = collect_queries
+
+    def request(self, method, path, headers, body):
+        client = self.app.test_client()
+        with self.collect_queries() as stats:
+            response = client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_json(silent=True), stats.count
+
+class HTTPDriver:
+    """Sends requests to a running server over HTTP."""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip("/")
+        self.session_local = threading.local()
+        self.requests = requests
+
+    def request(self, method, path, headers, body):
+        session = getattr(self.session_local, "session", None)
+        if session is None:
+            session = self.session_local.session = self.requests.Session()
+        response = session.request(method, self.base_url + path, headers=headers, json=body)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        return response.status_code, payload, None
+
+class GunicornServer:
+    """Runs a local gunicorn with gunicorn.conf.py for the duration of a with-block."""
+
+    def __init__(self, workers, threads, database_url):
+        self.workers = workers
+        self.threads = threads
+        self.database_url = database_url
+        self.process = None
+
+    def __enter__(self):
+        import requests
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.pidfile = os.path.join(tempfile.gettempdir(), f"bench_gunicorn_{port}.pid")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app",
+             "--workers", str(self.workers), "--threads", str(self.threads),
+             "--bind", f"127.0.0.1:{port}", "--pid", self.pidfile, "--access-logfile", "/dev/null"],
+            cwd=here, env=dict(os.environ, DATABASE_URL=self.database_url),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.perf_counter() + 60
+        while time.perf_counter() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            try:
+                requests.get(url + "/api/users", timeout=1)
+                return url
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError("gunicorn did not start within 60s")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=60)
+
+def run_level(driver, method, path, headers, body, concurrency, total_requests, max_seconds):
+    """Issue ``total_requests`` calls with ``concurrency`` workers and summarise them."""
+    latencies = []
+    query_counts = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + max_seconds
+
+    def call(_):
+        nonlocal errors
+        # Always let each worker do at least one request, then respect the deadline.
+        if time.perf_counter() > deadline and len(latencies) >= concurrency:
+            return
+        start = time.perf_counter()
+        try:
+            status, _, queries = driver.request(method, path, headers, body)
+        except Exception:
+            status, queries = 599, None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if queries is not None:
+                query_counts.append(queries)
+            if status >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(total_requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(statistics.fmean(latencies)) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else None,
+        "queries_per_request": round(statistics.fmean(query_counts), 2) if query_counts else None,
+    }
+
+def compare(results, baseline_path, snapshots=False):
+    """Print p95 latency and query-count deltas against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["endpoint"], r["concurrency"], r.get("workers")): r for r in baseline["results"]}
+
+    print(f"\nComparison against {baseline_path} (rev {baseline['meta'].get('git_revision')}):")
+    if baseline["meta"].get("public_snapshots") != snapshots:
+        print(f"Note: public snapshots were {baseline['meta'].get('public_snapshots')} in the baseline "
+              f"and {snapshots} in this run")
+    print(f"{'endpoint':<28}{'conc':>5}{'p95 before':>12}{'p95 after':>12}{'change':>10}{'queries':>16}")
+    for r in results:
+        old = previous.get((r["endpoint"], r["concurrency"], r.get("workers")))
+        if not old or not old["p95_ms"] or r["p95_ms"] is None:
+            continue
+        change = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+        queries = f"{old['queries_per_request']} -> {r['queries_per_request']}"
+        print(f"{r['endpoint']:<28}{r['concurrency']:>5}{old['p95_ms']:>12.2f}{r['p95_ms']:>12.2f}{change:>9.1f}%{queries:>16}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Transparency Ledger endpoints")
+    parser.add_argument("--database-url", default="sqlite:///benchmark.db",
+                        help="Database to seed and benchmark (never point this at real data)")
+    parser.add_argument("--departments", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--feedback", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the existing benchmark database")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--max-seconds", type=float, default=30.0,
+                        help="Stop a level early once this much time has passed")
+    parser.add_argument("--endpoints", help="Comma-separated subset of endpoint names")
+    parser.add_argument("--include-writes", action="store_true", help="Also benchmark POST endpoints")
+    parser.add_argument("--url", help="Drive a running server (started with the same DATABASE_URL) instead of the test client")
+    parser.add_argument("--serve-workers", help="Comma-separated gunicorn worker counts to benchmark the read endpoints against")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per gunicorn worker with --serve-workers")
+    parser.add_argument("--snapshots", choices=("off", "on"), default="off",
+                        help="Serve the public views from published snapshots (on) or always live (off)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    # Must be set before the app is created, as create_app() reads them;
+    # gunicorn workers inherit them too.
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["PUBLIC_SNAPSHOTS"] = "true" if args.snapshots == "on" else "false"
+
+    from app import app
+    from models import Department, Transaction
+    from bench_data import seed_database
+    from snapshots import publish
+
+    with app.app_context():
+        if not args.skip_seed:
+            started = time.perf_counter()
+            counts = seed_database(args.departments, args.depth, args.users,
+                                   args.transactions, args.feedback, args.seed)
+            print(f"Seeded {counts} in {time.perf_counter() - started:.2f}s")
+        if args.snapshots == "on":
+            # Serve snapshots from the first request, not after the first write
+            publish(app)
+        dept = Department.query.order_by(Department.created_at, Department.dept_id).first()
+        tx = Transaction.query.order_by(Transaction.transaction_id).first()
+        params = {
+            "dept_id": dept.dept_id if dept else "missing",
+            "transaction_id": tx.transaction_id if tx else 0,
+        }
+
+    selected = set(args.endpoints.split(",")) if args.endpoints else None
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    def run_endpoints(driver, workers=None):
+        status, payload, _ = driver.request("POST", "/api/login", {},
+                                            {"email": "admin@transparency.com", "password": "admin123"})
+        if status != 200:
+            sys.exit(f"Could not log in as admin (HTTP {status})")
+        auth_headers = {"Authorization": f"Bearer {payload['token']}"}
+
+        results = []
+        for name, method, template, needs_auth, body in ENDPOINTS:
+            if selected is not None and name not in selected:
+                continue
+            if method != "GET" and (workers is not None or (not args.include_writes and selected is None)):
+                continue
+            path = fill(template, params)
+            headers = auth_headers if needs_auth else {}
+            body = fill(body, params)
+            driver.request(method, path, headers, body)  # warm-up
+            for level in levels:
+                summary = run_level(driver, method, path, headers, body, level, args.requests, args.max_seconds)
+                summary["endpoint"] = name
+                summary["workers"] = workers
+                results.append(summary)
+                prefix = f"w={workers:<3} " if workers is not None else ""
+                print(f"{prefix}{name:<28} c={level:<3} p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms "
+                      f"p99={summary['p99_ms']}ms rps={summary['throughput_rps']} "
+                      f"queries={summary['queries_per_request']} errors={summary['errors']}")
+        return results
+
+    if args.serve_workers:
+        mode = "gunicorn"
+        results = []
+        for workers in [int(w) for w in args.serve_workers.split(",")]:
+            with GunicornServer(workers, args.threads, args.database_url) as url:
+                results.extend(run_endpoints(HTTPDriver(url), workers))
+    else:
+        mode = "http" if args.url else "test_client"
+        results = run_endpoints(HTTPDriver(args.url) if args.url else TestClientDriver(app))
+
+    output = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "mode": mode,
+            "public_snapshots": args.snapshots == "on",
+            "cpu_count": os.cpu_count(),
+            "threads_per_worker": args.threads if args.serve_workers else None,
+            "database_url": args.database_url,
+            "dataset": {
+                "departments": args.departments,
+                "depth": args.depth,
+                "users": args.users,
+                "transactions": args.transactions,
+                "feedback": args.feedback,
+                "seed": args.seed,
+            },
+            "requests_per_level": args.requests,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare, args.snapshots == "on")
+
+if __name__ == "__main__":
+    main()
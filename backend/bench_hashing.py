@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Hashing micro-benchmark for The Transparency Ledger.
+
+Times how long each hash version takes to chain synthetic transactions,
+at several batch sizes, and reports the cost per row. No database is
+needed; rows are built in memory with the same field types the create
+path and the verifier pass to the hash functions.
+
+Example:
+    python bench_hashing.py --sizes 1,100,10000,100000 --output hashing.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from utils import hash_transaction, HASH_VERSIONS, LEGACY_HASH_VERSION
+
+def _rows(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        rows.append({
+            "dept_id": "d%035d" % rng.randrange(10 ** 6),
+            "amount": Decimal(rng.randrange(100, 10 ** 8)) / 100,
+            "purpose": "Benchmark purchase order %d" % i,
+            "created_by_id": "u%035d" % rng.randrange(10 ** 6),
+            "invoice_url": None,
+            "created_at": start + timedelta(seconds=i, microseconds=rng.randrange(10 ** 6)),
+        })
+    return rows
+
+def _legacy(row):
+    """Version 1 takes the legacy string formatting."""
+    return {
+        "dept_id": row["dept_id"],
+        "amount": str(row["amount"]),
+        "purpose": row["purpose"],
+        "status": "Pending",
+        "created_by_id": row["created_by_id"],
+        "approved_by_id": None,
+        "invoice_url": row["invoice_url"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+def run_chain(rows, version):
+    previous_hash = ""
+    started = time.perf_counter()
+    for row in rows:
+        previous_hash = hash_transaction(row, previous_hash, version)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-row transaction hashing cost")
+    parser.add_argument("--sizes", default="1,100,10000,100000", help="Comma-separated batch sizes")
+    parser.add_argument("--versions", default=",".join(str(v) for v in HASH_VERSIONS),
+                        help="Comma-separated hash versions")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    versions = [int(v) for v in args.versions.split(",")]
+    results = []
+
+    print(f"{'version':>7} {'rows':>8} {'total ms':>10} {'us/row':>8}")
+    for size in sizes:
+        rows = _rows(size, args.seed)
+        legacy_rows = [_legacy(row) for row in rows]
+        for version in versions:
+            batch = legacy_rows if version == LEGACY_HASH_VERSION else rows
+            # Repeat small batches so each timed run is long enough to measure.
+            loops = max(1, 200_000 // max(size, 1) // 100)
+            best = min(
+                sum(run_chain(batch, version) for _ in range(loops)) / loops
+                for _ in range(args.repeat)
+            )
+            per_row_us = best / size * 1e6
+            results.append({"version": version, "rows": size, "seconds": best, "us_per_row": per_row_us})
+            print(f"{version:>7} {size:>8} {best * 1000:>10.2f} {per_row_us:>8.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "generated_at": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
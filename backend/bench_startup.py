@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Process startup benchmark for The Transparency Ledger.
+
+Each run starts a fresh interpreter and measures, in order: importing
+``app``, building the application with ``create_app()``, and serving the
+first request through the test client. A second measurement mimics a
+preloading server such as gunicorn --preload: the parent imports and
+builds the app once, then forks, and the child's time from fork to its
+first response is recorded.
+
+The database is bootstrapped once before the runs; nothing in the timed
+path creates tables or users.
+
+Example:
+    python bench_startup.py --runs 10 --path /api/users
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, os, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app()
+created = time.perf_counter()
+client = app.test_client()
+status = client.get(sys.argv[1]).status_code
+served = time.perf_counter()
+
+read_fd, write_fd = os.pipe()
+forked = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    os.close(read_fd)
+    child_status = app.test_client().get(sys.argv[1]).status_code
+    os.write(write_fd, json.dumps([time.perf_counter() - forked, child_status]).encode())
+    os._exit(0)
+os.close(write_fd)
+with os.fdopen(read_fd) as pipe:
+    fork_seconds, child_status = json.loads(pipe.read())
+os.waitpid(pid, 0)
+
+print(json.dumps({
+    "import_seconds": imported - started,
+    "create_app_seconds": created - imported,
+    "first_request_seconds": served - created,
+    "total_seconds": served - started,
+    "fork_first_request_seconds": fork_seconds,
+    "status": status,
+    "child_status": child_status,
+}))
+"""
+
+METRICS = ("import_seconds", "create_app_seconds", "first_request_seconds", "total_seconds",
+           "fork_first_request_seconds")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Transparency Ledger process startup")
+    parser.add_argument("--database-url", default="sqlite:///startup_benchmark.db",
+                        help="Database the probe process connects to (never point this at real data)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/users", help="Endpoint used for the first request")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+    here = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "bootstrap"],
+                   cwd=here, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-c", PROBE, args.path],
+                                cwd=here, env=env, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    summary = {name: statistics.median(run[name] for run in runs) for name in METRICS}
+    for name in METRICS:
+        print(f"{name:<28} median {summary[name] * 1000:8.1f} ms   "
+              f"min {min(run[name] for run in runs) * 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "path": args.path,
+                "median": summary,
+                "runs": runs,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Client for the blockchain-backend API that anchors settled transactions.
+
+Single approvals post one record to ``/api/transactions`` (blocking, or
+awaited on an ``httpx.AsyncClient`` from the ASGI server); batch
+approvals post the whole approved set to ``/api/transactions/batch`` in
+one round trip and get back a hash or an error for each record.
+``lookup_receipts()`` fetches the on-chain receipts and decoded records
+of anchored hashes for the reconciliation job.
+
+``requests`` is imported on the first call, so processes that never
+anchor anything do not pay for loading it. Each thread keeps its own
+session, so lookups can run from a thread pool.
+"""
+
+import os
+import threading
+
+DEFAULT_TIMEOUT = 30
+MAX_BATCH = 500
+
+_local = threading.local()
+
+class BlockchainError(Exception):
+    """Raised when the blockchain API cannot be reached or refuses a record."""
+
+def _base_url():
+    return os.getenv("BLOCKCHAIN_API_URL", "http://localhost:3001")
+
+def _timeout():
+    return float(os.getenv("BLOCKCHAIN_TIMEOUT", DEFAULT_TIMEOUT))
+
+def _post(path, body, timeout):
+    """POST JSON to the blockchain API and return the decoded response."""
+    import requests
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    try:
+        return session.post(f"{_base_url()}{path}", json=body, timeout=timeout).json()
+    except (requests.RequestException, ValueError) as e:
+        raise BlockchainError(str(e))
+
+def _transaction_hash(data):
+    if not data.get("success"):
+        raise BlockchainError(data.get("error", "Unknown error"))
+    return data.get("transactionHash")
+
+def anchor_payload(tx, from_dept, to_dept):
+    """Build the record the contract stores for a transaction."""
+    return {
+        "fromDept": from_dept,
+        "toDept": to_dept,
+        "amount": str(tx.amount),
+        "purpose": tx.purpose
+    }
+
+def anchor_transaction(payload):
+    """
+    Record one transaction on the blockchain.
+
+    Args:
+        payload: Dict from ``anchor_payload``
+
+    Returns:
+        Blockchain transaction hash
+
+    Raises:
+        BlockchainError: If the API fails or reports an error
+    """
+    return _transaction_hash(_post("/api/transactions", payload, _timeout()))
+
+async def anchor_transaction_async(client, payload):
+    """
+    ``anchor_transaction()`` for async callers.
+
+    Args:
+        client: Shared ``httpx.AsyncClient``
+        payload: Dict from ``anchor_payload``
+
+    Returns:
+        Blockchain transaction hash
+
+    Raises:
+        BlockchainError: If the API fails or reports an error
+    """
+    import httpx
+    try:
+        response = await client.post(f"{_base_url()}/api/transactions", json=payload, timeout=_timeout())
+        data = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        raise BlockchainError(str(e))
+    return _transaction_hash(data)
+
+def anchor_batch(payloads):
+    """
+    Record several transactions with one API call.
+
+    Args:
+        payloads: List of dicts from ``anchor_payload``
+
+    Returns:
+        List, in input order, of dicts with ``success`` and either
+        ``transactionHash`` or ``error``
+
+    Raises:
+        BlockchainError: If the whole call fails
+    """
+    if not payloads:
+        return []
+    results = []
+    for start in range(0, len(payloads), MAX_BATCH):
+        chunk = payloads[start:start + MAX_BATCH]
+        data = _post("/api/transactions/batch", {"transactions": chunk}, _timeout() + len(chunk))
+        if not data.get("success") or len(data.get("results", [])) != len(chunk):
+            raise BlockchainError(data.get("error", "Unexpected batch response"))
+        results.extend(data["results"])
+    return results
+
+def lookup_receipts(hashes):
+    """
+    Look up anchored transactions on chain.
+
+    Args:
+        hashes: Blockchain transaction hashes (at most MAX_BATCH)
+
+    Returns:
+        List, in input order, of dicts with ``transactionHash`` and
+        ``found``; found receipts add ``status`` (1 mined, 0 reverted),
+        ``blockNumber`` and the decoded ``record`` (fromDept, toDept,
+        amount, purpose), or None when the receipt has no ledger event
+
+    Raises:
+        BlockchainError: If the call fails
+    """
+    if not hashes:
+        return []
+    data = _post("/api/receipts", {"hashes": list(hashes)}, _timeout())
+    if not data.get("success") or len(data.get("receipts", [])) != len(hashes):
+        raise BlockchainError(data.get("error", "Unexpected receipts response"))
+    return data["receipts"]
@@ -0,0 +1,343 @@
+"""
+Read-through cache for department and user lookups.
+
+Routes call ``cached_department()``, ``cached_user()`` and
+``cached_headed_department()`` instead of ``query.get``. Hits return a
+read-only snapshot of the row's columns (never ``password_hash``), so
+cached values are safe to share between requests, threads and processes.
+Rows that must be modified or locked are still loaded with
+``db.session.get``.
+
+Backends (``CACHE_BACKEND``):
+    lru     In-process LRU with a TTL (default). Each worker has its own
+            copy; invalidation reaches only the worker that did the write,
+            other workers see the change within CACHE_TTL seconds.
+    redis   Shared by all workers through CACHE_REDIS_URL (needs the
+            ``redis`` package); invalidation reaches every worker.
+    local   In-process stand-in for the shared backend, with the same
+            serialization and expiry semantics, for tests.
+    none    Disable caching.
+
+Committed ORM writes to users and departments invalidate their keys
+through session hooks; bulk SQL writes must call ``invalidate_user()``,
+``invalidate_department()`` or ``clear_cache()`` themselves. Lookups,
+hits, misses and backend errors are counted in ``/api/metrics``.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from flask import current_app, has_app_context
+from sqlalchemy import Enum, DateTime, Numeric, event, inspect
+from sqlalchemy.orm import Session
+
+from metrics import REGISTRY
+from models import db, User, Department
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 10000
+EXCLUDED_COLUMNS = {"password_hash"}
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    "ledger_cache_lookups", "Cache lookups by entity and result (hit, miss, error)", ("entity", "result"))
+CACHE_INVALIDATIONS = REGISTRY.counter(
+    "ledger_cache_invalidations", "Cache keys invalidated by entity", ("entity",))
+
+_listeners_installed = False
+
+class CacheError(Exception):
+    """Raised for an unknown or unusable cache backend."""
+
+class LRUBackend:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisBackend:
+    """Cache shared by all workers through Redis; values are stored as JSON."""
+
+    def __init__(self, client, prefix="ledger:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise CacheError("CACHE_BACKEND=redis requires the redis package")
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, int(ttl), json.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+class LocalRedisClient:
+    """The subset of the redis client RedisBackend uses, kept in process."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None or entry[0] < time.monotonic():
+                self._data.pop(name, None)
+                return None
+            return entry[1]
+
+    def setex(self, name, seconds, value):
+        with self._lock:
+            self._data[name] = (time.monotonic() + seconds, value.encode() if isinstance(value, str) else value)
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def scan_iter(self, match="*"):
+        prefix = match.rstrip("*")
+        with self._lock:
+            return [name for name in self._data if name.startswith(prefix)]
+
+def create_backend(name, config):
+    """Build the backend selected by CACHE_BACKEND."""
+    if name == "lru":
+        return LRUBackend(int(config.get("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+    if name == "redis":
+        return RedisBackend.from_url(config.get("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    if name == "local":
+        return RedisBackend(LocalRedisClient())
+    if name == "none":
+        return None
+    raise CacheError(f"Unknown cache backend {name!r}")
+
+def init_cache(app):
+    """
+    Attach the configured cache backend to a Flask app.
+
+    Config keys:
+        CACHE_BACKEND: lru, redis, local or none (default lru)
+        CACHE_TTL: Seconds an entry is reused (default 60)
+        CACHE_MAX_ENTRIES: LRU capacity (default 10000)
+        CACHE_REDIS_URL: Redis URL for the redis backend
+    """
+    app.config.setdefault("CACHE_BACKEND", "lru")
+    app.config.setdefault("CACHE_TTL", DEFAULT_TTL)
+    app.extensions["ledger_cache"] = create_backend(app.config["CACHE_BACKEND"], app.config)
+    install_cache_listeners()
+
+def _backend():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("ledger_cache")
+
+def _snapshot(row):
+    """JSON-safe dict of a row's columns."""
+    data = {}
+    for column in row.__table__.columns:
+        if column.key in EXCLUDED_COLUMNS:
+            continue
+        value = getattr(row, column.key)
+        if isinstance(value, Decimal):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        elif hasattr(value, "name") and isinstance(column.type, Enum):
+            value = value.name
+        data[column.key] = value
+    return data
+
+def _restore(model, data):
+    """Read-only object with the snapshot's columns converted back to Python types."""
+    values = dict(data)
+    for column in model.__table__.columns:
+        value = values.get(column.key)
+        if value is None:
+            continue
+        if isinstance(column.type, Enum) and column.type.enum_class is not None:
+            values[column.key] = column.type.enum_class[value]
+        elif isinstance(column.type, DateTime):
+            values[column.key] = datetime.fromisoformat(value)
+        elif isinstance(column.type, Numeric):
+            values[column.key] = Decimal(value)
+    return SimpleNamespace(**values)
+
+def _lookup(entity, key, load):
+    """Return the cached snapshot for ``key``, loading it with ``load()`` on a miss."""
+    backend = _backend()
+    if backend is None:
+        return load()
+    try:
+        cached = backend.get(key)
+    except Exception:
+        CACHE_LOOKUPS.inc(entity=entity, result="error")
+        return load()
+    if cached is not None:
+        CACHE_LOOKUPS.inc(entity=entity, result="hit")
+        return cached
+    CACHE_LOOKUPS.inc(entity=entity, result="miss")
+    value = load()
+    if value is not None:
+        try:
+            backend.set(key, value, current_app.config["CACHE_TTL"])
+        except Exception:
+            CACHE_LOOKUPS.inc(entity=entity, result="error")
+    return value
+
+def _user_key(user_id):
+    return f"user:{user_id}"
+
+def _department_key(dept_id):
+    return f"dept:{dept_id}"
+
+def _headed_key(user_id):
+    return f"headed:{user_id}"
+
+def cached_user(user_id):
+    """
+    User by primary key, through the cache.
+
+    Returns:
+        Read-only snapshot with the User columns except password_hash, or None
+    """
+    if not user_id:
+        return None
+    def load():
+        user = db.session.get(User, user_id)
+        return _snapshot(user) if user else None
+    data = _lookup("user", _user_key(user_id), load)
+    return _restore(User, data) if data else None
+
+def cached_department(dept_id):
+    """
+    Department by primary key, through the cache.
+
+    Returns:
+        Read-only snapshot with the Department columns, or None
+    """
+    if not dept_id:
+        return None
+    def load():
+        dept = db.session.get(Department, dept_id)
+        return _snapshot(dept) if dept else None
+    data = _lookup("department", _department_key(dept_id), load)
+    return _restore(Department, data) if data else None
+
+def cached_headed_department(user_id):
+    """
+    A department headed by ``user_id``, as the public feed names senders.
+
+    Returns:
+        Read-only Department snapshot, or None
+    """
+    if not user_id:
+        return None
+    def load():
+        dept = Department.query.filter_by(head_user_id=user_id).first()
+        # A user who heads nothing is cached too, as an empty marker
+        return {"dept_id": dept.dept_id} if dept else {"dept_id": None}
+    marker = _lookup("headed_department", _headed_key(user_id), load)
+    return cached_department(marker["dept_id"]) if marker and marker["dept_id"] else None
+
+def _delete(entity, *keys):
+    backend = _backend()
+    if backend is None or not keys:
+        return
+    try:
+        backend.delete(*keys)
+    except Exception:
+        CACHE_LOOKUPS.inc(entity=entity, result="error")
+        return
+    CACHE_INVALIDATIONS.inc(len(keys), entity=entity)
+
+def invalidate_user(user_id):
+    """Drop a cached user and which department they head."""
+    _delete("user", _user_key(user_id), _headed_key(user_id))
+
+def invalidate_department(dept_id, head_user_ids=()):
+    """Drop a cached department and the head lookups of its old/new heads."""
+    _delete("department", _department_key(dept_id), *(_headed_key(u) for u in head_user_ids if u))
+
+def clear_cache():
+    """Drop every cached entry (after bulk loads or schema changes)."""
+    backend = _backend()
+    if backend is not None:
+        backend.clear()
+
+def _collect(session, flush_context):
+    pending = session.info.setdefault("cache_invalidate", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            pending.add(("user", obj.user_id, ()))
+        elif isinstance(obj, Department):
+            history = inspect(obj).attrs.head_user_id.history
+            heads = tuple(set(history.deleted or ()) | set(history.added or ()) | {obj.head_user_id})
+            pending.add(("department", obj.dept_id, heads))
+
+def _after_commit(session):
+    for entity, key, heads in session.info.pop("cache_invalidate", ()):
+        if entity == "user":
+            invalidate_user(key)
+        else:
+            invalidate_department(key, heads)
+
+def _after_rollback(session):
+    session.info.pop("cache_invalidate", None)
+
+def install_cache_listeners():
+    """Invalidate cached users and departments after committed ORM writes (idempotent)."""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Session, "after_flush", _collect)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", lambda session, previous: _after_rollback(session))
+        _listeners_installed = True
@@ -0,0 +1,135 @@
+"""
+Gemini-backed answers for the public chatbot endpoint.
+
+Imported lazily by ``/api/chatbot`` so that the HTTP client is only
+loaded by processes that actually serve chatbot questions. The prompt is
+built by ``gemini_request()`` and the reply read by ``parse_answer()``,
+shared by the blocking WSGI path and the async ASGI path.
+"""
+
+import json
+import logging
+import os
+
+from models import User, Department, Transaction
+from dashboard import dept_names_by_head, sender_name
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+GEMINI_HEADERS = {
+    "Content-Type": "application/json"
+}
+GEMINI_TIMEOUT = 60
+MAX_ANSWER_CHARS = 400
+
+logger = logging.getLogger(__name__)
+
+def _context():
+    """Departments, budgets and recent transactions as prompt context (three queries)."""
+    departments = Department.query.all()
+    transactions = Transaction.query.order_by(Transaction.created_at.desc()).limit(20).all()
+    dept_info = [
+        f"{d.name}: Budget ${d.allocated_budget}" for d in departments
+    ]
+    # Same fromDept/toDept naming as the public transactions endpoint
+    dept_names = {d.dept_id: d.name for d in departments}
+    headed_dept_names = dept_names_by_head(departments)
+    creator_ids = {t.created_by_id for t in transactions}
+    creators = {u.user_id: u for u in User.query.filter(User.user_id.in_(creator_ids)).all()} if creator_ids else {}
+    tx_info = []
+    for t in transactions:
+        from_dept = sender_name(creators.get(t.created_by_id), headed_dept_names)
+        to_dept = dept_names.get(t.dept_id, "Unknown")
+        tx_info.append(
+            f"{t.created_at.date()} | From: {from_dept} | To: {to_dept} | Purpose: {t.purpose} | Amount: {t.amount} | Status: {t.status.value}"
+        )
+
+    return (
+        "Departments and Budgets:\n" +
+        "\n".join(dept_info) +
+        "\n\nRecent Transactions:\n" +
+        "\n".join(tx_info)
+    )
+
+def _trim(answer):
+    """Cut long answers at the last full sentence."""
+    if len(answer) <= MAX_ANSWER_CHARS:
+        return answer
+    trimmed = answer[:MAX_ANSWER_CHARS]
+    last_period = trimmed.rfind('.')
+    if last_period != -1:
+        return trimmed[:last_period+1]
+    return trimmed + "..."
+
+def gemini_request(question):
+    """
+    Build the Gemini call for a question. Reads the database for context.
+
+    Returns:
+        Tuple of (url, JSON payload), or None if GEMINI_API_KEY is not set
+    """
+    # Call Gemini API (replace with your actual Gemini endpoint and key)
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    if not GEMINI_API_KEY:
+        return None
+
+    gemini_payload = {
+        "contents": [
+            {"role": "user", "parts": [{
+                "text": (
+                    "You are a helpful assistant for transparency and budget queries. "
+                    "Always answer in 2-4 sentences, be concise, and use bullet points if listing items. "
+                    "If the user asks for a summary or comparison, give only the most important facts. "
+                    "If the question is unclear, politely ask for clarification. "
+                    f"\n\nUser question: {question}\n\nContext:\n{_context()}"
+                )
+            }]}
+        ]
+    }
+    gemini_url = f"{os.getenv('GEMINI_API_URL', GEMINI_API_URL)}?key={GEMINI_API_KEY}"
+    return gemini_url, gemini_payload
+
+def parse_answer(status_code, text):
+    """Turn a Gemini HTTP response into (answer text, HTTP status)."""
+    logger.debug("Gemini API status %s: %s", status_code, text)
+    if status_code != 200:
+        return "Sorry, there was an error contacting Gemini.", 200
+    answer = json.loads(text).get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "Sorry, I couldn't find an answer.")
+    return _trim(answer), 200
+
+def answer_question(question):
+    """
+    Ask Gemini a question about the ledger, blocking until it answers.
+
+    Args:
+        question: The user's question
+
+    Returns:
+        Tuple of (answer text, HTTP status)
+    """
+    import requests
+    call = gemini_request(question)
+    if call is None:
+        return "Gemini API key not set.", 500
+    url, payload = call
+    r = requests.post(url, headers=GEMINI_HEADERS, json=payload)
+    return parse_answer(r.status_code, r.text)
+
+async def answer_question_async(client, question, run_db):
+    """
+    ``answer_question()`` for async callers.
+
+    Args:
+        client: Shared ``httpx.AsyncClient``
+        question: The user's question
+        run_db: Coroutine function running a callable in an app context
+            off the event loop (see asgi.py)
+
+    Returns:
+        Tuple of (answer text, HTTP status)
+    """
+    call = await run_db(gemini_request, question)
+    if call is None:
+        return "Gemini API key not set.", 500
+    url, payload = call
+    r = await client.post(url, headers=GEMINI_HEADERS, json=payload, timeout=GEMINI_TIMEOUT)
+    return parse_answer(r.status_code, r.text)
@@ -0,0 +1,268 @@
+"""
+Aggregates behind the admin dashboard.
+
+``department_balances()`` is shared by ``/api/departments/balances`` and
+``/api/dashboard/summary``. Balances, totals and pending counts come from
+the spending rollups (per department and per sender) and the activity
+lists from short index-ordered scans, so the cost does not grow with the
+ledger. Summaries are cached in-process for DASHBOARD_CACHE_TTL seconds,
+and dropped when a committed write touches transactions, departments or
+users (feedback and other tables never show up in a summary).
+"""
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session
+
+from models import db, User, Department, Transaction, UserRole, TransactionStatus, MonthlySpendingRollup, is_anomalous
+from rollups import settled_totals
+
+ADMIN_BUDGET = 100_000_000  # Admin preset budget
+ADMIN_OPENING_BALANCE = 500_000_000  # Admin preset balance
+DEFAULT_CACHE_TTL = 5
+MAX_RECENT = 200
+# Tables a summary is built from; writes to any other table keep the cache
+SUMMARY_TABLES = {"transactions", "departments", "users"}
+
+_cache = {}
+_cache_lock = threading.Lock()
+_listeners_installed = False
+
+def sender_name(creator, headed_dept_names):
+    """Name shown as the sending side of a transaction, as in the public feed."""
+    if creator and creator.role == UserRole.Admin:
+        return "Admin"
+    if creator and creator.role == UserRole.DeptHead:
+        return headed_dept_names.get(creator.user_id, creator.name)
+    return creator.name if creator else "Unknown"
+
+def dept_names_by_head(departments):
+    """Map of head user id to the (first) department they head, for ``sender_name()``."""
+    names = {}
+    for dept in departments:
+        names.setdefault(dept.head_user_id, dept.name)
+    return names
+
+def department_balances(departments=None):
+    """
+    Balances, budgets and overrun alerts for all departments and the admin.
+
+    Settled and approved amounts per receiving department and per creator
+    come from the spending rollups (which include archived history), and
+    are matched to departments by name as the ledger UI shows them.
+
+    Args:
+        departments: Already loaded Department rows (default: all)
+
+    Returns:
+        Dict with ``departments``, ``admin`` and ``alerts``
+    """
+    departments = Department.query.all() if departments is None else departments
+    result = []
+    alerts = []
+
+    received, sent = settled_totals()
+
+    dept_names = {dept.dept_id: dept.name for dept in departments}
+    headed_dept_names = dept_names_by_head(departments)
+    creators = {u.user_id: u for u in User.query.filter(User.user_id.in_(list(sent))).all()} if sent else {}
+
+    in_by_name = defaultdict(float)
+    for dept_id, amount in received.items():
+        in_by_name[dept_names.get(dept_id, "Unknown")] += amount
+    out_by_name = defaultdict(float)
+    for user_id, amount in sent.items():
+        out_by_name[sender_name(creators.get(user_id), headed_dept_names)] += amount
+
+    # Admin is the sender for all outgoing allocations
+    admin_out = out_by_name["Admin"]
+    admin_in = in_by_name["Admin"]
+    admin_balance = ADMIN_OPENING_BALANCE + admin_in - admin_out
+
+    if ADMIN_BUDGET and admin_out > ADMIN_BUDGET:
+        alerts.append({
+            "type": "overrun",
+            "entity": "Admin",
+            "amount": admin_out,
+            "budget": ADMIN_BUDGET,
+            "message": f"Admin has spent {admin_out}, which exceeds the budget of {ADMIN_BUDGET}."
+        })
+
+    for dept in departments:
+        balance = in_by_name[dept.name] - out_by_name[dept.name]
+        budget = float(dept.allocated_budget or 0)
+        result.append({
+            "dept_id": str(dept.dept_id),
+            "name": dept.name,
+            "budget": budget,
+            "balance": balance
+        })
+        if budget and balance < 0:
+            alerts.append({
+                "type": "overrun",
+                "entity": dept.name,
+                "amount": abs(balance),
+                "budget": budget,
+                "message": f"{dept.name} has overspent by {abs(balance):,.2f} (budget: {budget:,.2f})."
+            })
+
+    return {
+        "departments": result,
+        "admin": {"balance": admin_balance, "budget": ADMIN_BUDGET},
+        "alerts": alerts
+    }
+
+def _activity(transactions, dept_names, headed_dept_names):
+    """Serialize transactions in the /api/public/transactions format."""
+    creator_ids = {tx.created_by_id for tx in transactions}
+    creators = {u.user_id: u for u in User.query.filter(User.user_id.in_(creator_ids)).all()} if creator_ids else {}
+    return [{
+        "transaction_id": str(tx.transaction_id),
+        "amount": float(tx.amount),
+        "purpose": tx.purpose,
+        "fromDept": sender_name(creators.get(tx.created_by_id), headed_dept_names),
+        "toDept": dept_names.get(tx.dept_id, "Unknown"),
+        "status": tx.status.value,
+        "created_at": tx.created_at.isoformat(),
+        "transaction_hash": tx.blockchain_hash,
+        "rejection_reason": tx.rejection_reason,
+        "anomaly": is_anomalous(tx),
+        "anomaly_score": tx.anomaly_score,
+        "anomaly_reasons": tx.anomaly_reasons,
+    } for tx in transactions]
+
+def build_summary(recent=50, anomalies=10):
+    """
+    Everything the dashboard shows on load, in one payload.
+
+    Args:
+        recent: Number of most recent transactions to include
+        anomalies: Number of most recent anomalous transactions to include
+
+    Returns:
+        Dict with ``totals``, ``departments`` (details, balances and
+        pending counts), ``admin``, ``alerts``, ``recent_anomalies`` and
+        ``recent_activity``
+    """
+    departments = Department.query.all()
+    balances = department_balances(departments)
+
+    by_status = {s.value: {"count": 0, "volume": 0.0} for s in TransactionStatus}
+    pending_by_dept = defaultdict(int)
+    totals_query = (
+        db.session.query(
+            MonthlySpendingRollup.dept_id, MonthlySpendingRollup.status,
+            func.sum(MonthlySpendingRollup.tx_count),
+            func.sum(MonthlySpendingRollup.sum_in) - func.sum(MonthlySpendingRollup.sum_out),
+        )
+        .group_by(MonthlySpendingRollup.dept_id, MonthlySpendingRollup.status)
+    )
+    for dept_id, status, count, volume in totals_query:
+        by_status[status.value]["count"] += int(count or 0)
+        by_status[status.value]["volume"] += float(volume or 0)
+        if status == TransactionStatus.Pending:
+            pending_by_dept[dept_id] += int(count or 0)
+
+    dept_names = {dept.dept_id: dept.name for dept in departments}
+    headed_dept_names = dept_names_by_head(departments)
+    heads = {u.user_id: u.name for u in User.query.filter(
+        User.user_id.in_({d.head_user_id for d in departments if d.head_user_id})
+    ).all()} if departments else {}
+    balance_by_id = {b["dept_id"]: b for b in balances["departments"]}
+    department_rows = [{
+        "dept_id": str(dept.dept_id),
+        "name": dept.name,
+        "description": dept.description,
+        "parent_dept_id": str(dept.parent_dept_id) if dept.parent_dept_id else None,
+        "head_user_id": str(dept.head_user_id) if dept.head_user_id else None,
+        "head_user_name": heads.get(dept.head_user_id),
+        "allocated_budget": float(dept.allocated_budget or 0),
+        "created_at": dept.created_at.isoformat(),
+        "budget": balance_by_id[str(dept.dept_id)]["budget"],
+        "balance": balance_by_id[str(dept.dept_id)]["balance"],
+        "pending_count": pending_by_dept[dept.dept_id],
+    } for dept in departments]
+
+    # Newest first by primary key: rows are appended in created_at order.
+    recent_rows = Transaction.query.order_by(Transaction.transaction_id.desc()).limit(recent).all()
+    anomaly_rows = (
+        Transaction.query
+        .filter(or_(Transaction.anomaly.is_(True), Transaction.anomaly_score >= 1.0))
+        .order_by(Transaction.transaction_id.desc())
+        .limit(anomalies)
+        .all()
+    )
+
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "totals": {
+            "transaction_count": sum(s["count"] for s in by_status.values()),
+            "total_volume": round(sum(s["volume"] for s in by_status.values()), 4),
+            "pending_count": by_status[TransactionStatus.Pending.value]["count"],
+            "department_count": len(departments),
+            "by_status": {k: {"count": v["count"], "volume": round(v["volume"], 4)} for k, v in by_status.items()},
+        },
+        "departments": department_rows,
+        "admin": balances["admin"],
+        "alerts": balances["alerts"],
+        "recent_anomalies": _activity(anomaly_rows, dept_names, headed_dept_names),
+        "recent_activity": _activity(recent_rows, dept_names, headed_dept_names),
+    }
+
+def cached_summary(recent=50, anomalies=10):
+    """
+    ``build_summary()`` behind a short-lived in-process cache.
+
+    Returns:
+        Tuple of (summary, age in seconds)
+    """
+    ttl = current_app.config.get("DASHBOARD_CACHE_TTL", DEFAULT_CACHE_TTL)
+    key = (min(recent, MAX_RECENT), min(anomalies, MAX_RECENT))
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry and now - entry[0] < ttl:
+            return entry[1], now - entry[0]
+    summary = build_summary(*key)
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), summary)
+    return summary, 0.0
+
+def invalidate_summary():
+    with _cache_lock:
+        _cache.clear()
+
+def _mark_dirty(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if getattr(obj, "__tablename__", None) in SUMMARY_TABLES:
+            session.info["dashboard_dirty"] = True
+            return
+
+def _mark_execute(orm_execute_state):
+    # Bulk UPDATE/DELETE through the session (anomaly rescores, archiving)
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if getattr(table, "name", None) in SUMMARY_TABLES:
+            orm_execute_state.session.info["dashboard_dirty"] = True
+
+def _clear_dirty(session, previous_transaction):
+    session.info.pop("dashboard_dirty", None)
+
+def _after_commit(session):
+    if session.info.pop("dashboard_dirty", False):
+        invalidate_summary()
+
+def install_cache_invalidation():
+    """Drop cached summaries after committed writes to their tables (idempotent)."""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Session, "after_flush", _mark_dirty)
+        event.listen(Session, "do_orm_execute", _mark_execute)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _clear_dirty)
+        _listeners_installed = True
@@ -0,0 +1,433 @@
+"""
+Public feedback: per-transaction aggregates, bulk reads and a buffered writer.
+
+``feedback_summaries`` holds one row per commented transaction with the
+comment count and a preview of the newest comment, so feeds can show
+them inline with a join instead of one ``GET /api/feedback/<id>`` per
+row. ORM writes keep the summaries current through a session
+``after_flush`` hook; bulk inserts that bypass the ORM (bench_data.py)
+must call ``rebuild_feedback_summaries()`` afterwards.
+
+``POST /api/feedback/<id>`` hands comments to a FeedbackWriter, which
+buffers them for up to FEEDBACK_FLUSH_MS or FEEDBACK_BATCH_SIZE comments.
+It checks all their transaction ids with one query and commits the batch
+in one transaction. With FEEDBACK_WAIT (the default) each request waits
+for its batch, so it still answers 201 with the stored comment or 404
+for an unknown transaction; otherwise it answers 202 as soon as the
+comment is queued. FEEDBACK_BUFFER=false commits every comment on its
+own, as before.
+"""
+
+import atexit
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import event, func, inspect, select, case, or_
+from sqlalchemy.orm import Session
+
+from metrics import REGISTRY
+from models import db, Transaction, Feedback, FeedbackSummary
+from rollups import UPSERT_INSERTS
+
+PREVIEW_LENGTH = 140
+MAX_BULK_IDS = 500
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_MS = 50
+WAIT_TIMEOUT = 10  # Seconds a request waits for its batch before answering 202
+IDLE_SECONDS = 5  # An idle writer's thread exits after this long and restarts on the next comment
+
+FEEDBACK_WRITES = REGISTRY.counter(
+    "ledger_feedback_writes", "Feedback comments by result (saved, rejected, failed)", ("result",))
+FEEDBACK_BATCH_SIZE = REGISTRY.histogram(
+    "ledger_feedback_batch_size", "Comments committed per feedback batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500))
+
+_listeners_installed = False
+_hooks_installed = False
+# Live writers, for the fork and exit hooks; weak so that discarded apps
+# (tests, benchmarks creating many) are not kept alive by them
+_writers = weakref.WeakSet()
+
+class FeedbackError(Exception):
+    """Raised when a comment cannot be stored; carries the HTTP status."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def _preview(comment):
+    if comment is None or len(comment) <= PREVIEW_LENGTH:
+        return comment
+    return comment[:PREVIEW_LENGTH - 1].rstrip() + "…"
+
+def feedback_json(feedback):
+    return {
+        "feedback_id": feedback.feedback_id,
+        "comment": feedback.comment,
+        "created_at": feedback.created_at.isoformat()
+    }
+
+def summary_fields(summary):
+    """Feed fields for a FeedbackSummary (or None for a transaction without comments)."""
+    if summary is None or not summary.feedback_count:
+        return {"feedback_count": 0, "latest_feedback": None}
+    return {
+        "feedback_count": summary.feedback_count,
+        "latest_feedback": {
+            "feedback_id": summary.latest_feedback_id,
+            "comment": summary.latest_comment,
+            "created_at": summary.latest_at.isoformat() if summary.latest_at else None
+        }
+    }
+
+# Summary maintenance
+
+def _summary_rows(execute, transaction_ids=None):
+    """Summary rows computed from the feedback table, for some or all transactions."""
+    order = (Feedback.created_at.desc(), Feedback.feedback_id.desc())
+    ranked = select(
+        Feedback.transaction_id,
+        Feedback.feedback_id,
+        Feedback.comment,
+        Feedback.created_at,
+        func.count().over(partition_by=Feedback.transaction_id).label("feedback_count"),
+        func.row_number().over(partition_by=Feedback.transaction_id, order_by=order).label("rank"),
+    )
+    if transaction_ids is not None:
+        ranked = ranked.where(Feedback.transaction_id.in_(transaction_ids))
+    ranked = ranked.subquery()
+    return [{
+        "transaction_id": row.transaction_id,
+        "feedback_count": row.feedback_count,
+        "latest_feedback_id": row.feedback_id,
+        "latest_comment": _preview(row.comment),
+        "latest_at": row.created_at,
+    } for row in execute(select(ranked).where(ranked.c.rank == 1))]
+
+def _recompute(conn, transaction_ids):
+    table = FeedbackSummary.__table__
+    ids = list(transaction_ids)
+    conn.execute(table.delete().where(table.c.transaction_id.in_(ids)))
+    rows = _summary_rows(conn.execute, ids)
+    if rows:
+        conn.execute(table.insert(), rows)
+
+def _add(conn, transaction_id, count, latest):
+    # One INSERT ... ON CONFLICT DO UPDATE where the dialect has it, so the
+    # first comments on a transaction from two writers cannot both insert
+    table = FeedbackSummary.__table__
+    newer = or_(table.c.latest_at.is_(None), table.c.latest_at <= latest.created_at)
+    changes = {
+        "feedback_count": table.c.feedback_count + count,
+        "latest_feedback_id": case((newer, latest.feedback_id), else_=table.c.latest_feedback_id),
+        "latest_comment": case((newer, _preview(latest.comment)), else_=table.c.latest_comment),
+        "latest_at": case((newer, latest.created_at), else_=table.c.latest_at),
+    }
+    insert = UPSERT_INSERTS.get(conn.dialect.name)
+    if insert is not None:
+        conn.execute(insert(table).values(
+            transaction_id=transaction_id, feedback_count=count, latest_feedback_id=latest.feedback_id,
+            latest_comment=_preview(latest.comment), latest_at=latest.created_at,
+        ).on_conflict_do_update(index_elements=[table.c.transaction_id], set_=changes))
+        return
+    result = conn.execute(table.update().where(table.c.transaction_id == transaction_id).values(**changes))
+    if result.rowcount == 0:
+        conn.execute(table.insert().values(
+            transaction_id=transaction_id, feedback_count=count, latest_feedback_id=latest.feedback_id,
+            latest_comment=_preview(latest.comment), latest_at=latest.created_at,
+        ))
+
+def _after_flush(session, flush_context):
+    added = defaultdict(list)
+    changed = set()
+    for obj in session.new:
+        if isinstance(obj, Feedback):
+            added[obj.transaction_id].append(obj)
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Feedback) and (obj in session.deleted or session.is_modified(obj)):
+            history = inspect(obj).attrs.transaction_id.history
+            changed.update(history.deleted or ())
+            changed.add(obj.transaction_id)
+    if not added and not changed:
+        return
+    conn = session.connection()
+    for transaction_id, comments in added.items():
+        if transaction_id not in changed:
+            latest = max(comments, key=lambda f: (f.created_at or datetime.min, f.feedback_id))
+            _add(conn, transaction_id, len(comments), latest)
+    if changed:
+        # Edits and deletes may replace the newest comment; recount from the table
+        _recompute(conn, changed)
+
+def install_feedback_listeners():
+    """Keep the feedback summaries in step with ORM feedback writes (idempotent)."""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Session, "after_flush", _after_flush)
+        _listeners_installed = True
+
+def rebuild_feedback_summaries():
+    """
+    Recompute every feedback summary from the feedback table.
+    Must be called inside an application context.
+
+    Returns:
+        Number of summaries written
+    """
+    rows = _summary_rows(db.session.execute)
+    db.session.execute(FeedbackSummary.__table__.delete())
+    for start in range(0, len(rows), 5000):
+        db.session.execute(FeedbackSummary.__table__.insert(), rows[start:start + 5000])
+    db.session.commit()
+    return len(rows)
+
+# Reads
+
+def parse_ids(value):
+    """
+    Parse a comma-separated ``ids`` query parameter.
+
+    Raises:
+        FeedbackError: 400 if it is empty, malformed or too long
+    """
+    try:
+        ids = list(dict.fromkeys(int(part) for part in (value or "").split(",") if part.strip()))
+    except ValueError:
+        raise FeedbackError("ids must be comma-separated transaction ids", 400)
+    if not ids:
+        raise FeedbackError("ids is required", 400)
+    if len(ids) > MAX_BULK_IDS:
+        raise FeedbackError(f"At most {MAX_BULK_IDS} ids per request", 400)
+    return ids
+
+def bulk_feedback(transaction_ids, limit=None):
+    """
+    Comments for many transactions with one query.
+
+    Args:
+        transaction_ids: Transactions to read
+        limit: Newest comments returned per transaction (None for all)
+
+    Returns:
+        Dict of transaction id -> {"feedback_count", "feedback"}, with an
+        entry (count 0) for every requested id
+    """
+    counts = dict(db.session.execute(
+        select(FeedbackSummary.transaction_id, FeedbackSummary.feedback_count)
+        .where(FeedbackSummary.transaction_id.in_(transaction_ids))
+    ).all())
+    result = {tx_id: {"feedback_count": counts.get(tx_id, 0), "feedback": []} for tx_id in transaction_ids}
+    wanted = [tx_id for tx_id in transaction_ids if counts.get(tx_id)]
+    if not wanted:
+        return result
+
+    order = (Feedback.created_at.desc(), Feedback.feedback_id.desc())
+    ranked = select(
+        Feedback.transaction_id, Feedback.feedback_id, Feedback.comment, Feedback.created_at,
+        func.row_number().over(partition_by=Feedback.transaction_id, order_by=order).label("rank"),
+    ).where(Feedback.transaction_id.in_(wanted)).subquery()
+    query = select(ranked).order_by(ranked.c.transaction_id, ranked.c.rank)
+    if limit:
+        query = query.where(ranked.c.rank <= limit)
+    for row in db.session.execute(query):
+        result[row.transaction_id]["feedback"].append(feedback_json(row))
+    return result
+
+# Writes
+
+def _existing_ids(transaction_ids):
+    return set(db.session.scalars(
+        select(Transaction.transaction_id).where(Transaction.transaction_id.in_(set(transaction_ids)))))
+
+def transaction_exists(transaction_id):
+    return bool(_existing_ids([transaction_id]))
+
+def save_feedback(transaction_id, comment):
+    """
+    Store one comment in its own commit.
+
+    Returns:
+        The stored comment (feedback_id, transaction_id, comment, created_at)
+
+    Raises:
+        FeedbackError: 404 if the transaction does not exist
+    """
+    if not transaction_exists(transaction_id):
+        FEEDBACK_WRITES.inc(result="rejected")
+        raise FeedbackError("Transaction not found", 404)
+    feedback, = _insert([(transaction_id, comment, datetime.utcnow())])
+    db.session.commit()
+    FEEDBACK_WRITES.inc(result="saved")
+    FEEDBACK_BATCH_SIZE.observe(1)
+    return feedback
+
+def _insert(items):
+    """Add (transaction_id, comment, created_at) comments; returns plain copies that outlive the commit."""
+    rows = [Feedback(transaction_id=tx_id, comment=comment, created_at=created_at)
+            for tx_id, comment, created_at in items]
+    db.session.add_all(rows)
+    db.session.flush()
+    return [SimpleNamespace(feedback_id=row.feedback_id, transaction_id=tx_id, comment=comment, created_at=created_at)
+            for row, (tx_id, comment, created_at) in zip(rows, items)]
+
+class _Submission:
+    """One queued comment; ``done`` is set once its batch has been committed or refused."""
+
+    def __init__(self, transaction_id, comment):
+        self.transaction_id = transaction_id
+        self.comment = comment
+        self.created_at = datetime.utcnow()
+        self.feedback = None
+        self.error = None
+        self.done = threading.Event()
+
+class FeedbackWriter:
+    """Buffers comments and commits them in batches from a background thread."""
+
+    def __init__(self, app, batch_size=DEFAULT_BATCH_SIZE, flush_ms=DEFAULT_FLUSH_MS):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        _writers.add(self)
+        _install_process_hooks()
+
+    def _reset(self):
+        self._pending, self._cond, self._thread = [], threading.Condition(), None
+
+    def _ensure_thread(self):
+        # Called with the condition held
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, transaction_id, comment, wait=True):
+        """
+        Queue a comment.
+
+        Args:
+            transaction_id: Transaction being commented on
+            comment: Comment text
+            wait: Block until the comment's batch is committed
+
+        Returns:
+            The stored comment, or None if it is still queued
+
+        Raises:
+            FeedbackError: 404 if the transaction does not exist (when waiting)
+        """
+        submission = _Submission(transaction_id, comment)
+        with self._cond:
+            self._ensure_thread()
+            self._pending.append(submission)
+            self._cond.notify()
+        if not wait or not submission.done.wait(WAIT_TIMEOUT):
+            return None
+        if submission.error is not None:
+            raise submission.error
+        return submission.feedback
+
+    def _take_batch(self):
+        """Next batch, or None once the writer has been idle for IDLE_SECONDS (the thread then exits)."""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(IDLE_SECONDS)
+                if not self._pending:
+                    # Under the condition, so a concurrent submit starts a new thread
+                    self._thread = None
+                    return None
+            # Let the batch fill for one interval unless it is already full
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            return batch
+
+    def _run(self):
+        # The running thread holds the writer; exiting when idle lets an
+        # unused writer (and its app) be garbage collected
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                existing = _existing_ids([s.transaction_id for s in batch])
+                accepted = [s for s in batch if s.transaction_id in existing]
+                for submission in batch:
+                    if submission.transaction_id not in existing:
+                        submission.error = FeedbackError("Transaction not found", 404)
+                stored = _insert([(s.transaction_id, s.comment, s.created_at) for s in accepted])
+                db.session.commit()
+                for submission, feedback in zip(accepted, stored):
+                    submission.feedback = feedback
+                FEEDBACK_WRITES.inc(len(accepted), result="saved")
+                FEEDBACK_WRITES.inc(len(batch) - len(accepted), result="rejected")
+                if accepted:
+                    FEEDBACK_BATCH_SIZE.observe(len(accepted))
+            except Exception as e:
+                db.session.rollback()
+                FEEDBACK_WRITES.inc(len(batch), result="failed")
+                for submission in batch:
+                    submission.feedback = None
+                    submission.error = FeedbackError(f"Could not save feedback: {e}", 500)
+            finally:
+                for submission in batch:
+                    submission.done.set()
+
+    def flush(self):
+        """Write everything queued in this process now (at exit and in scripts)."""
+        with self._cond:
+            batch, self._pending = self._pending, []
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+def _reset_writers():
+    # Threads do not survive a fork: each gunicorn worker starts with an
+    # empty buffer and its own flusher on first use
+    for writer in list(_writers):
+        writer._reset()
+
+def _flush_writers():
+    for writer in list(_writers):
+        writer.flush()
+
+def _install_process_hooks():
+    """Register the fork and exit hooks once per process, not once per writer."""
+    global _hooks_installed
+    if not _hooks_installed:
+        os.register_at_fork(after_in_child=_reset_writers)
+        atexit.register(_flush_writers)
+        _hooks_installed = True
+
+def init_feedback(app):
+    """
+    Set up feedback summaries and the buffered writer on a Flask app.
+
+    Config keys:
+        FEEDBACK_BUFFER: Batch comments through a FeedbackWriter (default True)
+        FEEDBACK_BATCH_SIZE: Most comments per commit (default 200)
+        FEEDBACK_FLUSH_MS: Longest a comment waits for its batch to fill (default 50)
+        FEEDBACK_WAIT: Answer after the commit (201/404) instead of on queueing (202) (default True)
+    """
+    install_feedback_listeners()
+    writer = None
+    if app.config.get("FEEDBACK_BUFFER", True):
+        writer = FeedbackWriter(app, int(app.config.get("FEEDBACK_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+                                float(app.config.get("FEEDBACK_FLUSH_MS", DEFAULT_FLUSH_MS)))
+    app.extensions["feedback_writer"] = writer
@@ -0,0 +1,52 @@
+"""
+Gunicorn settings for serving The Transparency Ledger in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment (or on the command
+line, which takes precedence over this file):
+
+    GUNICORN_BIND           Address to listen on (default 0.0.0.0:$PYTHON_PORT or :5000)
+    WEB_CONCURRENCY         Worker processes (default 2 x CPU cores + 1)
+    GUNICORN_THREADS        Threads per worker (default 4)
+    GUNICORN_TIMEOUT        Seconds a request may run before its worker is restarted (default 60)
+    GUNICORN_GRACEFUL_TIMEOUT  Seconds workers get to finish requests on reload/stop (default 30)
+    GUNICORN_KEEPALIVE      Seconds to hold idle keep-alive connections (default 5)
+    GUNICORN_MAX_REQUESTS   Recycle a worker after this many requests, 0 = never (default 2000)
+    GUNICORN_PRELOAD        Build the app once in the master before forking (default 1)
+    GUNICORN_PIDFILE        Where the master writes its pid (default gunicorn.pid)
+
+Graceful reload: ``kill -HUP $(cat gunicorn.pid)`` starts new workers and
+lets the old ones finish in-flight requests. With preloading on, workers
+fork from the code the master loaded, so deploying new code needs a
+binary upgrade instead: ``kill -USR2`` starts a new master next to the
+old one, then ``kill -QUIT`` the old master.
+"""
+
+import multiprocessing
+import os
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PYTHON_PORT', 5000)}")
+workers = _int("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+worker_class = "gthread"
+threads = _int("GUNICORN_THREADS", 4)
+timeout = _int("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+max_requests = _int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = max_requests // 10
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+pidfile = os.environ.get("GUNICORN_PIDFILE", "gunicorn.pid")
+accesslog = "-"
+errorlog = "-"
+
+def post_fork(server, worker):
+    # Pooled connections opened in the master must not be shared between
+    # workers; each worker opens its own on first use.
+    from wsgi import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,121 @@
+"""
+Approver inbox: pending transactions addressed to the departments a user heads.
+
+Rows are read through the ``(dept_id, status, created_at)`` index in
+created_at order with keyset pagination, so a page costs the same no
+matter how large the ledger is. Sender names are resolved in the same
+query by joining the creator and the department the creator heads.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, func, select
+
+from models import db, User, Department, Transaction, UserRole, TransactionStatus, is_anomalous
+
+MAX_LIMIT = 100
+
+class InboxError(ValueError):
+    """Raised for invalid inbox parameters."""
+
+def encode_cursor(created_at, transaction_id):
+    raw = json.dumps([created_at.isoformat(), transaction_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, transaction_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise InboxError("Invalid cursor")
+
+def headed_departments(user_id):
+    """Departments whose head is ``user_id``, resolved once per request."""
+    return Department.query.filter_by(head_user_id=user_id).order_by(Department.name).all()
+
+def pending_inbox(departments, limit=20, cursor=None):
+    """
+    Pending transactions for ``departments``, oldest first.
+
+    Args:
+        departments: Department rows the caller heads
+        limit: Page size (max 100)
+        cursor: Opaque cursor from a previous page
+
+    Returns:
+        Dict with per-department ``departments`` counts, ``pending_count``,
+        ``transactions`` and ``next_cursor``
+    """
+    dept_ids = [dept.dept_id for dept in departments]
+    dept_names = {dept.dept_id: dept.name for dept in departments}
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    pending = and_(Transaction.dept_id.in_(dept_ids), Transaction.status == TransactionStatus.Pending)
+
+    counts = dict(
+        db.session.query(Transaction.dept_id, func.count())
+        .filter(pending)
+        .group_by(Transaction.dept_id)
+        .all()
+    )
+
+    # Name of the department the sender heads, as the public feed shows it
+    sender_dept = (
+        select(Department.name)
+        .where(Department.head_user_id == User.user_id)
+        .order_by(Department.name)
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    query = (
+        db.session.query(Transaction, User.name, User.role, sender_dept)
+        .outerjoin(User, User.user_id == Transaction.created_by_id)
+        .filter(pending)
+    )
+    if cursor:
+        created_at, transaction_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Transaction.created_at > created_at,
+            and_(Transaction.created_at == created_at, Transaction.transaction_id > transaction_id),
+        ))
+    rows = query.order_by(Transaction.created_at, Transaction.transaction_id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    transactions = []
+    for tx, creator_name, creator_role, creator_dept in rows:
+        if creator_role == UserRole.Admin:
+            from_dept = "Admin"
+        elif creator_role == UserRole.DeptHead:
+            from_dept = creator_dept or creator_name
+        else:
+            from_dept = creator_name or "Unknown"
+        transactions.append({
+            "transaction_id": str(tx.transaction_id),
+            "dept_id": tx.dept_id,
+            "amount": float(tx.amount),
+            "purpose": tx.purpose,
+            "fromDept": from_dept,
+            "toDept": dept_names.get(tx.dept_id, "Unknown"),
+            "status": tx.status.value,
+            "created_at": tx.created_at.isoformat(),
+            "anomaly": is_anomalous(tx),
+            "anomaly_score": tx.anomaly_score,
+            "anomaly_reasons": tx.anomaly_reasons,
+        })
+
+    last = rows[-1][0] if rows else None
+    return {
+        "departments": [{
+            "dept_id": dept.dept_id,
+            "name": dept.name,
+            "pending_count": counts.get(dept.dept_id, 0),
+        } for dept in departments],
+        "pending_count": sum(counts.values()),
+        "transactions": transactions,
+        "next_cursor": encode_cursor(last.created_at, last.transaction_id) if has_more else None,
+    }
@@ -7,6 +7,7 @@ This script creates the database tables and sets up only the admin user.
 from app import app, db
 from models import User, UserRole
 from utils import hash_password
+from search import ensure_search_index
 
 def init_database():
     """Initialize the database with tables and only the admin user."""
@@ -14,6 +15,7 @@ def init_database():
         print("Creating database tables...")
         db.drop_all()  # Drop all tables (remove all data)
         db.create_all()  # Recreate tables
+        ensure_search_index()  # Recreate the full-text index and its triggers
 
         # Create only the admin user
         admin_user = User.query.filter_by(email='admin@transparency.com').first()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Hot/cold partitioning of the transaction ledger.
+
+Settled and rejected transactions older than a cutoff are moved out of
+the ``transactions`` table into append-only ``ledger_segments`` rows.
+Each segment holds a zlib-compressed JSON-lines copy of a contiguous run
+of the hash chain and is sealed with its first and last hashes and the
+Merkle root of its row hashes. Live queries then only scan the live
+partition, while verification and full exports read through the archive.
+
+Only a prefix of the chain (in created_at order) is ever archived, and
+the chain head always stays live, so the live partition continues the
+chain exactly where the last segment ends.
+
+Rows that reference archived transactions go with them: public comments
+are moved into the segment next to the rows they belong to (outside the
+seal, see ``read_segment_feedback``), and the derived feedback summaries
+and resolved reconciliation issues are deleted. A row with an open
+reconciliation issue stops the prefix like a pending row does, until a
+later reconciliation pass resolves it. Archived rows and their comments
+leave the search index, which covers the live partition only.
+
+Usage:
+    python ledger_archive.py --before 2025-01-01
+    python ledger_archive.py --check
+"""
+
+import argparse
+import hashlib
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from models import (
+    db, Transaction, TransactionStatus, LedgerSegment, Feedback, FeedbackSummary, ReconciliationIssue,
+)
+
+ARCHIVABLE_STATUSES = (TransactionStatus.Settled, TransactionStatus.Rejected)
+BALANCE_STATUSES = (TransactionStatus.Settled, TransactionStatus.Approved)
+DEFAULT_SEGMENT_SIZE = 50000
+DELETE_CHUNK = 1000
+
+class ArchiveError(Exception):
+    """Raised when rows cannot be archived or a segment fails its seal."""
+
+def merkle_root(hashes):
+    """
+    Compute the SHA-256 Merkle root of a list of hex digests.
+    Odd levels duplicate their last node.
+    """
+    level = [bytes.fromhex(h) for h in hashes]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+def _serialize(tx):
+    row = {}
+    for column in Transaction.__table__.columns:
+        value = getattr(tx, column.key)
+        if isinstance(value, Decimal):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, TransactionStatus):
+            value = value.name
+        row[column.key] = value
+    return row
+
+def _deserialize(row):
+    """Rebuild a read-only object with the same attributes as a Transaction."""
+    values = dict(row)
+    values["amount"] = Decimal(values["amount"])
+    values["status"] = TransactionStatus[values["status"]]
+    values["created_at"] = datetime.fromisoformat(values["created_at"])
+    values["archived"] = True
+    return SimpleNamespace(**values)
+
+def _segment_totals(rows):
+    totals = {"to": defaultdict(Decimal), "from": defaultdict(Decimal), "count": defaultdict(int)}
+    for tx in rows:
+        totals["count"][tx.dept_id] += 1
+        if tx.status in BALANCE_STATUSES:
+            totals["to"][tx.dept_id] += tx.amount
+            totals["from"][tx.created_by_id] += tx.amount
+    return {k: {key: str(v) if isinstance(v, Decimal) else v for key, v in d.items()} for k, d in totals.items()}
+
+def last_segment():
+    return LedgerSegment.query.order_by(LedgerSegment.segment_id.desc()).first()
+
+def _archivable_prefix(cutoff, limit):
+    """Oldest live rows that may be archived, stopping at the first that may not."""
+    candidates = (
+        Transaction.query
+        .order_by(Transaction.created_at.asc(), Transaction.transaction_id.asc())
+        .limit(limit + 1)
+        .all()
+    )
+    # The newest row is the chain head and always stays live.
+    eligible = candidates[:limit] if len(candidates) > limit else candidates[:-1]
+    # Open reconciliation issues are few; their rows stay live until resolved
+    unresolved = {tx_id for (tx_id,) in db.session.query(ReconciliationIssue.transaction_id)
+                  .filter(ReconciliationIssue.resolved_at.is_(None))}
+    prefix = []
+    for tx in eligible:
+        # Rows on department shards (sharded mode) are never archived
+        if (tx.created_at >= cutoff or tx.status not in ARCHIVABLE_STATUSES or tx.shard_id is not None
+                or tx.transaction_id in unresolved):
+            break
+        prefix.append(tx)
+    return prefix
+
+def _chunks(ids):
+    for start in range(0, len(ids), DELETE_CHUNK):
+        yield ids[start:start + DELETE_CHUNK]
+
+def _archived_feedback(ids):
+    """Comments on the archived rows, as JSON lines in feedback_id order."""
+    comments = []
+    for chunk in _chunks(ids):
+        comments += Feedback.query.filter(Feedback.transaction_id.in_(chunk)).all()
+    comments.sort(key=lambda f: f.feedback_id)
+    return [{
+        "feedback_id": f.feedback_id,
+        "transaction_id": f.transaction_id,
+        "comment": f.comment,
+        "created_at": f.created_at.isoformat() if f.created_at else None,
+    } for f in comments]
+
+def archive_before(cutoff, segment_size=DEFAULT_SEGMENT_SIZE):
+    """
+    Move settled/rejected rows older than ``cutoff`` into sealed segments.
+    Must be called inside an application context.
+
+    Args:
+        cutoff: Rows created before this datetime are eligible
+        segment_size: Maximum rows per segment
+
+    Returns:
+        List of dicts describing the segments that were written
+    """
+    written = []
+    while True:
+        rows = _archivable_prefix(cutoff, segment_size)
+        if not rows:
+            return written
+
+        previous = last_segment()
+        expected_previous = previous.last_hash if previous else None
+        for tx in rows:
+            if (tx.previous_hash or None) != expected_previous:
+                raise ArchiveError(f"Chain broken at transaction {tx.transaction_id}; refusing to archive")
+            expected_previous = tx.current_hash
+
+        ids = [tx.transaction_id for tx in rows]
+        serialized = [_serialize(tx) for tx in rows]
+        payload = "\n".join(json.dumps(r, separators=(",", ":")) for r in serialized).encode("utf-8")
+        comments = _archived_feedback(ids)
+        comments_payload = "\n".join(json.dumps(c, separators=(",", ":")) for c in comments).encode("utf-8")
+        segment = LedgerSegment(
+            first_transaction_id=rows[0].transaction_id,
+            last_transaction_id=rows[-1].transaction_id,
+            first_created_at=rows[0].created_at,
+            last_created_at=rows[-1].created_at,
+            row_count=len(rows),
+            previous_hash=rows[0].previous_hash or None,
+            first_hash=rows[0].current_hash,
+            last_hash=rows[-1].current_hash,
+            merkle_root=merkle_root([tx.current_hash for tx in rows]),
+            payload=zlib.compress(payload, 9),
+            totals=json.dumps(_segment_totals(rows)),
+            feedback=zlib.compress(comments_payload, 9) if comments else None,
+        )
+        db.session.add(segment)
+        db.session.flush()
+        written.append({
+            "segment_id": segment.segment_id,
+            "rows": segment.row_count,
+            "first_transaction_id": segment.first_transaction_id,
+            "last_transaction_id": segment.last_transaction_id,
+            "merkle_root": segment.merkle_root,
+            "compressed_bytes": len(segment.payload),
+            "raw_bytes": len(payload),
+            "feedback": len(comments),
+        })
+
+        # Dependents first, so no row is left pointing at a deleted transaction
+        for chunk in _chunks(ids):
+            for model in (FeedbackSummary, Feedback, ReconciliationIssue, Transaction):
+                model.query.filter(model.transaction_id.in_(chunk)).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.expunge_all()
+
+def read_segment(segment, check_seal=True):
+    """
+    Decompress a segment into Transaction-like objects.
+
+    Raises:
+        ArchiveError: If ``check_seal`` and the rows do not match the seal
+    """
+    lines = zlib.decompress(segment.payload).decode("utf-8").split("\n")
+    rows = [_deserialize(json.loads(line)) for line in lines if line]
+    if check_seal:
+        if (len(rows) != segment.row_count
+                or rows[0].current_hash != segment.first_hash
+                or rows[-1].current_hash != segment.last_hash
+                or merkle_root([r.current_hash for r in rows]) != segment.merkle_root):
+            raise ArchiveError(f"Segment {segment.segment_id} does not match its seal")
+    return rows
+
+def read_segment_feedback(segment):
+    """Comments moved into a segment with its rows, as dicts in feedback_id order."""
+    if not segment.feedback:
+        return []
+    lines = zlib.decompress(segment.feedback).decode("utf-8").split("\n")
+    return [json.loads(line) for line in lines if line]
+
+def iter_archived_transactions(check_seal=True):
+    """Yield archived rows in chain order, one segment in memory at a time."""
+    segment_ids = [s for (s,) in db.session.query(LedgerSegment.segment_id).order_by(LedgerSegment.segment_id)]
+    for segment_id in segment_ids:
+        segment = db.session.get(LedgerSegment, segment_id)
+        rows = read_segment(segment, check_seal)
+        db.session.expunge(segment)
+        yield from rows
+
+def archived_totals():
+    """
+    Sum the per-segment totals.
+
+    Returns:
+        Dict with ``to`` (dept_id -> settled/approved amount received),
+        ``from`` (created_by_id -> amount sent) and ``count`` (dept_id ->
+        archived rows)
+    """
+    result = {"to": defaultdict(float), "from": defaultdict(float), "count": defaultdict(int)}
+    for (totals,) in db.session.query(LedgerSegment.totals):
+        data = json.loads(totals)
+        for key in ("to", "from"):
+            for k, v in data[key].items():
+                result[key][k] += float(v)
+        for k, v in data["count"].items():
+            result["count"][k] += v
+    return result
+
+def check_segments():
+    """Verify every segment's seal and the links between segments."""
+    expected_previous = None
+    checked = 0
+    for segment in LedgerSegment.query.order_by(LedgerSegment.segment_id):
+        if segment.previous_hash != expected_previous:
+            raise ArchiveError(f"Segment {segment.segment_id} does not link to the previous segment")
+        read_segment(segment, check_seal=True)
+        expected_previous = segment.last_hash
+        checked += 1
+    return checked
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive settled ledger history into sealed segments")
+    parser.add_argument("--before", help="Archive settled/rejected rows created before this ISO date")
+    parser.add_argument("--segment-size", type=int, default=DEFAULT_SEGMENT_SIZE)
+    parser.add_argument("--check", action="store_true", help="Verify segment seals and links")
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        if args.before:
+            for segment in archive_before(datetime.fromisoformat(args.before), args.segment_size):
+                print(f"Segment {segment['segment_id']}: transactions {segment['first_transaction_id']}-"
+                      f"{segment['last_transaction_id']} ({segment['rows']} rows, "
+                      f"{segment['raw_bytes']} -> {segment['compressed_bytes']} bytes, {segment['feedback']} comments), "
+                      f"root {segment['merkle_root']}")
+            head = Transaction.query.order_by(Transaction.created_at.asc(), Transaction.transaction_id.asc()).first()
+            if head and head.created_at < datetime.fromisoformat(args.before):
+                if head.status not in ARCHIVABLE_STATUSES:
+                    print(f"Stopped at transaction {head.transaction_id} ({head.status.value}); "
+                          f"history after it stays live until it is settled or rejected")
+                elif ReconciliationIssue.query.filter_by(transaction_id=head.transaction_id, resolved_at=None).first():
+                    print(f"Stopped at transaction {head.transaction_id}, which has an open reconciliation "
+                          f"issue; history after it stays live until the issue is resolved")
+        if args.check:
+            print(f"{check_segments()} segment(s) verified")
+        if not args.before and not args.check:
+            parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Hash-chain bookkeeping for the ledger, in single or sharded mode.
+
+In single mode (the default) every transaction links to the previous one
+in created_at order, so all appends contend on one chain head and
+verification is one sequential walk.
+
+``--migrate`` switches a database to sharded mode without rewriting any
+existing row: the current global chain is frozen and sealed by a genesis
+checkpoint, and from then on each receiving department keeps its own
+chain (``shard_id`` = dept_id) starting from the genesis root. Appends
+to different departments no longer share a head, and shards verify
+independently and in parallel. ``--checkpoint`` (run periodically, e.g.
+from cron) hashes all shard heads together with the previous root, so
+the checkpoints themselves form a chain over the state of every shard.
+
+Usage:
+    python ledger_chain.py --migrate
+    python ledger_chain.py --checkpoint
+    python ledger_chain.py --verify --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import select, text, or_, and_
+
+from models import db, Transaction, ChainCheckpoint, LedgerSegment
+from utils import recompute_transaction_hash
+from ledger_archive import iter_archived_transactions
+
+GLOBAL_CHAIN = "global"
+STREAM_BATCH = 5000
+# Key of the PostgreSQL advisory lock serializing appends to the chain
+CHAIN_LOCK_KEY = 0x6c656467
+
+class ChainError(Exception):
+    """Raised when a chain, shard or checkpoint fails verification."""
+
+def expected_hash(tx):
+    """Recompute a row's hash from its stored fields and hash version."""
+    return recompute_transaction_hash(tx)
+
+def verify_chain(rows, genesis=None):
+    """
+    Check links and hashes of rows in chain order.
+
+    Args:
+        rows: Iterable of Transaction-like rows
+        genesis: Hash the first row must link to (None for the global chain)
+
+    Returns:
+        Tuple of (row count, last transaction_id, last hash)
+
+    Raises:
+        ChainError: At the first broken link or hash mismatch
+    """
+    expected_previous = genesis
+    count = 0
+    last_id = None
+    for tx in rows:
+        if (tx.previous_hash or None) != expected_previous:
+            raise ChainError(f"Chain broken at transaction {tx.transaction_id}")
+        if tx.current_hash != expected_hash(tx):
+            raise ChainError(f"Hash mismatch at transaction {tx.transaction_id}")
+        expected_previous = tx.current_hash
+        last_id = tx.transaction_id
+        count += 1
+    return count, last_id, expected_previous
+
+def _stream(stmt):
+    """Yield core rows without building ORM objects."""
+    result = db.session.execute(stmt.execution_options(yield_per=STREAM_BATCH))
+    for partition in result.partitions():
+        yield from partition
+
+def _chain_rows(shard_id, after=None):
+    """Live rows of one chain in order, optionally only those after ``(created_at, transaction_id)``."""
+    table = Transaction.__table__
+    stmt = select(table).where(table.c.shard_id.is_(None) if shard_id is None else table.c.shard_id == shard_id)
+    if after is not None:
+        created_at, transaction_id = after
+        stmt = stmt.where(or_(
+            table.c.created_at > created_at,
+            and_(table.c.created_at == created_at, table.c.transaction_id > transaction_id),
+        ))
+    return _stream(stmt.order_by(table.c.created_at, table.c.transaction_id))
+
+def _resume_point(shard_id, previous):
+    """
+    Position after which a chain can be re-verified, given an earlier
+    result (count, last id, last hash) for it, or None when its head row
+    is gone (archived) or no longer stored as it was verified. The head
+    row itself is re-hashed; rows before it are not checked again.
+    """
+    if not previous or previous[1] is None:
+        return None
+    table = Transaction.__table__
+    row = db.session.execute(select(table).where(table.c.transaction_id == previous[1])).first()
+    if row is None or row.shard_id != shard_id or row.current_hash != previous[2] or expected_hash(row) != previous[2]:
+        return None
+    return row.created_at, previous[1]
+
+def _verify_from(shard_id, genesis, previous=None):
+    """Verify one live chain, resuming after ``previous`` when its head still holds."""
+    start = _resume_point(shard_id, previous)
+    if start is None:
+        return verify_chain(_chain_rows(shard_id), genesis)
+    count, last_id, head = verify_chain(_chain_rows(shard_id, start), previous[2])
+    return previous[0] + count, last_id if last_id is not None else previous[1], head
+
+def genesis_checkpoint():
+    return ChainCheckpoint.query.order_by(ChainCheckpoint.checkpoint_id).first()
+
+def is_sharded():
+    return genesis_checkpoint() is not None
+
+def lock_chain():
+    """
+    Serialize appends for the rest of the current transaction.
+
+    Reading the chain head, hashing against it and inserting the new row
+    must happen as one unit, or concurrent appends link to the same head
+    and fork the chain. SQLite starts transactions deferred, taking no
+    lock until the first write, so the write lock is taken up front with
+    BEGIN IMMEDIATE; concurrent writers wait for it (up to the driver's
+    busy timeout) and then read the new head. PostgreSQL takes a
+    transaction-scoped advisory lock. Must be called before the head (or
+    anything the append depends on, like the department balance) is read.
+    Batch approvals take it too, to re-check rows they are about to settle.
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        # pysqlite only opens a transaction before DML; if this one already
+        # wrote, it already holds the write lock
+        if not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+    elif dialect == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHAIN_LOCK_KEY})
+
+def chain_head(dept_id):
+    """
+    Hash a new transaction for ``dept_id`` must link to.
+
+    Call lock_chain() first and insert the new row in the same transaction.
+
+    Returns:
+        Tuple of (previous_hash, shard_id); shard_id is None in single mode
+    """
+    genesis = genesis_checkpoint()
+    if genesis is None:
+        last_tx = Transaction.query.order_by(Transaction.created_at.desc()).first()
+        return (last_tx.current_hash if last_tx else ""), None
+    last_tx = (
+        Transaction.query
+        .filter(Transaction.shard_id == dept_id)
+        .order_by(Transaction.created_at.desc())
+        .first()
+    )
+    return (last_tx.current_hash if last_tx else genesis.root_hash), dept_id
+
+def _root(previous_root, heads):
+    digest = hashlib.sha256((previous_root or "").encode("utf-8"))
+    for shard_id in sorted(heads):
+        last_id, head_hash = heads[shard_id]
+        digest.update(f"\n{shard_id}:{last_id}:{head_hash}".encode("utf-8"))
+    return digest.hexdigest()
+
+def shard_heads():
+    """Current head of every department shard."""
+    heads = {}
+    shard_ids = [s for (s,) in db.session.query(Transaction.shard_id).filter(Transaction.shard_id.isnot(None)).distinct()]
+    for shard_id in shard_ids:
+        last_tx = (
+            db.session.query(Transaction.transaction_id, Transaction.current_hash)
+            .filter(Transaction.shard_id == shard_id)
+            .order_by(Transaction.created_at.desc())
+            .first()
+        )
+        heads[shard_id] = [last_tx.transaction_id, last_tx.current_hash]
+    return heads
+
+def migrate_to_sharded():
+    """
+    Freeze the global chain and start per-department shards.
+
+    Returns:
+        The genesis ChainCheckpoint
+
+    Raises:
+        ChainError: If the database is already sharded or the global chain
+            does not verify
+    """
+    if is_sharded():
+        raise ChainError("Ledger is already in sharded mode")
+    count, last_id, head = verify_chain(chain(iter_archived_transactions(), _chain_rows(None)))
+    heads = {GLOBAL_CHAIN: [last_id, head]}
+    genesis = ChainCheckpoint(previous_root=None, root_hash=_root(None, heads), heads=json.dumps(heads), shard_count=0)
+    db.session.add(genesis)
+    db.session.commit()
+    return genesis
+
+def write_checkpoint():
+    """
+    Seal the current head of every shard into a new global checkpoint.
+    Must be called inside an application context.
+
+    Returns:
+        The new ChainCheckpoint, or None if nothing changed since the last one
+    """
+    latest = ChainCheckpoint.query.order_by(ChainCheckpoint.checkpoint_id.desc()).first()
+    if latest is None:
+        raise ChainError("Ledger is not in sharded mode; run with --migrate first")
+    heads = shard_heads()
+    if heads == {k: v for k, v in json.loads(latest.heads).items() if k != GLOBAL_CHAIN}:
+        return None
+    checkpoint = ChainCheckpoint(
+        previous_root=latest.root_hash,
+        root_hash=_root(latest.root_hash, heads),
+        heads=json.dumps(heads),
+        shard_count=len(heads)
+    )
+    db.session.add(checkpoint)
+    db.session.commit()
+    return checkpoint
+
+def verify_shard(shard_id, genesis_root, previous=None):
+    """Verify one department shard; returns (count, last id, last hash)."""
+    return _verify_from(shard_id, genesis_root, previous)
+
+def _verify_shard_in_app(app, shard_id, genesis_root, previous=None):
+    with app.app_context():
+        try:
+            return verify_shard(shard_id, genesis_root, previous)
+        finally:
+            db.session.remove()
+
+def _verify_shard_in_process(args):
+    from app import app
+    return _verify_shard_in_app(app, *args)
+
+def verify_checkpoints(shard_heads_verified):
+    """
+    Check that checkpoints link, that their roots recompute and that every
+    recorded head is a row of its verified shard.
+    """
+    previous = None
+    checked = 0
+    for checkpoint in ChainCheckpoint.query.order_by(ChainCheckpoint.checkpoint_id):
+        heads = json.loads(checkpoint.heads)
+        if checkpoint.previous_root != (previous.root_hash if previous else None):
+            raise ChainError(f"Checkpoint {checkpoint.checkpoint_id} does not link to the previous checkpoint")
+        if checkpoint.root_hash != _root(checkpoint.previous_root, heads):
+            raise ChainError(f"Checkpoint {checkpoint.checkpoint_id} root does not match its heads")
+        if previous is not None:
+            recorded = {shard_id: tuple(head) for shard_id, head in heads.items()}
+            rows = {
+                tx_id: (shard_id, current_hash)
+                for tx_id, shard_id, current_hash in db.session.query(
+                    Transaction.transaction_id, Transaction.shard_id, Transaction.current_hash
+                ).filter(Transaction.transaction_id.in_([head[0] for head in recorded.values()]))
+            }
+            for shard_id, (last_id, head_hash) in recorded.items():
+                if rows.get(last_id) != (shard_id, head_hash) or shard_id not in shard_heads_verified:
+                    raise ChainError(f"Checkpoint {checkpoint.checkpoint_id} head for shard {shard_id} is not on the shard chain")
+        previous = checkpoint
+        checked += 1
+    return checked
+
+def _newest_head(chains):
+    """(transaction_id, hash) of the newest live row among verified chain heads."""
+    heads = {last_id: head for _, last_id, head in chains.values() if last_id is not None}
+    newest = (
+        db.session.query(Transaction.transaction_id)
+        .filter(Transaction.transaction_id.in_(list(heads)))
+        .order_by(Transaction.created_at.desc(), Transaction.transaction_id.desc())
+        .first()
+    ) if heads else None
+    if newest is None:
+        _, last_id, head = chains[GLOBAL_CHAIN]
+        return last_id, head
+    return newest.transaction_id, heads[newest.transaction_id]
+
+def verify_ledger(workers=1, processes=False, since=None):
+    """
+    Verify the whole ledger in either mode.
+
+    Args:
+        workers: Shards verified concurrently (sharded mode only)
+        processes: Use worker processes instead of threads (CLI use)
+        since: ``verified`` of an earlier result. Chains whose recorded head
+            row is still stored unchanged are only checked from that head
+            on; a full check runs when it is missing or the archive changed
+
+    Returns:
+        Dict with ``mode``, ``total_transactions``, ``shards``,
+        ``checkpoints``, ``head_transaction_id`` and ``head_hash`` (the
+        newest verified row) and ``verified`` (for a later ``since``)
+
+    Raises:
+        ChainError / ArchiveError: If any part fails verification
+    """
+    segments = db.session.query(LedgerSegment).count()
+    previous = since["chains"] if since and since.get("segments") == segments else {}
+    genesis = genesis_checkpoint()
+    if _resume_point(None, previous.get(GLOBAL_CHAIN)) is None:
+        global_count, global_last_id, global_head = verify_chain(chain(iter_archived_transactions(), _chain_rows(None)))
+    else:
+        global_count, global_last_id, global_head = _verify_from(None, None, previous[GLOBAL_CHAIN])
+    chains = {GLOBAL_CHAIN: [global_count, global_last_id, global_head]}
+    if genesis is None:
+        head_id, head_hash = _newest_head(chains)
+        return {"mode": "single", "total_transactions": global_count, "shards": 0, "checkpoints": 0,
+                "head_transaction_id": head_id, "head_hash": head_hash,
+                "verified": {"segments": segments, "chains": chains}}
+
+    if json.loads(genesis.heads)[GLOBAL_CHAIN] != [global_last_id, global_head]:
+        raise ChainError("Global chain changed after the switch to sharded mode")
+
+    shard_ids = [s for (s,) in db.session.query(Transaction.shard_id).filter(Transaction.shard_id.isnot(None)).distinct()]
+    if processes:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_verify_shard_in_process,
+                                    [(s, genesis.root_hash, previous.get(s)) for s in shard_ids]))
+    else:
+        app = current_app._get_current_object()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = list(pool.map(lambda s: _verify_shard_in_app(app, s, genesis.root_hash, previous.get(s)), shard_ids))
+
+    verified_heads = {shard_id: result for shard_id, result in zip(shard_ids, results)}
+    chains.update({shard_id: list(result) for shard_id, result in verified_heads.items()})
+    head_id, head_hash = _newest_head(chains)
+    return {
+        "mode": "sharded",
+        "total_transactions": global_count + sum(count for count, _, _ in results),
+        "shards": len(shard_ids),
+        "checkpoints": verify_checkpoints(verified_heads),
+        "head_transaction_id": head_id,
+        "head_hash": head_hash,
+        "verified": {"segments": segments, "chains": chains},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage and verify the ledger hash chains")
+    parser.add_argument("--migrate", action="store_true", help="Switch to per-department sharded chains")
+    parser.add_argument("--checkpoint", action="store_true", help="Seal current shard heads into a global checkpoint")
+    parser.add_argument("--verify", action="store_true", help="Verify all chains and checkpoints")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes for --verify")
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        try:
+            if args.migrate:
+                genesis = migrate_to_sharded()
+                print(f"Sharded mode enabled; genesis root {genesis.root_hash}")
+            if args.checkpoint:
+                checkpoint = write_checkpoint()
+                print(f"Checkpoint {checkpoint.checkpoint_id}: {checkpoint.shard_count} shard(s), root {checkpoint.root_hash}"
+                      if checkpoint else "No shard changed since the last checkpoint")
+            if args.verify:
+                result = verify_ledger(workers=args.workers, processes=args.workers > 1)
+                print(f"Ledger verified ({result['mode']} mode): {result['total_transactions']} transaction(s), "
+                      f"{result['shards']} shard(s), {result['checkpoints']} checkpoint(s)")
+            if not (args.migrate or args.checkpoint or args.verify):
+                parser.print_help()
+        except ChainError as e:
+            print(f"Error: {e}")
+            return 1
+        return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
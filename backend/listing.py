@@ -0,0 +1,192 @@
+"""
+Column-projected, keyset-paginated listings for users and departments.
+
+A listing selects only the columns behind the requested ``fields=`` (plus
+the sort key), as plain rows without ORM objects or the identity map,
+and joins the head user once when ``head_user_name`` is asked for.
+Pages are read with keyset pagination over ``(sort column, primary
+key)``, and every sortable column has a matching index in models.py, so
+a page costs the same no matter how many rows the table holds.
+
+    GET /api/departments?fields=dept_id,name,head_user_name&sort=name&limit=50
+    GET /api/departments?...&cursor=<next_cursor>
+"""
+
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import DateTime, select, tuple_
+from sqlalchemy.orm import aliased
+
+from models import db, User, Department
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+class ListingError(ValueError):
+    """Raised for invalid listing parameters."""
+
+def _str_or_none(value):
+    return str(value) if value is not None else None
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+def _float(value):
+    return float(value or 0)
+
+# column: selected expression; convert: JSON conversion (None to pass through);
+# join: name of the join the column needs (None for the listing's own table)
+Field = namedtuple("Field", "column convert join", defaults=(None, None))
+
+class Listing:
+    """A listable table: its fields, the sort keys it allows and the joins fields may need."""
+
+    def __init__(self, model, key, fields, default_fields, sorts, default_sort, joins=None):
+        self.model = model
+        self.key = key
+        self.fields = fields
+        self.default_fields = default_fields
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.joins = joins or {}
+
+    def parse_fields(self, value):
+        if not value:
+            return list(self.default_fields)
+        names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ListingError(f"Unknown field(s) {', '.join(unknown) or value!r}; "
+                               f"available: {', '.join(self.fields)}")
+        return names
+
+    def parse_sort(self, value):
+        value = value or self.default_sort
+        descending = value.startswith("-")
+        name = value.lstrip("-")
+        if name not in self.sorts:
+            raise ListingError(f"Cannot sort by {name!r}; sortable: {', '.join(self.sorts)}")
+        return name, descending
+
+head_user = aliased(User)
+
+USERS = Listing(
+    model=User,
+    key=User.user_id,
+    fields={
+        "user_id": Field(User.user_id, str),
+        "name": Field(User.name),
+        "email": Field(User.email),
+        "role": Field(User.role, lambda role: role.value),
+        "created_at": Field(User.created_at, _isoformat),
+    },
+    default_fields=("user_id", "name", "email", "role", "created_at"),
+    sorts={"created_at": User.created_at, "name": User.name, "email": User.email},
+    default_sort="created_at",
+)
+
+DEPARTMENTS = Listing(
+    model=Department,
+    key=Department.dept_id,
+    fields={
+        "dept_id": Field(Department.dept_id, str),
+        "name": Field(Department.name),
+        "description": Field(Department.description),
+        "parent_dept_id": Field(Department.parent_dept_id, _str_or_none),
+        "head_user_id": Field(Department.head_user_id, _str_or_none),
+        "head_user_name": Field(head_user.name, None, "head_user"),
+        "allocated_budget": Field(Department.allocated_budget, _float),
+        "created_at": Field(Department.created_at, _isoformat),
+    },
+    default_fields=("dept_id", "name", "description", "parent_dept_id", "head_user_id",
+                    "head_user_name", "allocated_budget", "created_at"),
+    sorts={"created_at": Department.created_at, "name": Department.name},
+    default_sort="created_at",
+    joins={"head_user": lambda query: query.outerjoin(head_user, head_user.user_id == Department.head_user_id)},
+)
+
+def encode_cursor(sort, value, key):
+    raw = json.dumps([sort, value.isoformat() if isinstance(value, datetime) else value, key]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, sort, column):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, key = json.loads(base64.urlsafe_b64decode(padded))
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError, binascii.Error):
+        raise ListingError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ListingError("Cursor belongs to a different sort order")
+    return value, key
+
+def list_rows(listing, fields=None, sort=None, limit=None, cursor=None, where=None):
+    """
+    One page of a listing.
+
+    Args:
+        listing: USERS or DEPARTMENTS
+        fields: Comma-separated field names (default: the listing's default fields)
+        sort: Sort key, ``-`` prefixed for descending (default: oldest first)
+        limit: Page size (max 500); None returns every row unless a cursor is given
+        cursor: ``next_cursor`` of the previous page
+        where: Optional extra filter (e.g. the sub-departments of one department)
+
+    Returns:
+        Dict with ``items`` (dicts of the requested fields) and ``next_cursor``
+        (None on the last page)
+
+    Raises:
+        ListingError: For unknown fields or sort keys, a bad limit or a bad cursor
+    """
+    names = listing.parse_fields(fields)
+    sort_name, descending = listing.parse_sort(sort)
+    sort = ("-" if descending else "") + sort_name
+    sort_column = listing.sorts[sort_name]
+    if cursor and not limit:
+        limit = DEFAULT_LIMIT
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ListingError("limit must be a number")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ListingError(f"limit must be between 1 and {MAX_LIMIT}")
+
+    # The sort key and primary key are always read, for the cursor
+    columns = [listing.fields[name].column.label(name) for name in names]
+    columns += [sort_column.label("_sort"), listing.key.label("_key")]
+    query = select(*columns).select_from(listing.model)
+    for join in dict.fromkeys(listing.fields[name].join for name in names if listing.fields[name].join):
+        query = listing.joins[join](query)
+    if where is not None:
+        query = query.where(where)
+
+    if cursor:
+        value, key = decode_cursor(cursor, sort, sort_column)
+        position = tuple_(sort_column, listing.key)
+        query = query.where(position < tuple_(value, key) if descending else position > tuple_(value, key))
+    if descending:
+        query = query.order_by(sort_column.desc(), listing.key.desc())
+    else:
+        query = query.order_by(sort_column, listing.key)
+    if limit:
+        query = query.limit(limit + 1)
+
+    rows = db.session.execute(query).all()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, rows[-1]._sort, rows[-1]._key)
+
+    converters = [(name, listing.fields[name].convert) for name in names]
+    items = [{
+        name: convert(value) if convert else value
+        for (name, convert), value in zip(converters, row)
+    } for row in rows]
+    return {"items": items, "next_cursor": next_cursor}
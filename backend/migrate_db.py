@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Schema migration script for The Transparency Ledger
+Brings an existing database up to date with models.py without dropping
+data: creates missing tables, adds missing columns and creates missing
+indexes. Unlike init_db.py it is safe to run against a live ledger.
+"""
+
+from sqlalchemy import inspect, text
+
+from app import app, db
+from models import Transaction, DailySpendingRollup, SenderSpendingRollup, Feedback, FeedbackSummary
+from rollups import rebuild_rollups
+from feedback import rebuild_feedback_summaries
+
+def _column_ddl(column, dialect):
+    """Build the column definition used in ALTER TABLE ... ADD COLUMN."""
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    default = column.default
+    if default is not None and default.is_scalar:
+        value = default.arg
+        if isinstance(value, bool):
+            value = int(value)
+        ddl += f" DEFAULT {value!r}" if isinstance(value, str) else f" DEFAULT {value}"
+    if not column.nullable and (default is None or not default.is_scalar):
+        raise RuntimeError(f"Cannot add NOT NULL column {column.table.name}.{column.name} without a default")
+    if not column.nullable:
+        ddl += " NOT NULL"
+    return ddl
+
+def migrate_database():
+    """Create missing tables, columns and indexes."""
+    with app.app_context():
+        db.create_all()
+        inspector = inspect(db.engine)
+        changes = []
+
+        for table in db.metadata.sorted_tables:
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    ddl = _column_ddl(column, db.engine.dialect)
+                    with db.engine.begin() as conn:
+                        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                    changes.append(f"Added column {table.name}.{column.name}")
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(db.engine)
+                    changes.append(f"Created index {index.name}")
+
+        rollups_missing = DailySpendingRollup.query.first() is None or SenderSpendingRollup.query.first() is None
+        if rollups_missing and Transaction.query.first() is not None:
+            # Newly added rollup tables start empty; fill them from the existing ledger.
+            rebuild_rollups()
+            changes.append("Built spending rollups")
+
+        if FeedbackSummary.query.first() is None and Feedback.query.first() is not None:
+            # Same for the feedback counts shown in the public feed
+            rebuild_feedback_summaries()
+            changes.append("Built feedback summaries")
+
+        for change in changes:
+            print(change)
+        print("Database is up to date." if not changes else f"Applied {len(changes)} change(s).")
+
+if __name__ == '__main__':
+    migrate_database()
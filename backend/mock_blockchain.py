@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+In-memory stand-in for the blockchain-backend API, for local runs and
+benchmarks without a Hardhat node.
+
+Serves the endpoints the backend calls (``/api/health``, ``/api/stats``,
+``POST /api/transactions``, ``/api/transactions/batch``, ``POST
+/api/receipts`` and ``GET /api/receipts/<hash>``) with the same response
+shapes. Anchored records are kept in a dict keyed by a random hash.
+
+``--import-ledger`` registers the ``blockchain_hash`` of every settled
+transaction in DATABASE_URL with the record approvals would have
+anchored, so ``reconcile.py`` can run against a seeded database.
+``--drop``, ``--corrupt`` and ``--revert`` damage that fraction of the
+imported records to give the reconciliation job something to find.
+
+    python mock_blockchain.py --import-ledger --drop 0.01 --corrupt 0.01
+    BLOCKCHAIN_API_URL=http://localhost:3001 python reconcile.py
+"""
+
+import argparse
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from flask import Flask, jsonify, request
+
+MAX_BATCH = 500
+
+class MockChain:
+    """Anchored records by hash, with a block counter."""
+
+    def __init__(self):
+        self.receipts = {}
+        self.block_number = 0
+        self._lock = threading.Lock()
+
+    def add(self, record, transaction_hash=None, status=1):
+        with self._lock:
+            self.block_number += 1
+            transaction_hash = transaction_hash or "0x" + uuid.uuid4().hex + uuid.uuid4().hex
+            self.receipts[transaction_hash] = {
+                "status": status,
+                "blockNumber": self.block_number,
+                "record": dict(record, transactionId=str(len(self.receipts))),
+            }
+            return transaction_hash
+
+    def lookup(self, transaction_hash):
+        entry = self.receipts.get(transaction_hash)
+        if entry is None:
+            return {"transactionHash": transaction_hash, "found": False}
+        return dict(entry, transactionHash=transaction_hash, found=True)
+
+def _missing_fields(item):
+    return not all((item or {}).get(field) for field in ("fromDept", "toDept", "amount", "purpose"))
+
+def create_mock_app(chain, latency=0.0):
+    """
+    Build the mock API around ``chain``.
+
+    Args:
+        chain: MockChain holding the anchored records
+        latency: Seconds added to every request, to imitate a remote node
+    """
+    app = Flask(__name__)
+
+    @app.before_request
+    def delay():
+        if latency:
+            time.sleep(latency)
+
+    @app.route('/api/health')
+    def health():
+        return jsonify({"status": "OK", "message": "Mock blockchain API is running", "contract": "mock"})
+
+    @app.route('/api/stats')
+    def stats():
+        return jsonify({"success": True, "totalTransactions": str(len(chain.receipts)), "contractAddress": "mock"})
+
+    @app.route('/api/transactions', methods=['POST'])
+    def add_transaction():
+        item = request.get_json(silent=True)
+        if _missing_fields(item):
+            return jsonify({"success": False, "error": "All fields are required: fromDept, toDept, amount, purpose"}), 400
+        return jsonify({"success": True, "message": "Transaction added successfully",
+                        "transactionHash": chain.add(item), "gasUsed": "0"})
+
+    @app.route('/api/transactions/batch', methods=['POST'])
+    def add_batch():
+        transactions = (request.get_json(silent=True) or {}).get("transactions")
+        if not isinstance(transactions, list) or not transactions:
+            return jsonify({"success": False, "error": "transactions must be a non-empty array"}), 400
+        if len(transactions) > MAX_BATCH:
+            return jsonify({"success": False, "error": f"At most {MAX_BATCH} transactions per batch"}), 400
+        results = [
+            {"success": False, "error": "All fields are required: fromDept, toDept, amount, purpose"}
+            if _missing_fields(item) else
+            {"success": True, "transactionHash": chain.add(item), "gasUsed": "0"}
+            for item in transactions
+        ]
+        failed = sum(not r["success"] for r in results)
+        return jsonify({"success": True, "count": len(results), "failed": failed, "results": results})
+
+    @app.route('/api/receipts', methods=['POST'])
+    def receipts():
+        hashes = (request.get_json(silent=True) or {}).get("hashes")
+        if not isinstance(hashes, list) or not hashes:
+            return jsonify({"success": False, "error": "hashes must be a non-empty array"}), 400
+        if len(hashes) > MAX_BATCH:
+            return jsonify({"success": False, "error": f"At most {MAX_BATCH} hashes per request"}), 400
+        found = [chain.lookup(h) for h in hashes]
+        return jsonify({"success": True, "count": len(found), "receipts": found})
+
+    @app.route('/api/receipts/<transaction_hash>')
+    def receipt(transaction_hash):
+        found = chain.lookup(transaction_hash)
+        return jsonify({"success": found["found"], "receipt": found}), 200 if found["found"] else 404
+
+    return app
+
+def import_ledger(chain, drop=0.0, corrupt=0.0, revert=0.0, seed=None):
+    """
+    Register the settled transactions of the configured database.
+
+    Args:
+        chain: MockChain to fill
+        drop: Fraction of hashes left unregistered (NotOnChain)
+        corrupt: Fraction registered with a different amount (Mismatch)
+        revert: Fraction registered as reverted (Reverted)
+        seed: Random seed for choosing the damaged records
+
+    Returns:
+        Dict with the number of records imported, dropped, corrupted and reverted
+    """
+    from app import app
+    from reconcile import _settled_batches, _expected_record
+
+    rng = random.Random(seed)
+    counts = {"imported": 0, "dropped": 0, "corrupted": 0, "reverted": 0}
+    with app.app_context():
+        for rows in _settled_batches(0, 5000):
+            for row in rows:
+                if not row.blockchain_hash:
+                    continue
+                record, status = _expected_record(row), 1
+                roll = rng.random()
+                if roll < drop:
+                    counts["dropped"] += 1
+                    continue
+                if roll < drop + corrupt:
+                    record["amount"] = str(Decimal(record["amount"]) + 1)
+                    counts["corrupted"] += 1
+                elif roll < drop + corrupt + revert:
+                    status = 0
+                    counts["reverted"] += 1
+                chain.add(record, row.blockchain_hash, status)
+                counts["imported"] += 1
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an in-memory mock of the blockchain API")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--import-ledger", action="store_true",
+                        help="Register the settled transactions in DATABASE_URL")
+    parser.add_argument("--drop", type=float, default=0.0, help="Fraction of imported hashes to leave out")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="Fraction of imported records to alter")
+    parser.add_argument("--revert", type=float, default=0.0, help="Fraction of imported records to mark reverted")
+    parser.add_argument("--seed", type=int, help="Random seed for --drop/--corrupt/--revert")
+    args = parser.parse_args()
+
+    chain = MockChain()
+    if args.import_ledger:
+        print(f"Imported ledger: {import_ledger(chain, args.drop, args.corrupt, args.revert, args.seed)}")
+    create_mock_app(chain, args.latency).run(port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
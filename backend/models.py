@@ -19,9 +19,20 @@ class TransactionStatus(enum.Enum):
     Rejected = "Rejected"
     Settled = "Settled"
 
+class ReconciliationIssueKind(enum.Enum):
+    MissingAnchor = "MissingAnchor"  # Settled without a blockchain_hash
+    NotOnChain = "NotOnChain"  # blockchain_hash has no receipt
+    Reverted = "Reverted"  # The anchoring call failed on chain
+    Mismatch = "Mismatch"  # The anchored record differs from the row
+
 # Models
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Sort keys of the paginated user listing (listing.py)
+        db.Index('ix_users_created_id', 'created_at', 'user_id'),
+        db.Index('ix_users_name_id', 'name', 'user_id'),
+    )
     
     user_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(255), nullable=False)
@@ -41,6 +52,11 @@ class User(db.Model):
 
 class Department(db.Model):
     __tablename__ = 'departments'
+    __table_args__ = (
+        # Sort keys of the paginated department listing (listing.py)
+        db.Index('ix_departments_created_id', 'created_at', 'dept_id'),
+        db.Index('ix_departments_name_id', 'name', 'dept_id'),
+    )
     
     dept_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(255), nullable=False)
@@ -59,6 +75,12 @@ class Department(db.Model):
 
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Approver inbox: pending rows for one receiving department, oldest first
+        db.Index('ix_transactions_dept_status_created', 'dept_id', 'status', 'created_at'),
+        # Sharded ledger mode: head of one department's chain
+        db.Index('ix_transactions_shard_created', 'shard_id', 'created_at'),
+    )
     
     transaction_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     dept_id = db.Column(db.String(36), db.ForeignKey('departments.dept_id'), nullable=False)
@@ -68,18 +90,115 @@ class Transaction(db.Model):
     created_by_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=False)
     approved_by_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=True)
     invoice_url = db.Column(db.String(255), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Chain head lookup and ledger order
     previous_hash = db.Column(db.String(64), nullable=True)
     current_hash = db.Column(db.String(64), unique=True, nullable=False)
+    hash_version = db.Column(db.Integer, nullable=False, default=1)  # See utils.HASH_VERSIONS; 1 is the legacy encoding
+    shard_id = db.Column(db.String(36), nullable=True)  # Chain shard (receiving dept_id) in sharded mode, NULL on the global chain
     blockchain_hash = db.Column(db.String(66), nullable=True)  # Ethereum tx hash is 66 chars
     rejection_reason = db.Column(db.Text, nullable=True)
-    anomaly = db.Column(db.Boolean, default=False) # Flag for anomaly detection
+    anomaly = db.Column(db.Boolean, default=False) # Flagged on write (budget overrun) or by hand; never written by anomaly.py
+    anomaly_score = db.Column(db.Float, nullable=True)  # Set by the anomaly engine, >= 1.0 means anomalous
+    anomaly_reasons = db.Column(db.Text, nullable=True)  # Comma-separated rule codes
     def __repr__(self):
         return f'<Transaction {self.transaction_id}: {self.purpose}>'
+
+def is_anomalous(tx):
+    """
+    Combined anomaly verdict of a transaction (or archived/core row): its
+    ``anomaly`` flag, or an engine score of 1.0 or more. The engine only
+    writes its own columns, so a rescore never clears a flag it did not set.
+    """
+    return bool(tx.anomaly) or (tx.anomaly_score or 0) >= 1.0
     
 class Feedback(db.Model):
     __tablename__ = 'feedback'
+    __table_args__ = (
+        # Comments of one transaction, newest first
+        db.Index('ix_feedback_transaction_created', 'transaction_id', 'created_at'),
+    )
     feedback_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.transaction_id'), nullable=False)
     comment = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class FeedbackSummary(db.Model):
+    __tablename__ = 'feedback_summaries'
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.transaction_id'), primary_key=True)
+    feedback_count = db.Column(db.Integer, nullable=False, default=0)
+    latest_feedback_id = db.Column(db.Integer, nullable=True)
+    latest_comment = db.Column(db.Text, nullable=True)  # Preview of the newest comment (feedback.PREVIEW_LENGTH)
+    latest_at = db.Column(db.DateTime, nullable=True)
+
+class JobCheckpoint(db.Model):
+    __tablename__ = 'job_checkpoints'
+    job_name = db.Column(db.String(64), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)  # Highest transaction_id processed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class LedgerSegment(db.Model):
+    __tablename__ = 'ledger_segments'
+    segment_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    first_transaction_id = db.Column(db.Integer, nullable=False)
+    last_transaction_id = db.Column(db.Integer, nullable=False)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    previous_hash = db.Column(db.String(64), nullable=True)  # Hash the first archived row links to
+    first_hash = db.Column(db.String(64), nullable=False)
+    last_hash = db.Column(db.String(64), unique=True, nullable=False)
+    merkle_root = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON lines of the archived rows
+    totals = db.Column(db.Text, nullable=False)  # JSON per-department sums kept for balance queries
+    feedback = db.Column(db.LargeBinary, nullable=True)  # zlib-compressed JSON lines of the archived rows' comments (not sealed)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DailySpendingRollup(db.Model):
+    __tablename__ = 'spending_rollups_daily'
+    dept_id = db.Column(db.String(36), db.ForeignKey('departments.dept_id'), primary_key=True)
+    period = db.Column(db.Date, primary_key=True)  # Calendar day of created_at (UTC)
+    status = db.Column(Enum(TransactionStatus), primary_key=True)
+    tx_count = db.Column(db.Integer, nullable=False, default=0)
+    sum_in = db.Column(db.Numeric(19, 4), nullable=False, default=0)  # Positive amounts received by the department
+    sum_out = db.Column(db.Numeric(19, 4), nullable=False, default=0)  # Negative amounts, stored as a positive total
+
+class MonthlySpendingRollup(db.Model):
+    __tablename__ = 'spending_rollups_monthly'
+    dept_id = db.Column(db.String(36), db.ForeignKey('departments.dept_id'), primary_key=True)
+    period = db.Column(db.Date, primary_key=True)  # First day of the month
+    status = db.Column(Enum(TransactionStatus), primary_key=True)
+    tx_count = db.Column(db.Integer, nullable=False, default=0)
+    sum_in = db.Column(db.Numeric(19, 4), nullable=False, default=0)
+    sum_out = db.Column(db.Numeric(19, 4), nullable=False, default=0)
+
+class SenderSpendingRollup(db.Model):
+    __tablename__ = 'spending_rollups_by_sender'
+    created_by_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), primary_key=True)
+    status = db.Column(Enum(TransactionStatus), primary_key=True)
+    tx_count = db.Column(db.Integer, nullable=False, default=0)
+    sum_in = db.Column(db.Numeric(19, 4), nullable=False, default=0)
+    sum_out = db.Column(db.Numeric(19, 4), nullable=False, default=0)
+
+class ChainCheckpoint(db.Model):
+    __tablename__ = 'chain_checkpoints'
+    checkpoint_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    previous_root = db.Column(db.String(64), nullable=True)  # NULL for the genesis checkpoint written by the migration
+    root_hash = db.Column(db.String(64), unique=True, nullable=False)
+    heads = db.Column(db.Text, nullable=False)  # JSON {shard_id: [last_transaction_id, head_hash]}
+    shard_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ReconciliationIssue(db.Model):
+    __tablename__ = 'reconciliation_issues'
+    __table_args__ = (
+        # Open issues of one transaction, looked up for every reconciled batch
+        db.Index('ix_reconciliation_issues_tx_resolved', 'transaction_id', 'resolved_at'),
+    )
+    issue_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.transaction_id'), nullable=False)
+    kind = db.Column(Enum(ReconciliationIssueKind), nullable=False)
+    blockchain_hash = db.Column(db.String(66), nullable=True)
+    detail = db.Column(db.Text, nullable=True)  # e.g. which anchored fields differ
+    detected_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime, nullable=True)  # Set when a later pass finds the row consistent
@@ -0,0 +1,168 @@
+"""
+On-demand profiling of live requests.
+
+A request is profiled with cProfile when it is picked by the
+PROFILE_SAMPLE_RATE sampler, or when an admin sends the ``X-Profile``
+header. Profiles are written as ``.prof`` files (readable with pstats or
+snakeviz) to a directory that keeps only the newest PROFILE_KEEP files.
+With sampling off and no header the only cost per request is one config
+lookup and one header lookup.
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from datetime import datetime
+
+from flask import current_app, g, request
+
+from local_auth import verify_token
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_SUFFIX = ".prof"
+DEFAULT_KEEP = 100
+_NAME_PATTERN = re.compile(r"^(?P<stamp>\d{8}T\d{12})_(?P<endpoint>[\w.]+)_(?P<ms>\d+)ms\.prof$")
+
+def profile_dir(app=None):
+    app = app or current_app
+    return app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+
+def _is_admin_request():
+    """True when the request carries a valid token for an Admin user."""
+    from models import User, UserRole
+
+    auth_header = request.headers.get("Authorization", "")
+    parts = auth_header.split(" ")
+    if len(parts) != 2:
+        return False
+    user_info = verify_token(parts[1])
+    if not user_info:
+        return False
+    user = User.query.get(user_info["user_id"])
+    return bool(user and user.role == UserRole.Admin)
+
+def _start_profile():
+    rate = current_app.config.get("PROFILE_SAMPLE_RATE")
+    sampled = bool(rate) and random.random() < rate
+    if not sampled and not (request.headers.get(PROFILE_HEADER) and _is_admin_request()):
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this interpreter.
+        return
+    g.profiler = profiler
+    g.profile_started = time.perf_counter()
+
+def _finish_profile(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    elapsed_ms = int((time.perf_counter() - g.profile_started) * 1000)
+
+    try:
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        endpoint = (request.endpoint or "unmatched").replace("/", ".")
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{endpoint}_{elapsed_ms}ms{PROFILE_SUFFIX}"
+        profiler.dump_stats(os.path.join(directory, name))
+        _rotate(directory, current_app.config.get("PROFILE_KEEP", DEFAULT_KEEP))
+        response.headers["X-Profile-Id"] = name
+    except OSError as e:
+        logging.warning(f"Could not write request profile: {e}")
+    return response
+
+def _discard_profile(exc=None):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+
+def _rotate(directory, keep):
+    names = sorted(n for n in os.listdir(directory) if n.endswith(PROFILE_SUFFIX))
+    for name in names[:max(len(names) - keep, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+def list_profiles(endpoint=None):
+    """
+    List stored profiles, newest first.
+
+    Args:
+        endpoint: Only return profiles of this Flask endpoint
+
+    Returns:
+        List of dicts with the profile name, endpoint, duration and timestamp
+    """
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        match = _NAME_PATTERN.match(name)
+        if not match or (endpoint and match.group("endpoint") != endpoint):
+            continue
+        profiles.append({
+            "name": name,
+            "endpoint": match.group("endpoint"),
+            "duration_ms": int(match.group("ms")),
+            "created_at": datetime.strptime(match.group("stamp"), "%Y%m%dT%H%M%S%f").isoformat(),
+        })
+    return profiles
+
+def profile_path(name):
+    """Resolve a profile name to its path, or None if it is not a stored profile."""
+    if not _NAME_PATTERN.match(name or ""):
+        return None
+    path = os.path.join(profile_dir(), name)
+    return path if os.path.isfile(path) else None
+
+def hot_functions(paths, limit=20, sort="tottime"):
+    """
+    Merge one or more profiles and return the top functions.
+
+    Args:
+        paths: Profile file paths to merge
+        limit: Number of functions to return
+        sort: ``tottime`` (own time) or ``cumtime`` (including callees)
+
+    Returns:
+        List of dicts describing the hottest functions
+    """
+    if not paths:
+        return []
+    stats = pstats.Stats(*paths)
+    index = 3 if sort == "cumtime" else 2
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+    result = []
+    for (filename, line, func), (primitive_calls, calls, tottime, cumtime, _) in rows:
+        result.append({
+            "function": f"{filename}:{line}({func})",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "total_time": round(tottime, 6),
+            "cumulative_time": round(cumtime, 6),
+            "per_call": round(tottime / calls, 9) if calls else 0,
+        })
+    return result
+
+def init_profiling(app):
+    """
+    Enable on-demand request profiling on a Flask app.
+
+    Config keys:
+        PROFILE_SAMPLE_RATE: Fraction of requests to profile (default off)
+        PROFILE_DIR: Where profiles are written (default instance/profiles)
+        PROFILE_KEEP: How many profiles to keep before rotating (default 100)
+    """
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_discard_profile)
@@ -0,0 +1,198 @@
+"""
+Per-request SQL query counting and timing.
+
+Hooks SQLAlchemy engine events to record, for every request, how many
+statements ran, how long they took, the slowest one and how many were
+repeats of an earlier statement (the usual sign of an N+1 loop).
+"""
+
+import logging
+import threading
+import time
+from collections import Counter as StatementCounter
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from metrics import REGISTRY
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "ledger_http_request_duration_seconds", "Request latency by endpoint", ("endpoint",))
+REQUEST_QUERIES = REGISTRY.histogram(
+    "ledger_db_queries_per_request", "SQL statements executed per request", ("endpoint",), QUERY_BUCKETS)
+REQUEST_DB_TIME = REGISTRY.histogram(
+    "ledger_db_time_per_request_seconds", "Time spent in SQL per request", ("endpoint",))
+REQUEST_DUPLICATES = REGISTRY.histogram(
+    "ledger_db_duplicate_queries_per_request", "Repeated SQL statements per request", ("endpoint",), QUERY_BUCKETS)
+REQUESTS_TOTAL = REGISTRY.counter(
+    "ledger_http_requests", "Requests served by endpoint and status", ("endpoint", "status"))
+
+_local = threading.local()
+_listeners_installed = False
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block of code runs more SQL than its budget allows."""
+
+class QueryStats:
+    """Accumulates the statements executed while it is active."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.statements = StatementCounter()
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self.statements.values() if n > 1)
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.statements[statement] += 1
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+def _active_collectors():
+    collectors = getattr(_local, "collectors", None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    return collectors
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which is discarded with the statement,
+    # so a statement that raises leaves nothing behind on the connection.
+    # A few internal statements run without a context and are counted untimed.
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collectors = getattr(_local, "collectors", None)
+    if collectors:
+        started = getattr(context, "_query_start_time", None)
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        for stats in collectors:
+            stats.record(statement, elapsed)
+
+def install_listeners():
+    """Attach the cursor listeners to every engine (idempotent)."""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _listeners_installed = True
+
+@contextmanager
+def collect_queries():
+    """Record every statement executed on this thread inside the block."""
+    install_listeners()
+    stats = QueryStats()
+    collectors = _active_collectors()
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+@contextmanager
+def query_budget(max_queries, max_duplicates=None):
+    """
+    Assert that the block runs at most ``max_queries`` SQL statements.
+
+    Intended for tests, e.g.::
+
+        with query_budget(3):
+            client.get('/api/users')
+
+    Args:
+        max_queries: Maximum number of statements allowed
+        max_duplicates: Optional maximum number of repeated statements
+
+    Raises:
+        QueryBudgetExceeded: If either limit is exceeded
+    """
+    with collect_queries() as stats:
+        yield stats
+    _check_budget(stats, max_queries, max_duplicates)
+
+def _check_budget(stats, max_queries, max_duplicates=None, label="block"):
+    problems = []
+    if max_queries is not None and stats.count > max_queries:
+        problems.append(f"{stats.count} queries (budget {max_queries})")
+    if max_duplicates is not None and stats.duplicates > max_duplicates:
+        problems.append(f"{stats.duplicates} duplicate queries (budget {max_duplicates})")
+    if problems:
+        repeated = "\n".join(f"  {n}x {sql}" for sql, n in stats.statements.most_common(5))
+        raise QueryBudgetExceeded(f"{label} ran {' and '.join(problems)}. Most frequent:\n{repeated}")
+
+def _start_request():
+    g.request_start_time = time.perf_counter()
+    g.query_stats = QueryStats()
+    _active_collectors().append(g.query_stats)
+
+def _finish_request(response):
+    from flask import current_app
+
+    stats = g.pop("query_stats", None)
+    if stats is None:
+        return response
+    collectors = _active_collectors()
+    if stats in collectors:
+        collectors.remove(stats)
+
+    # View name without the blueprint prefix ("api.login" -> "login")
+    endpoint = request.endpoint.rsplit(".", 1)[-1] if request.endpoint else "unmatched"
+    duration = time.perf_counter() - g.request_start_time
+    REQUEST_DURATION.observe(duration, endpoint=endpoint)
+    REQUEST_QUERIES.observe(stats.count, endpoint=endpoint)
+    REQUEST_DB_TIME.observe(stats.total_time, endpoint=endpoint)
+    REQUEST_DUPLICATES.observe(stats.duplicates, endpoint=endpoint)
+    REQUESTS_TOTAL.inc(endpoint=endpoint, status=str(response.status_code))
+
+    config = current_app.config
+    if stats.slowest_time >= config.get("SLOW_QUERY_THRESHOLD", 0.25):
+        logging.warning("Slow query in %s (%.1f ms): %s", endpoint, stats.slowest_time * 1000, stats.slowest_statement)
+
+    if config.get("SERVER_TIMING", current_app.debug):
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.total_time * 1000:.2f};desc="{stats.count} queries, {stats.duplicates} duplicate", '
+            f"app;dur={duration * 1000:.2f}"
+        )
+
+    budget = config.get("QUERY_BUDGET")
+    if budget is not None:
+        try:
+            _check_budget(stats, budget, config.get("QUERY_DUPLICATE_BUDGET"), label=endpoint)
+        except QueryBudgetExceeded:
+            if current_app.testing:
+                raise
+            logging.warning("Query budget exceeded", exc_info=True)
+    return response
+
+def _discard_request(exc=None):
+    stats = g.pop("query_stats", None)
+    collectors = _active_collectors()
+    if stats is not None and stats in collectors:
+        collectors.remove(stats)
+
+def init_query_metrics(app):
+    """
+    Enable per-request query instrumentation on a Flask app.
+
+    Config keys:
+        SERVER_TIMING: Emit a ``Server-Timing`` header (defaults to app.debug)
+        SLOW_QUERY_THRESHOLD: Seconds after which the slowest statement is logged
+        QUERY_BUDGET / QUERY_DUPLICATE_BUDGET: Per-request limits; exceeding
+            them raises QueryBudgetExceeded when app.testing, else logs a warning
+    """
+    install_listeners()
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_discard_request)
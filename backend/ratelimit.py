@@ -0,0 +1,312 @@
+"""
+Token-bucket rate limiting and load shedding for the unauthenticated
+endpoints that cost the most per call: ``POST /api/chatbot`` (database
+scans plus a paid Gemini request) and ``POST /api/feedback/<id>`` (a
+synchronous commit).
+
+Every check runs before the view, so a rejected request does no database
+or upstream work:
+
+1. Load shedding (503). The request is refused when the route already has
+   SHED_<ROUTE>_INFLIGHT requests running in this process, or when it
+   waited longer than SHED_MAX_QUEUE_MS in front of the app, as reported
+   by a proxy's ``X-Request-Start`` header.
+2. Rate limiting (429). Each client IP gets a token bucket per route,
+   holding RATE_LIMIT_<ROUTE> tokens (e.g. ``5/minute``) that refill
+   continuously.
+
+Both answers carry ``Retry-After``. Buckets live in a SQLite file shared
+by all workers on the host (RATE_LIMIT_STORE=sqlite, the default) or in
+process memory (``memory``, one set of buckets per worker). If the store
+fails, requests are let through.
+"""
+
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+from metrics import REGISTRY
+
+# Route -> Flask endpoint (without the blueprint prefix)
+LIMITED_ENDPOINTS = {"chatbot": "chatbot", "feedback": "add_feedback"}
+DEFAULT_LIMITS = {"chatbot": "5/minute", "feedback": "10/minute"}
+DEFAULT_MAX_INFLIGHT = {"chatbot": 8, "feedback": 16}
+DEFAULT_MAX_QUEUE_MS = 2000
+SHED_RETRY_AFTER = 1
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+IDLE_BUCKET_SECONDS = 86400  # SQLite rows untouched this long are pruned...
+PRUNE_PROBABILITY = 0.001  # ...by one request in a thousand
+
+RATE_LIMITED = REGISTRY.counter(
+    "ledger_rate_limited", "Requests refused before the view by route and reason", ("route", "reason"))
+RATE_LIMIT_STORE_ERRORS = REGISTRY.counter(
+    "ledger_rate_limit_store_errors", "Token bucket store failures (requests were let through)")
+
+class RateLimitError(Exception):
+    """Raised for a malformed rate limit setting."""
+
+class Rejected(Exception):
+    """A request refused before the view; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, message, status, retry_after, reason):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+def parse_limit(value):
+    """
+    Parse ``"<count>/<period>"`` into a bucket.
+
+    Args:
+        value: e.g. ``"5/minute"``, ``"100/hour"``; ``"off"`` or empty for no limit
+
+    Returns:
+        Tuple of (capacity, tokens per second), or None for no limit
+
+    Raises:
+        RateLimitError: If the value is malformed
+    """
+    if not value or str(value).lower() == "off":
+        return None
+    try:
+        count, period = str(value).split("/")
+        capacity = int(count)
+        seconds = PERIODS[period.strip().lower().rstrip("s")]
+    except (ValueError, KeyError):
+        raise RateLimitError(f"Invalid rate limit {value!r}, expected e.g. 5/minute")
+    if capacity <= 0:
+        raise RateLimitError(f"Invalid rate limit {value!r}, count must be positive")
+    return capacity, capacity / seconds
+
+def _refill(tokens, updated, capacity, rate, now):
+    """
+    Take one token from a bucket last seen at ``updated`` with ``tokens`` left.
+
+    Returns:
+        Tuple of (tokens left, seconds until a token is available or 0 if taken)
+    """
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+class MemoryStore:
+    """Buckets in process memory: each worker limits on its own."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (None, now, now))
+            tokens, wait = _refill(tokens, updated, capacity, rate, now)
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                # Drop buckets that have refilled completely; they hold no state
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            return wait
+
+class SQLiteStore:
+    """
+    Buckets in a local SQLite file, shared by every worker on the host.
+
+    The file is opened on the first ``take()``, not at app creation, so
+    starting a worker does no disk I/O for the limiter.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._setup_lock = threading.Lock()
+        self._ready = False
+
+    def _setup(self):
+        with self._setup_lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with sqlite3.connect(self.path) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._ready = True
+
+    def _conn(self):
+        # One connection per thread and process (connections must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if not self._ready:
+                self._setup()
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, wait = _refill(row[0] if row else None, row[1] if row else now, capacity, rate, now)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now))
+            if random.random() < PRUNE_PROBABILITY:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - IDLE_BUCKET_SECONDS,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+def create_store(name, app):
+    if name == "memory":
+        return MemoryStore()
+    if name == "sqlite":
+        return SQLiteStore(app.config.get("RATE_LIMIT_DB") or os.path.join(app.instance_path, "ratelimit.sqlite"))
+    raise RateLimitError(f"Unknown rate limit store {name!r}")
+
+def _queued_ms(request_start, now):
+    """Milliseconds since a proxy's ``X-Request-Start`` (``t=<s|ms|us>``), or None."""
+    if not request_start:
+        return None
+    try:
+        value = float(request_start.strip().removeprefix("t="))
+    except ValueError:
+        return None
+    # nginx sends seconds, Heroku milliseconds, some proxies microseconds
+    if value > 1e14:
+        value /= 1e6
+    elif value > 1e11:
+        value /= 1e3
+    return max(0.0, (now - value) * 1000)
+
+class Limiter:
+    """Admission checks for the routes in LIMITED_ENDPOINTS."""
+
+    def __init__(self, store, limits, max_inflight, max_queue_ms):
+        self.store = store
+        self.limits = limits
+        self.max_inflight = max_inflight
+        self.max_queue_ms = max_queue_ms
+        self._inflight = dict.fromkeys(LIMITED_ENDPOINTS, 0)
+        self._lock = threading.Lock()
+
+    def acquire(self, route, client, request_start=None):
+        """
+        Admit one request for ``route`` from ``client``; pair with ``release()``.
+
+        Raises:
+            Rejected: 503 when shedding load, 429 when the client's bucket is empty
+        """
+        now = time.time()
+        queued = _queued_ms(request_start, now)
+        if self.max_queue_ms and queued is not None and queued > self.max_queue_ms:
+            raise Rejected("Server is busy, please retry shortly", 503, SHED_RETRY_AFTER, "queue")
+        with self._lock:
+            limit = self.max_inflight.get(route)
+            if limit and self._inflight[route] >= limit:
+                raise Rejected("Server is busy, please retry shortly", 503, SHED_RETRY_AFTER, "concurrency")
+            self._inflight[route] += 1
+        try:
+            bucket = self.limits.get(route)
+            if bucket:
+                try:
+                    wait = self.store.take(f"{route}:{client}", *bucket, now)
+                except Exception:
+                    RATE_LIMIT_STORE_ERRORS.inc()
+                    wait = 0
+                if wait:
+                    raise Rejected("Too many requests, please slow down", 429, max(1, math.ceil(wait)), "rate")
+        except Rejected:
+            self.release(route)
+            raise
+
+    def release(self, route):
+        with self._lock:
+            self._inflight[route] -= 1
+
+def client_address(remote_addr, forwarded_for, proxy_hops):
+    """Client IP, taken from X-Forwarded-For when the app runs behind ``proxy_hops`` proxies."""
+    if proxy_hops and forwarded_for:
+        hops = [h.strip() for h in forwarded_for.split(",")]
+        if len(hops) >= proxy_hops:
+            return hops[-proxy_hops]
+    return remote_addr or "unknown"
+
+def rejection_body(route, message):
+    # The chatbot UI reads "answer"; everything else uses success/message
+    if route == "chatbot":
+        return {"answer": message}
+    return {"success": False, "message": message}
+
+def _route():
+    endpoint = (request.endpoint or "").rsplit(".", 1)[-1]
+    for route, name in LIMITED_ENDPOINTS.items():
+        if name == endpoint and request.method == "POST":
+            return route
+    return None
+
+def _admit():
+    route = _route()
+    if route is None:
+        return None
+    limiter = current_app.extensions["rate_limiter"]
+    client = client_address(request.remote_addr, request.headers.get("X-Forwarded-For"),
+                            current_app.config.get("PROXY_HOPS", 0))
+    try:
+        limiter.acquire(route, client, request.headers.get("X-Request-Start"))
+    except Rejected as e:
+        RATE_LIMITED.inc(route=route, reason=e.reason)
+        response = jsonify(rejection_body(route, e.message))
+        response.status_code = e.status
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
+    g.rate_limited_route = route
+    return None
+
+def _release(exc=None):
+    route = g.pop("rate_limited_route", None)
+    if route is not None:
+        current_app.extensions["rate_limiter"].release(route)
+
+def limiter_from_config(app):
+    """Build the Limiter described by the app's RATE_LIMIT_* and SHED_* settings."""
+    config = app.config
+    limits = {route: parse_limit(config.get(f"RATE_LIMIT_{route.upper()}", DEFAULT_LIMITS[route]))
+              for route in LIMITED_ENDPOINTS}
+    max_inflight = {route: int(config.get(f"SHED_{route.upper()}_INFLIGHT", DEFAULT_MAX_INFLIGHT[route]))
+                    for route in LIMITED_ENDPOINTS}
+    store = create_store(config.get("RATE_LIMIT_STORE", "sqlite"), app) if any(limits.values()) else None
+    return Limiter(store, limits, max_inflight, float(config.get("SHED_MAX_QUEUE_MS", DEFAULT_MAX_QUEUE_MS)))
+
+def init_rate_limits(app):
+    """
+    Enable rate limiting and load shedding on a Flask app.
+
+    Config keys:
+        RATE_LIMIT_CHATBOT, RATE_LIMIT_FEEDBACK: Bucket per client IP,
+            e.g. "5/minute", or "off" (defaults 5/minute and 10/minute)
+        RATE_LIMIT_STORE: sqlite (shared by workers, default) or memory
+        RATE_LIMIT_DB: SQLite file for the buckets (default instance/ratelimit.sqlite)
+        SHED_CHATBOT_INFLIGHT, SHED_FEEDBACK_INFLIGHT: Concurrent requests
+            per process before shedding, 0 for no cap (defaults 8 and 16)
+        SHED_MAX_QUEUE_MS: Shed requests that waited longer than this behind
+            a proxy sending X-Request-Start, 0 to disable (default 2000)
+        PROXY_HOPS: Number of proxies that append to X-Forwarded-For (default 0)
+    """
+    app.extensions["rate_limiter"] = limiter_from_config(app)
+    app.before_request(_admit)
+    app.teardown_request(_release)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Blockchain reconciliation: check settled transactions against the chain.
+
+A pass streams settled transactions in ``transaction_id`` order, in
+batches of ``--batch-size`` rows, and looks their ``blockchain_hash``
+values up through the blockchain-backend's ``POST /api/receipts``. The
+lookups run ``--lookup-size`` hashes per call on a pool of ``--workers``
+threads, and at most ``--window`` batches are in flight. Findings are kept
+in ``reconciliation_issues``:
+
+- MissingAnchor: settled, but no blockchain_hash (``--anchor-missing``
+                 anchors these with one batch call per database batch)
+- NotOnChain:    the hash has no receipt
+- Reverted:      the anchoring call failed on chain
+- Mismatch:      the anchored record differs from the row (amount,
+                 purpose, sender or receiving department name)
+
+An issue stays open until a later pass finds the row consistent.
+
+Every finished batch commits its issues together with the ``last_id``
+of the ``blockchain_reconcile`` job checkpoint, so an interrupted pass
+resumes after the last finished batch. Each pass checks the whole
+settled ledger, because old rows are settled by later approvals. The
+checkpoint goes back to 0 when a pass completes.
+
+    python reconcile.py                    # Run (or resume) one pass
+    python reconcile.py --restart          # Start a new pass from the first row
+    python reconcile.py --every 3600       # Scheduled: a pass every hour
+    python mock_blockchain.py --import-ledger &   # Local stand-in for the API
+"""
+
+import argparse
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import aliased
+
+from models import (db, User, Department, Transaction, TransactionStatus, JobCheckpoint,
+                    ReconciliationIssue, ReconciliationIssueKind)
+from blockchain_client import anchor_payload, anchor_batch, lookup_receipts, BlockchainError, MAX_BATCH
+
+CHECKPOINT_NAME = "blockchain_reconcile"
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_LOOKUP_SIZE = 200
+DEFAULT_WORKERS = 8
+DEFAULT_WINDOW = 4
+
+def _settled_batches(after_id, batch_size):
+    """Yield settled rows with the names the anchored record was built from, in id order."""
+    creator = aliased(User)
+    while True:
+        rows = db.session.execute(
+            select(
+                Transaction.transaction_id,
+                Transaction.blockchain_hash,
+                Transaction.amount,
+                Transaction.purpose,
+                creator.name.label("creator_name"),
+                Department.name.label("dept_name"),
+            )
+            .join(Department, Department.dept_id == Transaction.dept_id)
+            .outerjoin(creator, creator.user_id == Transaction.created_by_id)
+            .where(Transaction.status == TransactionStatus.Settled, Transaction.transaction_id > after_id)
+            .order_by(Transaction.transaction_id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].transaction_id
+
+def _expected_record(row):
+    # Same record approvals anchor (see approvals.prepare_approval)
+    return anchor_payload(row, row.creator_name or "Unknown", row.dept_name)
+
+def _same_amount(a, b):
+    try:
+        return Decimal(str(a)) == Decimal(str(b))
+    except InvalidOperation:
+        return False
+
+def check_receipt(row, receipt):
+    """
+    Compare one settled row with its on-chain receipt.
+
+    Returns:
+        Tuple of (ReconciliationIssueKind, detail), or None if consistent
+    """
+    if not receipt.get("found"):
+        return ReconciliationIssueKind.NotOnChain, receipt.get("error")
+    if receipt.get("status") == 0:
+        return ReconciliationIssueKind.Reverted, f"Reverted in block {receipt.get('blockNumber')}"
+    record = receipt.get("record")
+    if record is None:
+        return ReconciliationIssueKind.Mismatch, "Receipt has no ledger record"
+    expected = _expected_record(row)
+    differences = [
+        f"{field}: ledger {expected[field]!r}, chain {record.get(field)!r}"
+        for field in ("fromDept", "toDept", "amount", "purpose")
+        if not (_same_amount(expected[field], record.get(field)) if field == "amount"
+                else expected[field] == record.get(field))
+    ]
+    if differences:
+        return ReconciliationIssueKind.Mismatch, "; ".join(differences)
+    return None
+
+def _anchor_missing(rows):
+    """Anchor settled rows without a hash. Returns {transaction_id: error} for the failures."""
+    failures = {}
+    for start in range(0, len(rows), MAX_BATCH):
+        chunk = rows[start:start + MAX_BATCH]
+        try:
+            results = anchor_batch([_expected_record(row) for row in chunk])
+        except BlockchainError as e:
+            results = [{"success": False, "error": str(e)}] * len(chunk)
+        for row, result in zip(chunk, results):
+            if result.get("success"):
+                db.session.execute(
+                    update(Transaction)
+                    .where(Transaction.transaction_id == row.transaction_id)
+                    .values(blockchain_hash=result.get("transactionHash"))
+                )
+            else:
+                failures[row.transaction_id] = result.get("error", "Unknown error")
+    return failures
+
+def _record_issues(rows, found, now):
+    """Open new issues, refresh still-present ones and resolve the rest for a batch."""
+    ids = [row.transaction_id for row in rows]
+    open_issues = {
+        (issue.transaction_id, issue.kind): issue
+        for issue in ReconciliationIssue.query.filter(
+            ReconciliationIssue.transaction_id.in_(ids), ReconciliationIssue.resolved_at.is_(None)
+        )
+    }
+    for key, (blockchain_hash, detail) in found.items():
+        issue = open_issues.pop(key, None)
+        if issue is None:
+            db.session.add(ReconciliationIssue(
+                transaction_id=key[0], kind=key[1], blockchain_hash=blockchain_hash,
+                detail=detail, detected_at=now, last_seen_at=now))
+        else:
+            issue.blockchain_hash, issue.detail, issue.last_seen_at = blockchain_hash, detail, now
+    for issue in open_issues.values():
+        issue.resolved_at = now
+
+def _save_checkpoint(last_id):
+    checkpoint = db.session.get(JobCheckpoint, CHECKPOINT_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(job_name=CHECKPOINT_NAME)
+        db.session.add(checkpoint)
+    checkpoint.last_id = last_id
+
+def _finish_batch(rows, futures, anchor_missing, stats):
+    receipts = {}
+    for future in futures:
+        for receipt in future.result():  # A failed lookup stops the pass before this batch is committed
+            receipts[receipt["transactionHash"]] = receipt
+
+    found = {}
+    unanchored = [row for row in rows if not row.blockchain_hash]
+    if unanchored:
+        failures = _anchor_missing(unanchored) if anchor_missing else {row.transaction_id: None for row in unanchored}
+        stats["anchored"] += len(unanchored) - len(failures)
+        for tx_id, error in failures.items():
+            found[(tx_id, ReconciliationIssueKind.MissingAnchor)] = (None, error)
+    for row in rows:
+        if row.blockchain_hash:
+            result = check_receipt(row, receipts[row.blockchain_hash])
+            if result:
+                found[(row.transaction_id, result[0])] = (row.blockchain_hash, result[1])
+
+    _record_issues(rows, found, datetime.utcnow())
+    _save_checkpoint(rows[-1].transaction_id)
+    db.session.commit()
+    stats["checked"] += len(rows)
+    for _, kind in found:
+        stats["issues"][kind.value] = stats["issues"].get(kind.value, 0) + 1
+
+def reconcile(restart=False, batch_size=DEFAULT_BATCH_SIZE, lookup_size=DEFAULT_LOOKUP_SIZE,
+              workers=DEFAULT_WORKERS, window=DEFAULT_WINDOW, anchor_missing=False):
+    """
+    Run or resume one reconciliation pass over the settled ledger.
+    Must be called inside an application context.
+
+    Args:
+        restart: Ignore an interrupted pass and start from the first row
+        batch_size: Settled rows read and committed per batch
+        lookup_size: Hashes per ``/api/receipts`` call (at most MAX_BATCH)
+        workers: Concurrent receipt lookups
+        window: Batches whose lookups may be in flight at once
+        anchor_missing: Anchor settled rows that have no blockchain_hash
+
+    Returns:
+        Dict with the rows checked, rows anchored, issues found per kind
+        and where the pass started
+
+    Raises:
+        BlockchainError: If a lookup fails; the pass resumes from the
+            last committed batch on the next run
+    """
+    lookup_size = min(lookup_size, MAX_BATCH)
+    checkpoint = db.session.get(JobCheckpoint, CHECKPOINT_NAME)
+    start_id = 0 if restart or checkpoint is None else checkpoint.last_id
+    stats = {"started_after": start_id, "checked": 0, "anchored": 0, "issues": {}}
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reconcile") as pool:
+        try:
+            for rows in _settled_batches(start_id, batch_size):
+                hashes = [row.blockchain_hash for row in rows if row.blockchain_hash]
+                futures = [pool.submit(lookup_receipts, hashes[i:i + lookup_size])
+                           for i in range(0, len(hashes), lookup_size)]
+                pending.append((rows, futures))
+                if len(pending) >= window:
+                    _finish_batch(*pending.popleft(), anchor_missing, stats)
+            while pending:
+                _finish_batch(*pending.popleft(), anchor_missing, stats)
+        except BaseException:
+            db.session.rollback()
+            for _, futures in pending:
+                for future in futures:
+                    future.cancel()
+            raise
+
+    # Pass complete: the next run starts from the first row again
+    _save_checkpoint(0)
+    db.session.commit()
+    return stats
+
+def open_issues(limit=100):
+    """Open issues, newest first, with the counts per kind."""
+    counts = dict(
+        db.session.query(ReconciliationIssue.kind, db.func.count())
+        .filter(ReconciliationIssue.resolved_at.is_(None))
+        .group_by(ReconciliationIssue.kind)
+        .all()
+    )
+    issues = (
+        ReconciliationIssue.query
+        .filter(ReconciliationIssue.resolved_at.is_(None))
+        .order_by(ReconciliationIssue.detected_at.desc(), ReconciliationIssue.issue_id.desc())
+        .limit(limit)
+        .all()
+    )
+    checkpoint = db.session.get(JobCheckpoint, CHECKPOINT_NAME)
+    return {
+        "counts": {kind.value: count for kind, count in counts.items()},
+        "issues": [{
+            "issue_id": issue.issue_id,
+            "transaction_id": issue.transaction_id,
+            "kind": issue.kind.value,
+            "blockchain_hash": issue.blockchain_hash,
+            "detail": issue.detail,
+            "detected_at": issue.detected_at.isoformat(),
+            "last_seen_at": issue.last_seen_at.isoformat(),
+        } for issue in issues],
+        "pass_in_progress_after": checkpoint.last_id if checkpoint and checkpoint.last_id else None,
+        "checkpoint_updated_at": checkpoint.updated_at.isoformat() if checkpoint and checkpoint.updated_at else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile settled transactions with the blockchain")
+    parser.add_argument("--restart", action="store_true", help="Start a new pass instead of resuming")
+    parser.add_argument("--anchor-missing", action="store_true", help="Anchor settled rows without a blockchain_hash")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--lookup-size", type=int, default=DEFAULT_LOOKUP_SIZE, help="Hashes per receipts call")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent receipt lookups")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Batches in flight")
+    parser.add_argument("--every", type=float, help="Keep running, one pass every N seconds")
+    args = parser.parse_args()
+
+    from app import app
+    restart = args.restart
+    while True:
+        with app.app_context():
+            started = time.perf_counter()
+            try:
+                result = reconcile(restart, args.batch_size, args.lookup_size, args.workers, args.window,
+                                   args.anchor_missing)
+                print(f"Reconciled {result['checked']} settled transactions in {time.perf_counter() - started:.2f}s "
+                      f"(anchored {result['anchored']}, issues {result['issues'] or 'none'})")
+            except BlockchainError as e:
+                print(f"Pass interrupted, will resume from the checkpoint: {e}")
+                if not args.every:
+                    raise SystemExit(1)
+        if not args.every:
+            break
+        restart = False
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Per-department spending rollups for dashboard time-series charts.
+
+Every transaction contributes to one row of ``spending_rollups_daily``
+and one row of ``spending_rollups_monthly``, keyed by (department,
+period, status), holding the row count, the sum of positive amounts
+(``sum_in``) and the sum of negative amounts as a positive total
+(``sum_out``), the same sign convention as the budget report.
+``spending_rollups_by_sender`` holds the same totals per creator and
+status, for the sending side of the dashboard balances.
+
+ORM writes keep the rollups current through a session ``after_flush``
+hook that applies the before/after difference of each inserted, updated
+or deleted transaction. Bulk inserts that bypass the ORM (bench_data.py)
+must call ``rebuild_rollups()`` afterwards. Archiving ledger history does
+not touch the rollups, so charts keep covering archived periods.
+
+Usage:
+    python rollups.py --rebuild
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, func, case, inspect, and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import (
+    db, Department, Transaction, TransactionStatus, DailySpendingRollup, MonthlySpendingRollup, SenderSpendingRollup,
+)
+
+GRANULARITIES = {"day": DailySpendingRollup, "month": MonthlySpendingRollup}
+DEFAULT_RANGE_DAYS = {"day": 30, "month": 365}
+MAX_DAILY_POINTS = 3660
+
+_TRACKED_ATTRIBUTES = ("dept_id", "status", "amount", "created_at", "created_by_id")
+BALANCE_STATUSES = (TransactionStatus.Settled, TransactionStatus.Approved)
+# INSERT ... ON CONFLICT DO UPDATE, per dialect
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+_listeners_installed = False
+
+class RollupError(ValueError):
+    """Raised for invalid time-series parameters."""
+
+def month_start(day):
+    return day.replace(day=1)
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def _contribution(dept_id, status, amount, created_at):
+    """Rollup key and (count, in, out) vector for one transaction."""
+    amount = Decimal(str(amount))
+    key = (dept_id, _as_date(created_at or datetime.utcnow()), status)
+    return key, (1, amount if amount > 0 else Decimal(0), -amount if amount < 0 else Decimal(0))
+
+def _previous_values(tx):
+    """Attribute values as they were before the pending flush."""
+    state = inspect(tx)
+    values = []
+    for name in _TRACKED_ATTRIBUTES:
+        history = state.attrs[name].history
+        if history.deleted:
+            values.append(history.deleted[0])
+        elif history.unchanged:
+            values.append(history.unchanged[0])
+        else:
+            values.append(getattr(tx, name))
+    return values
+
+def _collect_deltas(session):
+    """Deltas by (dept_id, day, status) and by (created_by_id, status)."""
+    deltas = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    senders = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+
+    def apply(values, sign):
+        dept_id, status, amount, created_at, created_by_id = values
+        key, vector = _contribution(dept_id, status, amount, created_at)
+        for target, target_key in ((deltas, key), (senders, (created_by_id, status))):
+            delta = target[target_key]
+            for i in range(3):
+                delta[i] += sign * vector[i]
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            apply([getattr(obj, name) for name in _TRACKED_ATTRIBUTES], 1)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in _TRACKED_ATTRIBUTES):
+                apply(_previous_values(obj), -1)
+                apply([getattr(obj, name) for name in _TRACKED_ATTRIBUTES], 1)
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            apply(_previous_values(obj), -1)
+    return ({key: delta for key, delta in deltas.items() if any(delta)},
+            {key: delta for key, delta in senders.items() if any(delta)})
+
+def _upsert(conn, model, key, delta):
+    """
+    Add ``delta`` to the rollup row identified by ``key`` (a column -> value dict).
+
+    One atomic INSERT ... ON CONFLICT DO UPDATE, so two transactions creating
+    the same row cannot both miss it and collide on the insert. Dialects
+    without it fall back to UPDATE, then INSERT when no row matched.
+    """
+    table = model.__table__
+    insert = UPSERT_INSERTS.get(conn.dialect.name)
+    if insert is not None:
+        statement = insert(table).values(**key, tx_count=delta[0], sum_in=delta[1], sum_out=delta[2])
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={
+                "tx_count": table.c.tx_count + statement.excluded.tx_count,
+                "sum_in": table.c.sum_in + statement.excluded.sum_in,
+                "sum_out": table.c.sum_out + statement.excluded.sum_out,
+            },
+        ))
+        return
+    match = and_(*(table.c[name] == value for name, value in key.items()))
+    result = conn.execute(table.update().where(match).values(
+        tx_count=table.c.tx_count + delta[0],
+        sum_in=table.c.sum_in + delta[1],
+        sum_out=table.c.sum_out + delta[2],
+    ))
+    if result.rowcount == 0:
+        conn.execute(table.insert().values(**key, tx_count=delta[0], sum_in=delta[1], sum_out=delta[2]))
+
+def _after_flush(session, flush_context):
+    deltas, senders = _collect_deltas(session)
+    if not deltas and not senders:
+        return
+    monthly = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    conn = session.connection()
+    for (dept_id, day, status), delta in deltas.items():
+        _upsert(conn, DailySpendingRollup, {"dept_id": dept_id, "period": day, "status": status}, delta)
+        month = monthly[(dept_id, month_start(day), status)]
+        for i in range(3):
+            month[i] += delta[i]
+    for (dept_id, period, status), delta in monthly.items():
+        _upsert(conn, MonthlySpendingRollup, {"dept_id": dept_id, "period": period, "status": status}, delta)
+    for (created_by_id, status), delta in senders.items():
+        _upsert(conn, SenderSpendingRollup, {"created_by_id": created_by_id, "status": status}, delta)
+
+def _keep_history(target, value, oldvalue, initiator):
+    return value
+
+def install_rollup_listeners():
+    """Keep the rollups in step with ORM transaction writes (idempotent)."""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Session, "after_flush", _after_flush)
+        # Load the old value when a tracked attribute of an expired row is
+        # set, so the flush can subtract what the row used to contribute
+        for name in _TRACKED_ATTRIBUTES:
+            event.listen(getattr(Transaction, name), "set", _keep_history, active_history=True)
+        _listeners_installed = True
+
+def rebuild_rollups():
+    """
+    Recompute the rollup tables from the live and archived ledger.
+    Must be called inside an application context.
+
+    Returns:
+        Number of daily rollup rows written
+    """
+    from ledger_archive import iter_archived_transactions
+
+    daily = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    day_expr = func.date(Transaction.created_at)
+    grouped = (
+        db.session.query(
+            Transaction.dept_id, day_expr, Transaction.status, func.count(),
+            func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)),
+            func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0)),
+        )
+        .group_by(Transaction.dept_id, day_expr, Transaction.status)
+    )
+    for dept_id, day, status, count, amount_in, amount_out in grouped:
+        row = daily[(dept_id, _as_date(day), status)]
+        row[0] += count
+        row[1] += Decimal(str(amount_in or 0))
+        row[2] += Decimal(str(amount_out or 0))
+    senders = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    by_sender = (
+        db.session.query(
+            Transaction.created_by_id, Transaction.status, func.count(),
+            func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)),
+            func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0)),
+        )
+        .group_by(Transaction.created_by_id, Transaction.status)
+    )
+    for created_by_id, status, count, amount_in, amount_out in by_sender:
+        row = senders[(created_by_id, status)]
+        row[0] += count
+        row[1] += Decimal(str(amount_in or 0))
+        row[2] += Decimal(str(amount_out or 0))
+    for tx in iter_archived_transactions(check_seal=False):
+        key, vector = _contribution(tx.dept_id, tx.status, tx.amount, tx.created_at)
+        for row in (daily[key], senders[(tx.created_by_id, tx.status)]):
+            for i in range(3):
+                row[i] += vector[i]
+
+    monthly = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    for (dept_id, day, status), row in daily.items():
+        month = monthly[(dept_id, month_start(day), status)]
+        for i in range(3):
+            month[i] += row[i]
+
+    for model, rows, key_names in (
+        (DailySpendingRollup, daily, ("dept_id", "period", "status")),
+        (MonthlySpendingRollup, monthly, ("dept_id", "period", "status")),
+        (SenderSpendingRollup, senders, ("created_by_id", "status")),
+    ):
+        db.session.execute(model.__table__.delete())
+        values = [
+            dict(zip(key_names, key), tx_count=count, sum_in=amount_in, sum_out=amount_out)
+            for key, (count, amount_in, amount_out) in rows.items()
+        ]
+        for start in range(0, len(values), 5000):
+            db.session.execute(model.__table__.insert(), values[start:start + 5000])
+    db.session.commit()
+    return len(daily)
+
+def settled_totals():
+    """
+    Net settled and approved amounts from the rollups, archived history included.
+
+    Returns:
+        Tuple of (dept_id -> amount received, created_by_id -> amount sent)
+    """
+    net = func.sum(MonthlySpendingRollup.sum_in) - func.sum(MonthlySpendingRollup.sum_out)
+    received = {
+        dept_id: float(total or 0) for dept_id, total in
+        db.session.query(MonthlySpendingRollup.dept_id, net)
+        .filter(MonthlySpendingRollup.status.in_(BALANCE_STATUSES))
+        .group_by(MonthlySpendingRollup.dept_id)
+    }
+    sent_net = func.sum(SenderSpendingRollup.sum_in) - func.sum(SenderSpendingRollup.sum_out)
+    sent = {
+        user_id: float(total or 0) for user_id, total in
+        db.session.query(SenderSpendingRollup.created_by_id, sent_net)
+        .filter(SenderSpendingRollup.status.in_(BALANCE_STATUSES))
+        .group_by(SenderSpendingRollup.created_by_id)
+    }
+    return received, sent
+
+def department_balance(dept_id):
+    """
+    Net settled and approved amount received by a department.
+
+    Sums the department's monthly rollups instead of its transactions, so
+    the cost grows with the number of months, not the number of rows.
+    Includes archived history.
+    """
+    total = (
+        db.session.query(func.sum(MonthlySpendingRollup.sum_in) - func.sum(MonthlySpendingRollup.sum_out))
+        .filter(
+            MonthlySpendingRollup.dept_id == dept_id,
+            MonthlySpendingRollup.status.in_(BALANCE_STATUSES),
+        )
+        .scalar()
+    )
+    return float(total or 0)
+
+def exceeds_budget(balance, amount, budget):
+    """
+    The budget rule: a spend is an overrun when it takes the department's
+    running balance (settled and approved amounts received, as returned by
+    department_balance()) past its allocated budget.
+
+    Shared by create_transaction and anomaly.py, so a rescore reaches the
+    same verdict as the write path. Works elementwise on NumPy arrays.
+    """
+    return balance + amount > budget
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise RollupError(f"Invalid {name} date, expected ISO format")
+
+def timeseries(granularity="day", date_from=None, date_to=None, dept_id=None, statuses=None):
+    """
+    Spending per department and period, answered from the rollups only.
+
+    Args:
+        granularity: ``day`` or ``month``
+        date_from / date_to: Inclusive ISO dates (default: the last 30
+            days, or the last 12 months for monthly data)
+        dept_id: Restrict to one department
+        statuses: Iterable of status names to include (default all)
+
+    Returns:
+        Dict with the resolved range and a ``points`` list ordered by
+        period, each with totals and a per-status breakdown
+    """
+    model = GRANULARITIES.get(granularity)
+    if model is None:
+        raise RollupError("granularity must be 'day' or 'month'")
+    end = _parse_date(date_to, "to") if date_to else datetime.utcnow().date()
+    start = _parse_date(date_from, "from") if date_from else end - timedelta(days=DEFAULT_RANGE_DAYS[granularity])
+    if start > end:
+        raise RollupError("from must not be after to")
+    if granularity == "day" and (end - start).days >= MAX_DAILY_POINTS:
+        raise RollupError(f"Daily ranges are limited to {MAX_DAILY_POINTS} days; use granularity=month")
+    if granularity == "month":
+        start, end = month_start(start), month_start(end)
+
+    query = (
+        db.session.query(model, Department.name)
+        .outerjoin(Department, Department.dept_id == model.dept_id)
+        .filter(model.period >= start, model.period <= end, model.tx_count != 0)
+    )
+    if dept_id:
+        query = query.filter(model.dept_id == dept_id)
+    if statuses:
+        try:
+            query = query.filter(model.status.in_([TransactionStatus[s] for s in statuses]))
+        except KeyError as e:
+            raise RollupError(f"Unknown status {e.args[0]}")
+
+    points = {}
+    for row, dept_name in query.order_by(model.period, model.dept_id):
+        point = points.get((row.period, row.dept_id))
+        if point is None:
+            point = points[(row.period, row.dept_id)] = {
+                "period": row.period.isoformat(),
+                "dept_id": row.dept_id,
+                "dept_name": dept_name,
+                "count": 0,
+                "sum_in": 0.0,
+                "sum_out": 0.0,
+                "by_status": {},
+            }
+        point["count"] += row.tx_count
+        point["sum_in"] = round(point["sum_in"] + float(row.sum_in), 4)
+        point["sum_out"] = round(point["sum_out"] + float(row.sum_out), 4)
+        point["by_status"][row.status.value] = {
+            "count": row.tx_count,
+            "sum_in": float(row.sum_in),
+            "sum_out": float(row.sum_out),
+        }
+    return {
+        "granularity": granularity,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "points": list(points.values()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the spending rollup tables")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the rollups from the ledger")
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        if args.rebuild:
+            print(f"Rebuilt {rebuild_rollups()} daily rollup row(s)")
+        else:
+            parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Full-text search over transaction purposes, department names and feedback.
+
+Backed by an SQLite FTS5 table kept in sync with the ``transactions``,
+``feedback`` and ``departments`` tables by triggers, so every write path
+(ORM, bulk inserts, raw SQL) updates the index. Transactions are stored
+at rowid ``2 * transaction_id`` and feedback at ``2 * feedback_id + 1``.
+"""
+
+import base64
+import binascii
+import json
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db
+
+SEARCH_TABLE = "search_index"
+MAX_LIMIT = 100
+
+# Purpose/comment text weighs more than the department name.
+RANK_EXPR = f"bm25({SEARCH_TABLE}, 10.0, 2.0)"
+
+_CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    body,
+    dept_name,
+    kind UNINDEXED,
+    transaction_id UNINDEXED,
+    created_at UNINDEXED,
+    tokenize = 'porter unicode61'
+)
+"""
+
+_INSERT_TRANSACTION = f"""
+    INSERT INTO {SEARCH_TABLE}(rowid, body, dept_name, kind, transaction_id, created_at)
+    VALUES (new.transaction_id * 2, new.purpose,
+            (SELECT name FROM departments WHERE dept_id = new.dept_id),
+            'transaction', new.transaction_id, new.created_at);
+"""
+
+_INSERT_FEEDBACK = f"""
+    INSERT INTO {SEARCH_TABLE}(rowid, body, dept_name, kind, transaction_id, created_at)
+    VALUES (new.feedback_id * 2 + 1, new.comment,
+            (SELECT d.name FROM transactions t JOIN departments d ON d.dept_id = t.dept_id
+             WHERE t.transaction_id = new.transaction_id),
+            'feedback', new.transaction_id, new.created_at);
+"""
+
+TRIGGERS = {
+    "search_transactions_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS search_transactions_ai AFTER INSERT ON transactions BEGIN
+            {_INSERT_TRANSACTION}
+        END
+    """,
+    "search_transactions_au": f"""
+        CREATE TRIGGER IF NOT EXISTS search_transactions_au AFTER UPDATE OF purpose, dept_id ON transactions BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE rowid = old.transaction_id * 2;
+            {_INSERT_TRANSACTION}
+        END
+    """,
+    "search_transactions_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS search_transactions_ad AFTER DELETE ON transactions BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE rowid = old.transaction_id * 2;
+        END
+    """,
+    "search_feedback_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS search_feedback_ai AFTER INSERT ON feedback BEGIN
+            {_INSERT_FEEDBACK}
+        END
+    """,
+    "search_feedback_au": f"""
+        CREATE TRIGGER IF NOT EXISTS search_feedback_au AFTER UPDATE OF comment ON feedback BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE rowid = old.feedback_id * 2 + 1;
+            {_INSERT_FEEDBACK}
+        END
+    """,
+    "search_feedback_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS search_feedback_ad AFTER DELETE ON feedback BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE rowid = old.feedback_id * 2 + 1;
+        END
+    """,
+    "search_departments_au": f"""
+        CREATE TRIGGER IF NOT EXISTS search_departments_au AFTER UPDATE OF name ON departments BEGIN
+            UPDATE {SEARCH_TABLE} SET dept_name = new.name
+            WHERE transaction_id IN (SELECT transaction_id FROM transactions WHERE dept_id = new.dept_id);
+        END
+    """,
+}
+
+class SearchError(ValueError):
+    """Raised for invalid search parameters."""
+
+def search_supported():
+    return db.engine.dialect.name == "sqlite"
+
+def ensure_search_index():
+    """
+    Create the FTS table and sync triggers if they are missing.
+
+    Dropping and recreating the base tables (init_db.py, benchmarks)
+    drops the triggers with them, so missing triggers mean the index may
+    be stale and it is rebuilt from scratch. Must be called inside an
+    application context; does nothing on databases other than SQLite.
+
+    Returns:
+        True if the index was (re)built
+    """
+    if not search_supported():
+        return False
+    with db.engine.begin() as conn:
+        existing = {row[0] for row in conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'search_%'")
+        )}
+        has_table = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": SEARCH_TABLE}
+        ).first() is not None
+        if has_table and existing >= set(TRIGGERS):
+            return False
+
+        conn.execute(text(_CREATE_TABLE))
+        for ddl in TRIGGERS.values():
+            conn.execute(text(ddl))
+        _populate(conn)
+    return True
+
+def rebuild_search_index():
+    """Repopulate the index from the base tables."""
+    if not search_supported():
+        return
+    with db.engine.begin() as conn:
+        _populate(conn)
+
+def _populate(conn):
+    conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    conn.execute(text(f"""
+        INSERT INTO {SEARCH_TABLE}(rowid, body, dept_name, kind, transaction_id, created_at)
+        SELECT t.transaction_id * 2, t.purpose, d.name, 'transaction', t.transaction_id, t.created_at
+        FROM transactions t LEFT JOIN departments d ON d.dept_id = t.dept_id
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {SEARCH_TABLE}(rowid, body, dept_name, kind, transaction_id, created_at)
+        SELECT f.feedback_id * 2 + 1, f.comment, d.name, 'feedback', f.transaction_id, f.created_at
+        FROM feedback f
+        LEFT JOIN transactions t ON t.transaction_id = f.transaction_id
+        LEFT JOIN departments d ON d.dept_id = t.dept_id
+    """))
+
+def build_match_query(q):
+    """
+    Turn free text into a safe FTS5 query: every word is quoted (so FTS
+    operators in user input are treated as text) and the last word
+    matches as a prefix, for search-as-you-type.
+    """
+    words = re.findall(r"\w+", q or "")
+    if not words:
+        raise SearchError("Search query must contain at least one word")
+    quoted = ['"' + w.replace('"', '""') + '"' for w in words[:16]]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def encode_cursor(rank, rowid):
+    raw = json.dumps([rank, rowid]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, rowid = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), int(rowid)
+    except (ValueError, TypeError, binascii.Error):
+        raise SearchError("Invalid cursor")
+
+def _parse_date(value, name):
+    try:
+        # str() of a datetime matches SQLite's stored DateTime format.
+        return str(datetime.fromisoformat(value))
+    except ValueError:
+        raise SearchError(f"Invalid {name} date, expected ISO format")
+
+def search(q, kind=None, status=None, dept_id=None, date_from=None, date_to=None, limit=20, cursor=None):
+    """
+    Ranked full-text search with filters and cursor pagination.
+
+    Args:
+        q: Free-text query
+        kind: ``transaction`` or ``feedback`` (default both)
+        status: Transaction status filter
+        dept_id: Receiving department filter
+        date_from / date_to: ISO dates bounding the document's created_at
+        limit: Page size (max 100)
+        cursor: Opaque cursor from a previous page
+
+    Returns:
+        Dict with ``results`` and ``next_cursor``
+    """
+    params = {"match": build_match_query(q), "limit": max(1, min(int(limit), MAX_LIMIT)) + 1}
+    where = [f"{SEARCH_TABLE} MATCH :match"]
+
+    if kind:
+        if kind not in ("transaction", "feedback"):
+            raise SearchError("type must be 'transaction' or 'feedback'")
+        where.append("s.kind = :kind")
+        params["kind"] = kind
+    if status:
+        where.append("t.status = :status")
+        params["status"] = status
+    if dept_id:
+        where.append("t.dept_id = :dept_id")
+        params["dept_id"] = dept_id
+    if date_from:
+        where.append("s.created_at >= :date_from")
+        params["date_from"] = _parse_date(date_from, "from")
+    if date_to:
+        where.append("s.created_at <= :date_to")
+        params["date_to"] = _parse_date(date_to, "to")
+    if cursor:
+        params["cursor_rank"], params["cursor_rowid"] = decode_cursor(cursor)
+        where.append(f"({RANK_EXPR} > :cursor_rank OR ({RANK_EXPR} = :cursor_rank AND s.rowid > :cursor_rowid))")
+
+    sql = f"""
+        SELECT s.rowid, {RANK_EXPR} AS score, s.kind, s.body, s.created_at,
+               t.transaction_id, t.dept_id, d.name, t.amount, t.status, t.purpose
+        FROM {SEARCH_TABLE} s
+        JOIN transactions t ON t.transaction_id = s.transaction_id
+        LEFT JOIN departments d ON d.dept_id = t.dept_id
+        WHERE {' AND '.join(where)}
+        ORDER BY score, s.rowid
+        LIMIT :limit
+    """
+    rows = db.session.execute(text(sql), params).all()
+    has_more = len(rows) == params["limit"]
+    rows = rows[:params["limit"] - 1]
+
+    results = []
+    for rowid, score, row_kind, body, created_at, tx_id, row_dept_id, dept_name, amount, tx_status, purpose in rows:
+        item = {
+            "type": row_kind,
+            "score": round(-score, 6),
+            "text": body,
+            "created_at": created_at.replace(" ", "T") if isinstance(created_at, str) else created_at,
+            "transaction_id": tx_id,
+            "dept_id": row_dept_id,
+            "dept_name": dept_name,
+            "amount": float(amount),
+            "status": tx_status,
+            "purpose": purpose,
+        }
+        if row_kind == "feedback":
+            item["feedback_id"] = (rowid - 1) // 2
+        results.append(item)
+
+    next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if has_more and rows else None
+    return {"results": results, "next_cursor": next_cursor}
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Precomputed gzip snapshots of the public ledger views.
+
+``publish()`` renders ``/api/public/transactions``, ``/api/ledger`` and
+``/api/ledger/verify`` through their own view functions, writes each one
+whole and in pages of SNAPSHOT_PAGE_SIZE rows as gzip JSON, and then
+atomically replaces ``manifest.json``, which names the files of the
+current generation and the ledger head hash. The public routes call
+``snapshot_response()`` first and, when a snapshot exists, answer with
+``send_file`` (``sendfile`` under gunicorn) without touching the database.
+
+Committed ORM writes and bulk SQL run through the session mark the views
+stale. Publishing is debounced: it runs SNAPSHOT_DEBOUNCE seconds after
+the last write, and at most SNAPSHOT_MAX_DELAY seconds after the first one,
+so reads can trail writes by that long. Writes made outside the session
+(another process without the app, manual SQL) need
+``python snapshots.py --publish``.
+
+Publishing is incremental where it can be. ``/api/ledger/verify`` resumes
+from the chain heads the previous publish verified (recorded in the
+manifest), so a publish hashes only the rows appended since, and a page
+whose content is unchanged is hard-linked from the previous generation
+instead of being compressed again. The verify snapshot reports when it
+was generated and the head it verified up to; use
+``python ledger_chain.py --verify`` for a full live check.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishes are only serialized within one process
+    fcntl = None
+
+from flask import current_app, g, has_app_context, request, send_file
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from metrics import REGISTRY
+from models import Transaction
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_MAX_DELAY = 10.0
+MANIFEST = "manifest.json"
+KEEP_GENERATIONS = 2  # The previous generation stays while readers may still open its files
+# Tables whose writes change a public view
+SOURCE_TABLES = {"transactions", "users", "departments", "ledger_segments", "chain_checkpoints", "feedback"}
+
+# View name -> (endpoint, path, key holding the rows; None for a bare list, absent when not paged)
+VIEWS = {
+    "public_transactions": ("api.get_public_transactions", "/api/public/transactions", "transactions"),
+    "ledger": ("api.get_public_ledger", "/api/ledger", None),
+    "ledger_verify": ("api.verify_ledger_integrity", "/api/ledger/verify"),
+}
+
+SNAPSHOT_PUBLISHES = REGISTRY.counter(
+    "ledger_snapshot_publishes", "Snapshot publishes by result", ("result",))
+SNAPSHOT_PUBLISH_DURATION = REGISTRY.histogram(
+    "ledger_snapshot_publish_seconds", "Time to render and write all snapshots",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+SNAPSHOT_READS = REGISTRY.counter(
+    "ledger_snapshot_reads", "Public reads by view and source (snapshot or live)", ("view", "source"))
+
+logger = logging.getLogger(__name__)
+
+_listeners_installed = False
+_schedule_lock = threading.Lock()
+_timer = None
+_first_dirty = None
+_publish_lock = threading.Lock()
+_manifest_cache = {}
+
+class SnapshotError(Exception):
+    """Raised when a view cannot be rendered for a snapshot."""
+
+def snapshot_dir(app=None):
+    app = app or current_app
+    return app.config.get("SNAPSHOT_DIR") or os.path.join(app.instance_path, "snapshots")
+
+def _database_id(app):
+    # Snapshots of one database are never served for another sharing the directory
+    return hashlib.sha256(app.config["SQLALCHEMY_DATABASE_URI"].encode("utf-8")).hexdigest()[:16]
+
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+def page_payload(view, rows, page, page_size):
+    """
+    One page of a view, shaped like the unpaged response.
+
+    Args:
+        view: View name in VIEWS
+        rows: All rows of the view
+        page: 1-based page number
+        page_size: Rows per page
+
+    Returns:
+        A list for bare-list views, otherwise the view's envelope with
+        ``page``, ``page_size`` and ``pages`` added
+    """
+    chunk = rows[(page - 1) * page_size:page * page_size]
+    key = VIEWS[view][2]
+    if key is None:
+        return chunk
+    return {
+        "success": True,
+        key: chunk,
+        "total_count": len(rows),
+        "page": page,
+        "page_size": page_size,
+        "pages": page_count(len(rows), page_size),
+    }
+
+def _render(app, view, verify_since=None):
+    """
+    Run the view function and return (body bytes, parsed JSON, verified
+    chain state or None); ``verify_since`` lets the verify view resume.
+    """
+    endpoint, path = VIEWS[view][:2]
+    with app.test_request_context(path):
+        g.snapshot_render = True
+        g.snapshot_verify_since = verify_since
+        try:
+            response = app.make_response(app.view_functions[endpoint]())
+            verified = g.get("snapshot_verified")
+        finally:
+            # g is the publishing app context's; leave it as it was
+            for name in ("snapshot_render", "snapshot_verify_since", "snapshot_verified"):
+                g.pop(name, None)
+    if response.status_code != 200:
+        raise SnapshotError(f"{path} returned {response.status_code}")
+    body = response.get_data()
+    return body, json.loads(body), verified
+
+def _write_gzip(path, body):
+    with gzip.open(path, "wb", compresslevel=6) as f:
+        f.write(body)
+    return os.path.getsize(path)
+
+def _digest(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+def _reuse(directory, previous, view, page, digest, path):
+    """Hard-link an identical page of the previous generation to ``path``; False if there is none."""
+    entry = previous["views"].get(view) if previous else None
+    digests = entry.get("digests", []) if entry else []
+    if page > len(digests) or digests[page - 1] != digest:
+        return False
+    try:
+        os.link(os.path.join(directory, previous["generation"], f"{view}.{page}.json.gz"), path)
+    except OSError:
+        return False
+    return True
+
+def _head():
+    last_tx = Transaction.query.order_by(Transaction.created_at.desc()).first()
+    return {
+        "head_hash": last_tx.current_hash if last_tx else None,
+        "head_transaction_id": last_tx.transaction_id if last_tx else None,
+    }
+
+def _write_manifest(directory, manifest):
+    tmp = os.path.join(directory, f".{MANIFEST}.{os.getpid()}.{threading.get_ident()}")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+def _prune(directory, keep):
+    generations = sorted(
+        name for name in os.listdir(directory)
+        if os.path.isdir(os.path.join(directory, name)) and not name.startswith(".")
+    )
+    for name in generations[:-keep] if keep else generations:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+@contextmanager
+def _exclusive(directory):
+    """Serialize publishes across threads and, where flock exists, processes."""
+    with _publish_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def publish(app=None):
+    """
+    Render every public view and atomically switch to the new snapshot.
+
+    Must be called inside an application context (or be given the app).
+
+    Returns:
+        The new manifest
+    """
+    app = app or current_app._get_current_object()
+    directory = snapshot_dir(app)
+    page_size = int(app.config.get("SNAPSHOT_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    generation = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+    staging = os.path.join(directory, "." + generation)
+    os.makedirs(staging)
+    try:
+        views = {}
+        verified = None
+        with _exclusive(directory):
+            previous = load_manifest(app)
+            # Pages are only reused from a generation cut into pages of the same size
+            if previous and any(e.get("page_size") not in (None, page_size) for e in previous["views"].values()):
+                previous = None
+            # Head first: rows written while rendering make the head stale, never ahead of the files
+            head = _head()
+            for view, spec in VIEWS.items():
+                body, data, state = _render(app, view, previous.get("verified") if previous else None)
+                verified = state or verified
+                entry = {"file": f"{view}.json.gz", "bytes": _write_gzip(os.path.join(staging, f"{view}.json.gz"), body)}
+                if len(spec) > 2:
+                    rows = data if spec[2] is None else data[spec[2]]
+                    entry.update(items=len(rows), page_size=page_size, pages=page_count(len(rows), page_size),
+                                 digests=[], reused_pages=0)
+                    for page in range(1, entry["pages"] + 1):
+                        page_body = app.json.response(page_payload(view, rows, page, page_size)).get_data()
+                        digest = _digest(page_body)
+                        path = os.path.join(staging, f"{view}.{page}.json.gz")
+                        if _reuse(directory, previous, view, page, digest, path):
+                            entry["reused_pages"] += 1
+                        else:
+                            _write_gzip(path, page_body)
+                        entry["digests"].append(digest)
+                views[view] = entry
+            manifest = {
+                "generation": generation,
+                "generated_at": datetime.utcnow().isoformat(),
+                "database": _database_id(app),
+                **head,
+                "views": views,
+            }
+            if verified:
+                manifest["verified"] = verified
+            os.rename(staging, os.path.join(directory, generation))
+            _write_manifest(directory, manifest)
+            _prune(directory, KEEP_GENERATIONS)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        SNAPSHOT_PUBLISHES.inc(result="error")
+        raise
+    SNAPSHOT_PUBLISHES.inc(result="ok")
+    SNAPSHOT_PUBLISH_DURATION.observe(time.perf_counter() - started)
+    return manifest
+
+def discard(app=None):
+    """Stop serving snapshots until the next publish (public reads go live)."""
+    app = app or current_app
+    try:
+        os.remove(os.path.join(snapshot_dir(app), MANIFEST))
+    except FileNotFoundError:
+        pass
+
+def load_manifest(app=None):
+    """Current manifest for this app's database, or None. Re-read only when the file changes."""
+    app = app or current_app
+    path = os.path.join(snapshot_dir(app), MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _manifest_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path) as f:
+                cached = (mtime, json.load(f))
+        except (OSError, ValueError):
+            return None
+        _manifest_cache[path] = cached
+    manifest = cached[1]
+    return manifest if manifest.get("database") == _database_id(app) else None
+
+def snapshot_response(view, page=None):
+    """
+    Serve a public view from the current snapshot.
+
+    Args:
+        view: View name in VIEWS
+        page: 1-based page number, or None for the whole view
+
+    Returns:
+        A ``send_file`` response, or None when the caller must answer live
+        (snapshots disabled or not published yet, or the view is being rendered)
+    """
+    app = current_app
+    if g.get("snapshot_render") or not app.config.get("PUBLIC_SNAPSHOTS", True):
+        return None
+    manifest = load_manifest(app)
+    entry = manifest and manifest["views"].get(view)
+    if not entry:
+        SNAPSHOT_READS.inc(view=view, source="live")
+        return None
+    if page is None:
+        name = entry["file"]
+    elif "pages" in entry and 1 <= page <= entry["pages"]:
+        name = f"{view}.{page}.json.gz"
+    else:
+        return None
+    path = os.path.join(snapshot_dir(app), manifest["generation"], name)
+    etag = f"{manifest['generation']}-{name}"
+    if "gzip" not in request.accept_encodings:
+        etag += "-identity"
+    try:
+        if "gzip" in request.accept_encodings:
+            response = send_file(path, mimetype="application/json", etag=etag, max_age=0)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            # Rare (browsers and HTTP libraries send gzip): inflate in memory
+            with gzip.open(path, "rb") as f:
+                body = io.BytesIO(f.read())
+            response = send_file(body, mimetype="application/json", etag=etag, max_age=0)
+    except FileNotFoundError:
+        # Pruned by a newer publish between reading the manifest and opening
+        SNAPSHOT_READS.inc(view=view, source="live")
+        return None
+    response.headers.pop("Content-Disposition", None)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["X-Snapshot-Generated-At"] = manifest["generated_at"]
+    if manifest.get("head_hash"):
+        response.headers["X-Ledger-Head"] = manifest["head_hash"]
+    SNAPSHOT_READS.inc(view=view, source="snapshot")
+    return response
+
+def _publish_later(app):
+    global _timer, _first_dirty
+    with _schedule_lock:
+        _timer = None
+        _first_dirty = None
+    try:
+        with app.app_context():
+            publish(app)
+    except Exception:
+        logger.exception("Snapshot publish failed; serving public views live")
+        discard(app)
+
+def schedule_publish(app=None):
+    """
+    Publish after SNAPSHOT_DEBOUNCE quiet seconds, but no later than
+    SNAPSHOT_MAX_DELAY seconds after the first unpublished write.
+    """
+    global _timer, _first_dirty
+    app = app or current_app._get_current_object()
+    debounce = float(app.config.get("SNAPSHOT_DEBOUNCE", DEFAULT_DEBOUNCE))
+    max_delay = float(app.config.get("SNAPSHOT_MAX_DELAY", DEFAULT_MAX_DELAY))
+    with _schedule_lock:
+        now = time.monotonic()
+        if _first_dirty is None:
+            _first_dirty = now
+        if _timer is not None:
+            _timer.cancel()
+        _timer = threading.Timer(min(debounce, max(0.0, _first_dirty + max_delay - now)), _publish_later, (app,))
+        _timer.name = "snapshot-publisher"
+        _timer.start()
+
+def _mark_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if getattr(obj, "__tablename__", None) in SOURCE_TABLES:
+            session.info["snapshots_stale"] = True
+            return
+
+def _mark_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if getattr(table, "name", None) in SOURCE_TABLES:
+            orm_execute_state.session.info["snapshots_stale"] = True
+
+def _after_commit(session):
+    if session.info.pop("snapshots_stale", False) and has_app_context() \
+            and current_app.config.get("PUBLIC_SNAPSHOTS", True):
+        schedule_publish()
+
+def _after_rollback(session):
+    session.info.pop("snapshots_stale", None)
+
+def install_snapshot_publisher():
+    """Republish snapshots after committed writes to the public views' tables (idempotent)."""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Session, "after_flush", _mark_flush)
+        event.listen(Session, "do_orm_execute", _mark_execute)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", lambda session, previous: _after_rollback(session))
+        _listeners_installed = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish or discard the public ledger snapshots")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--publish", action="store_true", help="Render and publish all views now")
+    group.add_argument("--discard", action="store_true", help="Serve the public views live until the next publish")
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        if args.discard:
+            discard()
+            print("Snapshots discarded")
+            return
+        manifest = publish()
+        for view, entry in manifest["views"].items():
+            pages = f", {entry['pages']} page(s), {entry['reused_pages']} reused" if "pages" in entry else ""
+            print(f"{view}: {entry['bytes']} bytes gzip{pages}")
+        print(f"Published generation {manifest['generation']} (head {manifest['head_hash']})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Shared fixtures: a fresh SQLite ledger per test, seeded with bench_data.
+
+Run from backend/:
+    python -m pytest -q
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, DEFAULT_ADMIN_EMAIL
+from bench_data import seed_database
+from dashboard import invalidate_summary
+from local_auth import generate_token
+from models import db, User, UserRole
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'ledger.db'}",
+        "PUBLIC_SNAPSHOTS": False,
+        "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        "RATE_LIMIT_STORE": "memory",
+        "FEEDBACK_BUFFER": False,
+        "CACHE_BACKEND": "none",
+        "LEDGER_VERIFY_WORKERS": 1,
+    })
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    invalidate_summary()
+
+@pytest.fixture
+def seeded(app):
+    """Row counts of a small synthetic ledger (see bench_data.seed_database)."""
+    return seed_database(departments=4, depth=2, users=8, transactions=400, feedback=60)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin_headers(seeded):
+    admin = User.query.filter_by(email=DEFAULT_ADMIN_EMAIL, role=UserRole.Admin).one()
+    return {"Authorization": f"Bearer {generate_token(str(admin.user_id), admin.email)}"}
@@ -0,0 +1,35 @@
+import pytest
+
+from approvals import prepare_approval, complete_approval, ApprovalError
+from models import db, Department, Transaction, TransactionStatus, User
+
+@pytest.fixture
+def pending(seeded):
+    tx = Transaction.query.filter_by(status=TransactionStatus.Pending).first()
+    return tx.transaction_id, db.session.get(Department, tx.dept_id)
+
+def test_head_approves_and_settles(pending):
+    tx_id, dept = pending
+    assert prepare_approval(dept.head_user_id, tx_id)["amount"] is not None
+    complete_approval(dept.head_user_id, tx_id, "0xabc")
+    tx = db.session.get(Transaction, tx_id)
+    assert (tx.status, tx.blockchain_hash) == (TransactionStatus.Settled, "0xabc")
+
+def test_head_change_takes_effect_at_once(pending):
+    tx_id, dept = pending
+    head = dept.head_user_id
+    dept.head_user_id = User.query.filter(User.user_id != head).first().user_id
+    db.session.commit()
+    with pytest.raises(ApprovalError) as error:
+        prepare_approval(head, tx_id)
+    assert error.value.status == 403
+
+def test_rejection_during_anchoring_wins(pending):
+    tx_id, dept = pending
+    prepare_approval(dept.head_user_id, tx_id)
+    # Committed by another connection while the anchor call was in flight
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE transactions SET status = 'Rejected' WHERE transaction_id = ?", (tx_id,))
+    with pytest.raises(ApprovalError) as error:
+        complete_approval(dept.head_user_id, tx_id, "0xabc")
+    assert error.value.status == 409
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from anomaly import rescore_all
+from models import db, Department, Transaction, TransactionStatus, is_anomalous
+from rollups import exceeds_budget, department_balance
+
+def _reasons(tx):
+    return (tx.anomaly_reasons or "").split(",")
+
+def _create(client, headers, dept_id, amount):
+    response = client.post("/api/transactions", headers=headers,
+                           json={"dept_id": dept_id, "amount": amount, "purpose": "Budget test"})
+    assert response.status_code == 201, response.get_json()
+    return db.session.get(Transaction, response.get_json()["transaction_id"])
+
+@pytest.fixture
+def small_department(seeded):
+    dept = Department(name="Budget Test", allocated_budget=1000)
+    db.session.add(dept)
+    db.session.commit()
+    return dept.dept_id
+
+def test_exceeds_budget_matches_on_scalars_and_arrays():
+    assert exceeds_budget(600, 500, 1000)
+    assert not exceeds_budget(600, 400, 1000)
+    assert not exceeds_budget(0, 0, 0)
+    result = exceeds_budget(np.array([600.0, 600.0]), np.array([500.0, 400.0]), np.array([1000.0, 1000.0]))
+    assert result.tolist() == [True, False]
+
+def test_write_path_and_rescore_agree_on_overruns(client, admin_headers, small_department):
+    settled = _create(client, admin_headers, small_department, 600)
+    settled.status = TransactionStatus.Settled
+    db.session.commit()
+    assert department_balance(small_department) == pytest.approx(600)
+
+    over = _create(client, admin_headers, small_department, 500)
+    within = _create(client, admin_headers, small_department, 300)
+    assert (over.status, over.anomaly) == (TransactionStatus.Rejected, True)
+    assert (within.status, within.anomaly) == (TransactionStatus.Pending, False)
+
+    rescore_all()
+    db.session.expire_all()
+    assert "budget_overrun" in _reasons(db.session.get(Transaction, over.transaction_id))
+    assert "budget_overrun" not in _reasons(db.session.get(Transaction, within.transaction_id))
+
+def test_rescore_agrees_with_seeded_write_path_flags(seeded):
+    rescore_all()
+    disagreements = [
+        tx.transaction_id for tx in Transaction.query
+        if bool(tx.anomaly) != ("budget_overrun" in _reasons(tx))
+    ]
+    assert disagreements == []
+
+def test_rescore_never_clears_a_reviewed_flag(seeded):
+    rescore_all()
+    tx = next(tx for tx in Transaction.query.order_by(Transaction.transaction_id) if not is_anomalous(tx))
+    tx.anomaly = True
+    db.session.commit()
+
+    rescore_all({"zscore": 1e9})
+    db.session.expire_all()
+    tx = db.session.get(Transaction, tx.transaction_id)
+    assert tx.anomaly is True
+    assert is_anomalous(tx)
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import func
+
+import dashboard
+from dashboard import department_balances, cached_summary
+from models import db, Department, Transaction, TransactionStatus, Feedback
+from query_metrics import query_budget
+from rollups import settled_totals
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+def test_settled_totals_match_the_ledger():
+    settled = Transaction.status.in_([TransactionStatus.Settled, TransactionStatus.Approved])
+    received, sent = defaultdict(float), defaultdict(float)
+    for dept_id, amount in db.session.query(Transaction.dept_id, func.sum(Transaction.amount)).filter(settled).group_by(Transaction.dept_id):
+        received[dept_id] += float(amount)
+    for user_id, amount in db.session.query(Transaction.created_by_id, func.sum(Transaction.amount)).filter(settled).group_by(Transaction.created_by_id):
+        sent[user_id] += float(amount)
+
+    rollup_received, rollup_sent = settled_totals()
+    assert rollup_received == pytest.approx(dict(received))
+    assert rollup_sent == pytest.approx(dict(sent))
+
+def test_balances_read_a_fixed_number_of_queries():
+    with query_budget(4):
+        result = department_balances()
+    assert len(result["departments"]) == Department.query.count()
+
+def test_feedback_keeps_the_summary_cache(app, client):
+    app.config["DASHBOARD_CACHE_TTL"] = 3600
+    cached_summary()
+    tx_id = Transaction.query.first().transaction_id
+
+    assert client.post(f"/api/feedback/{tx_id}", json={"comment": "Looks right"}).status_code == 201
+    assert dashboard._cache
+
+    db.session.add(Feedback(transaction_id=tx_id, comment="Another one"))
+    db.session.commit()
+    assert dashboard._cache
+
+    dept = Department.query.first()
+    dept.allocated_budget = float(dept.allocated_budget) + 1
+    db.session.commit()
+    assert not dashboard._cache
+
+def _pages(client, headers, **filters):
+    ids, cursor, totals = [], None, None
+    while True:
+        query = dict(filters, limit=50, **({"cursor": cursor} if cursor else {}))
+        body = client.get("/api/transactions", query_string=query, headers=headers).get_json()
+        assert body["success"], body
+        ids += [int(tx["transaction_id"]) for tx in body["transactions"]]
+        totals = totals or body["totals"]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids, totals
+
+def test_transaction_list_pages_through_filtered_rows(client, admin_headers):
+    ids, totals = _pages(client, admin_headers, status="Pending", min_amount=100)
+    expected = [tx.transaction_id for tx in Transaction.query
+                .filter(Transaction.status == TransactionStatus.Pending, Transaction.amount >= 100)
+                .order_by(Transaction.created_at.desc(), Transaction.transaction_id.desc())]
+    assert ids == expected
+    assert totals["transaction_count"] == totals["pending_count"] == len(expected)
+
+def test_transaction_list_unfiltered_has_no_totals(client, admin_headers):
+    ids, totals = _pages(client, admin_headers)
+    assert len(ids) == Transaction.query.count()
+    assert totals is None
+
+@pytest.mark.parametrize("params", [{"status": "Lost"}, {"special": "odd"}, {"min_amount": "lots"}, {"cursor": "%%"}])
+def test_transaction_list_rejects_bad_parameters(client, admin_headers, params):
+    assert client.get("/api/transactions", query_string=params, headers=admin_headers).status_code == 400
@@ -0,0 +1,54 @@
+import pytest
+
+from ledger_archive import archive_before, check_segments, iter_archived_transactions, read_segment_feedback, ArchiveError
+from ledger_chain import verify_ledger
+from models import db, Transaction, TransactionStatus, Feedback, FeedbackSummary, LedgerSegment
+from rollups import settled_totals
+
+def _settle_oldest(count):
+    """Make the oldest rows archivable (archiving stops at the first pending row)."""
+    rows = Transaction.query.order_by(Transaction.created_at, Transaction.transaction_id).limit(count).all()
+    for tx in rows:
+        if tx.status not in (TransactionStatus.Settled, TransactionStatus.Rejected):
+            tx.status = TransactionStatus.Settled
+    db.session.commit()
+    return rows[-1].created_at
+
+def test_archive_moves_rows_and_their_dependents(seeded):
+    cutoff = _settle_oldest(151)
+    archived_ids = [tx_id for (tx_id,) in db.session.query(Transaction.transaction_id)
+                    .filter(Transaction.created_at < cutoff)]
+    comments = Feedback.query.filter(Feedback.transaction_id.in_(archived_ids)).count()
+
+    written = archive_before(cutoff, segment_size=50)
+
+    assert sum(s["rows"] for s in written) == len(archived_ids) == 150
+    assert len(written) == 3
+    assert Transaction.query.count() == seeded["transactions"] - 150
+    assert Feedback.query.filter(Feedback.transaction_id.in_(archived_ids)).count() == 0
+    assert FeedbackSummary.query.filter(FeedbackSummary.transaction_id.in_(archived_ids)).count() == 0
+    assert sum(len(read_segment_feedback(s)) for s in LedgerSegment.query) == comments
+    assert [tx.transaction_id for tx in iter_archived_transactions()] == sorted(archived_ids)
+
+def test_archived_chain_still_verifies(seeded):
+    archive_before(_settle_oldest(101), segment_size=40)
+    assert check_segments() == 3
+    assert verify_ledger()["total_transactions"] == seeded["transactions"]
+
+def test_archiving_keeps_balances(seeded):
+    cutoff = _settle_oldest(121)
+    before = settled_totals()
+    archive_before(cutoff)
+    after = settled_totals()
+    for side_before, side_after in zip(before, after):
+        assert side_before.keys() == side_after.keys()
+        for key, amount in side_before.items():
+            assert side_after[key] == pytest.approx(amount)
+
+def test_tampered_segment_fails_its_seal(seeded):
+    archive_before(_settle_oldest(61), segment_size=30)
+    segment = LedgerSegment.query.order_by(LedgerSegment.segment_id).first()
+    segment.merkle_root = "0" * 64
+    db.session.commit()
+    with pytest.raises(ArchiveError, match="does not match its seal"):
+        check_segments()
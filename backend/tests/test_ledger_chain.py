@@ -0,0 +1,77 @@
+import pytest
+
+import ledger_chain
+from ledger_chain import verify_ledger, migrate_to_sharded, write_checkpoint, ChainError
+from models import db, Department, Transaction
+
+def _create(client, headers, dept_id, amount=10):
+    response = client.post("/api/transactions", headers=headers,
+                           json={"dept_id": dept_id, "amount": amount, "purpose": "Test spend"})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+def _newest():
+    return Transaction.query.order_by(Transaction.created_at.desc(), Transaction.transaction_id.desc()).first()
+
+def _tamper(transaction_id):
+    db.session.execute(db.text("UPDATE transactions SET amount = amount + 1 WHERE transaction_id = :id"),
+                       {"id": transaction_id})
+    db.session.commit()
+
+def test_seeded_chain_verifies(seeded):
+    result = verify_ledger()
+    assert result["mode"] == "single"
+    assert result["total_transactions"] == seeded["transactions"]
+    assert result["head_hash"] == _newest().current_hash
+
+def test_created_transactions_extend_the_chain(client, admin_headers, seeded):
+    dept_id = Department.query.first().dept_id
+    head = _newest().current_hash
+    created = [_create(client, admin_headers, dept_id) for _ in range(3)]
+
+    first = db.session.get(Transaction, created[0]["transaction_id"])
+    assert first.previous_hash == head
+    assert verify_ledger()["total_transactions"] == seeded["transactions"] + 3
+
+def test_tampered_row_fails_verification(seeded):
+    _tamper(Transaction.query.order_by(Transaction.created_at).offset(100).first().transaction_id)
+    with pytest.raises(ChainError, match="Hash mismatch"):
+        verify_ledger()
+
+def test_sharded_mode_verifies_shards_and_checkpoints(client, admin_headers, seeded):
+    migrate_to_sharded()
+    dept_ids = [d.dept_id for d in Department.query.limit(2)]
+    for dept_id in dept_ids:
+        _create(client, admin_headers, dept_id)
+        _create(client, admin_headers, dept_id)
+    assert write_checkpoint() is not None
+    assert write_checkpoint() is None  # Nothing changed since
+
+    result = verify_ledger()
+    assert result["mode"] == "sharded"
+    assert result["shards"] == 2
+    assert result["checkpoints"] == 2
+    assert result["total_transactions"] == seeded["transactions"] + 4
+
+    with pytest.raises(ChainError, match="already in sharded mode"):
+        migrate_to_sharded()
+
+def test_resumed_verification_hashes_only_new_rows(client, admin_headers, seeded, monkeypatch):
+    first = verify_ledger()
+    _create(client, admin_headers, Department.query.first().dept_id)
+
+    checked = []
+    verify_chain = ledger_chain.verify_chain
+    monkeypatch.setattr(ledger_chain, "verify_chain", lambda rows, genesis=None: checked.append(
+        verify_chain(rows, genesis)) or checked[-1])
+    result = verify_ledger(since=first["verified"])
+
+    assert [count for count, _, _ in checked] == [1]
+    assert result["total_transactions"] == seeded["transactions"] + 1
+    assert result["head_transaction_id"] == _newest().transaction_id
+
+def test_resumed_verification_rechecks_a_changed_head(seeded):
+    first = verify_ledger()
+    _tamper(first["head_transaction_id"])
+    with pytest.raises(ChainError):
+        verify_ledger(since=first["verified"])
@@ -0,0 +1,30 @@
+import pytest
+
+from models import Transaction
+from ratelimit import limiter_from_config
+
+@pytest.fixture
+def limited_app(app):
+    # Limits are read when the limiter is built, so rebuild it with a tight one
+    app.config["RATE_LIMIT_FEEDBACK"] = "2/minute"
+    app.extensions["rate_limiter"] = limiter_from_config(app)
+    return app
+
+def test_feedback_is_limited_per_client(limited_app, seeded):
+    client = limited_app.test_client()
+    tx_id = Transaction.query.first().transaction_id
+    statuses = [client.post(f"/api/feedback/{tx_id}", json={"comment": "Hello"}).status_code for _ in range(3)]
+    assert statuses == [201, 201, 429]
+
+    other = client.post(f"/api/feedback/{tx_id}", json={"comment": "Hello"},
+                        environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert other.status_code == 201
+
+def test_rejection_carries_retry_after(limited_app, seeded):
+    client = limited_app.test_client()
+    tx_id = Transaction.query.first().transaction_id
+    for _ in range(2):
+        client.post(f"/api/feedback/{tx_id}", json={"comment": "Hello"})
+    response = client.post(f"/api/feedback/{tx_id}", json={"comment": "Hello"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,53 @@
+import pytest
+
+from models import Department
+from search import search_supported
+
+pytestmark = pytest.mark.usefixtures("seeded")
+
+def _key(item):
+    return item["type"], item["transaction_id"], item.get("feedback_id")
+
+def _all_pages(client, limit, **params):
+    items, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=limit, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/api/search", query_string=query)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        items += body["results"]
+        pages += 1
+        cursor = body["next_cursor"]
+        if not cursor:
+            return items, pages
+
+@pytest.fixture(autouse=True)
+def _requires_fts(app):
+    if not search_supported():
+        pytest.skip("search needs SQLite FTS5")
+
+def test_cursor_pages_cover_every_result_once(client):
+    small, pages = _all_pages(client, 7, q="purchase")
+    large, _ = _all_pages(client, 100, q="purchase")
+
+    assert pages > 2
+    assert len({_key(item) for item in small}) == len(small)
+    assert [_key(item) for item in small] == [_key(item) for item in large]
+    assert all("purchase" in item["text"].lower() for item in small)
+
+def test_filters_apply_on_every_page(client):
+    items, _ = _all_pages(client, 5, q="purchase", status="Pending", type="transaction")
+    assert items
+    assert all(item["status"] == "Pending" and item["type"] == "transaction" for item in items)
+
+def test_new_transactions_are_searchable(client, admin_headers):
+    client.post("/api/transactions", headers=admin_headers,
+                json={"dept_id": Department.query.first().dept_id, "amount": 5, "purpose": "Zeppelin charter"})
+    items, _ = _all_pages(client, 10, q="zeppel")
+    assert [item["purpose"] for item in items] == ["Zeppelin charter"]
+
+@pytest.mark.parametrize("params", [{"q": "purchase", "cursor": "not-a-cursor"}, {"q": "  "}, {"q": "x", "from": "soon"}])
+def test_bad_parameters_are_rejected(client, params):
+    response = client.get("/api/search", query_string=params)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
@@ -0,0 +1,181 @@
+"""
+Filtered, keyset-paginated transaction list for the admin dashboard table.
+
+The dashboard used to download the whole public feed and filter it in
+the browser. Here the same filters (text search, amount range, sender,
+receiver, status and the anomaly/settled/rejected shortcuts) run in SQL,
+rows come newest first in ``(created_at, transaction_id)`` keyset pages
+through the created_at index, and sender names are resolved in the same
+query as in inbox.py. Filtered totals for the stat cards are only
+computed when a filter is given; unfiltered totals come from the
+dashboard summary.
+
+    GET /api/transactions?status=Pending&min_amount=100&limit=20
+    GET /api/transactions?...&cursor=<next_cursor>
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, case, func, select
+
+from models import db, User, Department, Transaction, UserRole, TransactionStatus, is_anomalous
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+FILTERS = ("q", "min_amount", "max_amount", "from", "to", "status", "special")
+SPECIAL_FILTERS = ("anomaly", "settled", "rejected")
+
+class TransactionListError(ValueError):
+    """Raised for invalid list parameters."""
+
+def encode_cursor(created_at, transaction_id):
+    raw = json.dumps([created_at.isoformat(), transaction_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, transaction_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise TransactionListError("Invalid cursor")
+
+def _amount(value, name):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise TransactionListError(f"{name} must be a number")
+
+def _sender_expression():
+    """SQL for the sending side as the public feed names it."""
+    headed = (
+        select(Department.name)
+        .where(Department.head_user_id == User.user_id)
+        .order_by(Department.name)
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    return case(
+        (User.role == UserRole.Admin, "Admin"),
+        (User.role == UserRole.DeptHead, func.coalesce(headed, User.name)),
+        else_=func.coalesce(User.name, "Unknown"),
+    )
+
+def _contains(column, text):
+    return func.lower(column).contains(text.lower(), autoescape=True)
+
+def _conditions(filters, sender, receiver):
+    anomalous = or_(Transaction.anomaly.is_(True), func.coalesce(Transaction.anomaly_score, 0) >= 1.0)
+    conditions = []
+    q = (filters.get("q") or "").strip()
+    if q:
+        conditions.append(or_(
+            _contains(Transaction.purpose, q),
+            _contains(sender, q),
+            _contains(receiver, q),
+            _contains(func.coalesce(Transaction.blockchain_hash, ""), q),
+        ))
+    if filters.get("min_amount") not in (None, ""):
+        conditions.append(Transaction.amount >= _amount(filters["min_amount"], "min_amount"))
+    if filters.get("max_amount") not in (None, ""):
+        conditions.append(Transaction.amount <= _amount(filters["max_amount"], "max_amount"))
+    if filters.get("from"):
+        conditions.append(_contains(sender, filters["from"]))
+    if filters.get("to"):
+        conditions.append(_contains(receiver, filters["to"]))
+    if filters.get("status"):
+        statuses = {s.value.lower(): s for s in TransactionStatus}
+        if filters["status"].lower() not in statuses:
+            raise TransactionListError(f"Unknown status {filters['status']!r}")
+        conditions.append(Transaction.status == statuses[filters["status"].lower()])
+    special = filters.get("special")
+    if special:
+        if special not in SPECIAL_FILTERS:
+            raise TransactionListError(f"special must be one of {', '.join(SPECIAL_FILTERS)}")
+        if special == "anomaly":
+            conditions.append(anomalous)
+        elif special == "settled":
+            conditions.append(Transaction.status == TransactionStatus.Settled)
+        else:
+            conditions.append(and_(Transaction.status == TransactionStatus.Rejected, ~anomalous))
+    return conditions
+
+def list_transactions(filters=None, limit=DEFAULT_LIMIT, cursor=None):
+    """
+    One page of transactions matching ``filters``, newest first.
+
+    Args:
+        filters: Dict with any of ``q``, ``min_amount``, ``max_amount``,
+            ``from``, ``to``, ``status`` and ``special`` (anomaly, settled
+            or rejected), as the dashboard filter bar sends them
+        limit: Page size (max 200)
+        cursor: ``next_cursor`` of the previous page
+
+    Returns:
+        Dict with ``transactions`` (in the /api/public/transactions format),
+        ``next_cursor`` and ``totals`` (count, volume and pending count of
+        all matching rows; None when no filter is given)
+
+    Raises:
+        TransactionListError: For a bad filter value, limit or cursor
+    """
+    filters = {name: value for name, value in (filters or {}).items() if name in FILTERS and value not in (None, "")}
+    try:
+        limit = max(1, min(int(limit), MAX_LIMIT))
+    except (TypeError, ValueError):
+        raise TransactionListError("limit must be a number")
+
+    sender = _sender_expression()
+    receiver = func.coalesce(Department.name, "Unknown")
+    conditions = _conditions(filters, sender, receiver)
+
+    def filtered(query):
+        query = (
+            query.outerjoin(User, User.user_id == Transaction.created_by_id)
+            .outerjoin(Department, Department.dept_id == Transaction.dept_id)
+        )
+        return query.filter(*conditions) if conditions else query
+
+    query = filtered(db.session.query(Transaction, sender.label("from_dept"), receiver.label("to_dept")))
+    if cursor:
+        created_at, transaction_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Transaction.created_at < created_at,
+            and_(Transaction.created_at == created_at, Transaction.transaction_id < transaction_id),
+        ))
+    rows = query.order_by(Transaction.created_at.desc(), Transaction.transaction_id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    totals = None
+    if filters:
+        count, volume, pending = filtered(db.session.query(
+            func.count(Transaction.transaction_id),
+            func.sum(Transaction.amount),
+            func.sum(case((Transaction.status == TransactionStatus.Pending, 1), else_=0)),
+        )).one()
+        totals = {"transaction_count": count, "total_volume": float(volume or 0), "pending_count": int(pending or 0)}
+
+    last = rows[-1][0] if rows else None
+    return {
+        "transactions": [{
+            "transaction_id": str(tx.transaction_id),
+            "amount": float(tx.amount),
+            "purpose": tx.purpose,
+            "fromDept": from_dept,
+            "toDept": to_dept,
+            "status": tx.status.value,
+            "created_at": tx.created_at.isoformat(),
+            "transaction_hash": tx.blockchain_hash,
+            "rejection_reason": tx.rejection_reason,
+            "anomaly": is_anomalous(tx),
+            "anomaly_score": tx.anomaly_score,
+            "anomaly_reasons": tx.anomaly_reasons,
+        } for tx, from_dept, to_dept in rows],
+        "next_cursor": encode_cursor(last.created_at, last.transaction_id) if has_more else None,
+        "totals": totals,
+    }
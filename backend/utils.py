@@ -1,4 +1,7 @@
 import hashlib
+import struct
+from datetime import datetime
+from decimal import Decimal
 
 def compute_transaction_hash(tx_data: dict, previous_hash: str) -> str:
     """
@@ -24,6 +27,107 @@ def compute_transaction_hash(tx_data: dict, previous_hash: str) -> str:
     )
     return hashlib.sha256(hash_input.encode('utf-8')).hexdigest()
 
+# Hash versions: 1 is the legacy concatenation above, 2 and 3 use the
+# canonical length-prefixed encoding with SHA-256 and BLAKE2b-256.
+LEGACY_HASH_VERSION = 1
+DEFAULT_HASH_VERSION = 2
+HASH_ALGORITHMS = {
+    2: hashlib.sha256,
+    3: lambda: hashlib.blake2b(digest_size=32),
+}
+HASH_VERSIONS = (LEGACY_HASH_VERSION,) + tuple(HASH_ALGORITHMS)
+
+# Fields fixed when a transaction is created. Status and approver change
+# on approval, after later rows have already linked to this hash.
+CANONICAL_FIELDS = ('dept_id', 'amount', 'purpose', 'created_by_id', 'invoice_url', 'created_at')
+
+_LENGTH = struct.Struct('>I')
+_NULL = b'\xff\xff\xff\xff'
+
+def _canonical_value(value) -> bytes:
+    if value is None:
+        return _NULL
+    if isinstance(value, str):
+        data = value.encode('utf-8')
+    elif isinstance(value, datetime):
+        data = value.isoformat(timespec='microseconds').encode('ascii')
+    elif isinstance(value, Decimal):
+        data = f"{value:.4f}".encode('ascii')
+    elif isinstance(value, (float, int)):
+        data = f"{Decimal(str(value)):.4f}".encode('ascii')
+    else:
+        data = str(value).encode('utf-8')
+    return _LENGTH.pack(len(data)) + data
+
+def canonical_encoding(tx_fields: dict, previous_hash: str, version: int) -> bytes:
+    """
+    Encode a transaction unambiguously for hashing.
+
+    Each value is a 4-byte big-endian length followed by its UTF-8 bytes
+    (None has its own marker), so no two field combinations share an
+    encoding. Amounts always carry four decimals and timestamps always
+    carry microseconds, whatever type the caller passes.
+
+    Args:
+        tx_fields: Dictionary with the CANONICAL_FIELDS values
+        previous_hash: Hash of the previous transaction in the chain
+        version: Hash version, prefixed to the encoding
+
+    Returns:
+        Encoded bytes
+    """
+    parts = [bytes((version,))]
+    parts.extend(_canonical_value(tx_fields[name]) for name in CANONICAL_FIELDS)
+    parts.append(_canonical_value(previous_hash or None))
+    return b''.join(parts)
+
+def hash_transaction(tx_fields: dict, previous_hash: str, version: int = DEFAULT_HASH_VERSION) -> str:
+    """
+    Hash a transaction with the given hash version.
+
+    Args:
+        tx_fields: Dictionary of transaction values; version 1 expects the
+            legacy string formatting used by compute_transaction_hash
+        previous_hash: Hash of the previous transaction in the chain
+        version: One of HASH_VERSIONS
+
+    Returns:
+        64-character hexadecimal digest
+    """
+    if version == LEGACY_HASH_VERSION:
+        return compute_transaction_hash(tx_fields, previous_hash)
+    try:
+        algorithm = HASH_ALGORITHMS[version]
+    except KeyError:
+        raise ValueError(f"Unknown hash version {version}")
+    digest = algorithm()
+    digest.update(canonical_encoding(tx_fields, previous_hash, version))
+    return digest.hexdigest()
+
+def recompute_transaction_hash(tx) -> str:
+    """
+    Recompute the stored hash of a transaction row with its own hash version.
+
+    Args:
+        tx: Transaction model, core row or archived row
+
+    Returns:
+        64-character hexadecimal digest
+    """
+    version = getattr(tx, 'hash_version', None) or LEGACY_HASH_VERSION
+    if version == LEGACY_HASH_VERSION:
+        return compute_transaction_hash({
+            "dept_id": str(tx.dept_id),
+            "amount": str(tx.amount),
+            "purpose": tx.purpose,
+            "status": tx.status.value,
+            "created_by_id": str(tx.created_by_id),
+            "approved_by_id": str(tx.approved_by_id) if tx.approved_by_id else None,
+            "invoice_url": tx.invoice_url,
+            "created_at": tx.created_at.isoformat()
+        }, tx.previous_hash)
+    return hash_transaction({name: getattr(tx, name) for name in CANONICAL_FIELDS}, tx.previous_hash, version)
+
 def hash_password(password: str) -> str:
     """
     Hash a password using SHA-256 with salt (simple implementation).
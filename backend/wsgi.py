@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Building the app does no database I/O; bootstrap a new database once with
+``flask --app app bootstrap`` before starting the server.
+"""
+
+from app import create_app
+
+app = create_app()
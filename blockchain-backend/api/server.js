@@ -66,6 +66,19 @@ const contractABI = [
         "stateMutability": "view",
         "type": "function"
     },
+    {
+        "anonymous": false,
+        "inputs": [
+            {"indexed": true, "internalType": "uint256", "name": "transactionId", "type": "uint256"},
+            {"indexed": false, "internalType": "string", "name": "fromDept", "type": "string"},
+            {"indexed": false, "internalType": "string", "name": "toDept", "type": "string"},
+            {"indexed": false, "internalType": "uint256", "name": "amount", "type": "uint256"},
+            {"indexed": false, "internalType": "string", "name": "purpose", "type": "string"},
+            {"indexed": false, "internalType": "uint256", "name": "timestamp", "type": "uint256"}
+        ],
+        "name": "TransactionRecorded",
+        "type": "event"
+    },
     {
         "inputs": [],
         "name": "getTransactionCount",
@@ -201,6 +214,157 @@ app.post('/api/transactions', async (req, res) => {
     }
 });
 
+// Add many transactions in one request. All records are submitted first
+// and then awaited together, so mining overlaps instead of running one
+// HTTP round trip and one confirmation wait per record.
+const MAX_BATCH = 500;
+
+app.post('/api/transactions/batch', async (req, res) => {
+    try {
+        const { transactions } = req.body;
+
+        if (!Array.isArray(transactions) || transactions.length === 0) {
+            return res.status(400).json({
+                success: false,
+                error: "transactions must be a non-empty array"
+            });
+        }
+        if (transactions.length > MAX_BATCH) {
+            return res.status(400).json({
+                success: false,
+                error: `At most ${MAX_BATCH} transactions per batch`
+            });
+        }
+
+        console.log(`📦 Adding batch of ${transactions.length} transactions...`);
+
+        // Each pending record is turned into a result right away so a
+        // failed confirmation never surfaces as an unhandled rejection
+        const toResult = (promise) => promise.then(
+            (receipt) => ({ success: true, transactionHash: receipt.transactionHash, gasUsed: receipt.gasUsed.toString() }),
+            (error) => ({ success: false, error: error.message })
+        );
+
+        const pending = [];
+        for (const item of transactions) {
+            const { fromDept, toDept, amount, purpose } = item || {};
+            if (!fromDept || !toDept || !amount || !purpose) {
+                pending.push({ success: false, error: "All fields are required: fromDept, toDept, amount, purpose" });
+                continue;
+            }
+            try {
+                const amountInWei = ethers.utils.parseUnits(amount.toString(), 18);
+                // Await submission only (keeps nonces in order), not mining
+                const tx = await contract.addTransaction(fromDept, toDept, amountInWei, purpose);
+                pending.push(toResult(tx.wait()));
+            } catch (error) {
+                pending.push({ success: false, error: error.message });
+            }
+        }
+
+        const results = await Promise.all(pending);
+        const failed = results.filter((r) => !r.success).length;
+
+        console.log(`✅ Batch done: ${results.length - failed} added, ${failed} failed`);
+
+        res.json({
+            success: true,
+            count: results.length,
+            failed: failed,
+            results: results
+        });
+    } catch (error) {
+        console.error("❌ Error adding batch:", error.message);
+        res.status(500).json({
+            success: false,
+            error: error.message
+        });
+    }
+});
+
+// Look up anchored transactions by hash for reconciliation. Receipts are
+// fetched concurrently; each result carries the record decoded from the
+// contract's TransactionRecorded event so the caller can compare it with
+// its own copy.
+const MAX_RECEIPTS = 500;
+
+async function lookupReceipt(hash) {
+    try {
+        const receipt = await provider.getTransactionReceipt(hash);
+        if (!receipt) {
+            return { transactionHash: hash, found: false };
+        }
+        let record = null;
+        for (const log of receipt.logs) {
+            if (log.address.toLowerCase() !== contractAddress.toLowerCase()) continue;
+            try {
+                const event = contract.interface.parseLog(log);
+                if (event.name === 'TransactionRecorded') {
+                    record = {
+                        transactionId: event.args.transactionId.toString(),
+                        fromDept: event.args.fromDept,
+                        toDept: event.args.toDept,
+                        amount: ethers.utils.formatUnits(event.args.amount, 18),
+                        purpose: event.args.purpose
+                    };
+                    break;
+                }
+            } catch (error) {
+                // Not one of this contract's events
+            }
+        }
+        return {
+            transactionHash: hash,
+            found: true,
+            status: receipt.status,
+            blockNumber: receipt.blockNumber,
+            record: record
+        };
+    } catch (error) {
+        return { transactionHash: hash, found: false, error: error.message };
+    }
+}
+
+app.post('/api/receipts', async (req, res) => {
+    try {
+        const { hashes } = req.body;
+
+        if (!Array.isArray(hashes) || hashes.length === 0) {
+            return res.status(400).json({
+                success: false,
+                error: "hashes must be a non-empty array"
+            });
+        }
+        if (hashes.length > MAX_RECEIPTS) {
+            return res.status(400).json({
+                success: false,
+                error: `At most ${MAX_RECEIPTS} hashes per request`
+            });
+        }
+
+        const receipts = await Promise.all(hashes.map(lookupReceipt));
+        res.json({
+            success: true,
+            count: receipts.length,
+            receipts: receipts
+        });
+    } catch (error) {
+        console.error("❌ Error looking up receipts:", error.message);
+        res.status(500).json({
+            success: false,
+            error: error.message
+        });
+    }
+});
+
+app.get('/api/receipts/:hash', async (req, res) => {
+    const receipt = await lookupReceipt(req.params.hash);
+    res.status(receipt.found ? 200 : 404).json({
+        success: receipt.found,
+        receipt: receipt
+    });
+});
+
 // Get transaction count
 app.get('/api/stats', async (req, res) => {
     try {
@@ -232,6 +396,9 @@ async function startServer() {
         console.log(`   GET  /api/transactions`);
         console.log(`   GET  /api/transactions/:id`);
         console.log(`   POST /api/transactions`);
+        console.log(`   POST /api/transactions/batch`);
+        console.log(`   POST /api/receipts`);
+        console.log(`   GET  /api/receipts/:hash`);
         console.log(`   GET  /api/stats`);
         console.log("\n✅ Ready to serve requests!\n");
     });
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useContext } from 'react';
+import React, { useState, useEffect, useContext, useRef } from 'react';
 import {
   Container,
   Typography,
@@ -83,6 +83,11 @@ const AdminDashboard = () => {
   const [adminBalance, setAdminBalance] = useState(0);
   const [adminBudget, setAdminBudget] = useState(0);
   const [alerts, setAlerts] = useState([]);
+  const [totals, setTotals] = useState(null);
+  const [filteredTotals, setFilteredTotals] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const latestListRequest = useRef(0);
   // Form state for new transaction
   const [newTransaction, setNewTransaction] = useState({
     amount: '',
@@ -93,30 +98,70 @@ const AdminDashboard = () => {
   const [editBudgetDeptId, setEditBudgetDeptId] = useState(null);
 
   useEffect(() => {
-    fetchDashboardData();
+    fetchSummary();
   }, []);
 
+  // The table is filtered and paged on the server; refetch the first page
+  // shortly after the search box or a filter changes
+  useEffect(() => {
+    const timer = setTimeout(() => fetchTransactions(), 300);
+    return () => clearTimeout(timer);
+  }, [search, filters, currency]);
+
 
 const fetchDashboardData = async () => {
+  await Promise.all([fetchSummary(), fetchTransactions()]);
+};
+
+const fetchTransactions = async (cursor = null) => {
+  const requestId = ++latestListRequest.current;
+  const params = new URLSearchParams({ limit: '20' });
+  const q = search.trim();
+  if (q) params.set('q', q);
+  // Amounts are stored canonically in USD; convert entered min/max from selected currency to USD
+  if (filters.minAmount !== '' && !isNaN(Number(filters.minAmount))) params.set('min_amount', convertToUSD(Number(filters.minAmount), currency));
+  if (filters.maxAmount !== '' && !isNaN(Number(filters.maxAmount))) params.set('max_amount', convertToUSD(Number(filters.maxAmount), currency));
+  if (filters.from) params.set('from', filters.from);
+  if (filters.to) params.set('to', filters.to);
+  if (filters.status) params.set('status', filters.status);
+  if (filters.special) params.set('special', filters.special);
+  if (cursor) params.set('cursor', cursor);
   try {
-    // Fetch departments and transactions
-    const [deptResponse, transResponse] = await Promise.all([
-      makeAuthenticatedRequest('/api/departments'),
-      fetch('http://localhost:5000/api/public/transactions').then(res => res.json())
-    ]);
-    const balancesRes = await makeAuthenticatedRequest('/api/departments/balances');
-    if (balancesRes && balancesRes.success) {
-      setBalances(balancesRes.departments || []);
-      setAdminBalance(balancesRes.admin?.balance || 0);
-      setAdminBudget(balancesRes.admin?.budget || 0);
-      setAlerts(balancesRes.alerts || []);
+    const response = await makeAuthenticatedRequest(`/api/transactions?${params.toString()}`);
+    // Drop responses that a newer search or filter has overtaken
+    if (requestId !== latestListRequest.current) return;
+    if (response && response.success) {
+      setTransactions(prev => (cursor ? [...prev, ...response.transactions] : response.transactions));
+      setNextCursor(response.next_cursor || null);
+      setFilteredTotals(response.totals || null);
+    } else {
+      setError(response?.message || 'Failed to load transactions');
     }
+  } catch (error) {
+    console.error('Error fetching transactions:', error);
+    setError('Failed to load transactions');
+  }
+};
 
-    // FIX: departments API returns an array, not {departments: [...]}
-    setDepartments(Array.isArray(deptResponse) ? deptResponse : deptResponse.departments || []);
+const loadMoreTransactions = async () => {
+  setLoadingMore(true);
+  await fetchTransactions(nextCursor);
+  setLoadingMore(false);
+};
 
-    if (transResponse.success) {
-      setTransactions(transResponse.transactions || []);
+const fetchSummary = async () => {
+  try {
+    // The summary feeds the totals, departments and balances
+    const summary = await makeAuthenticatedRequest('/api/dashboard/summary');
+    if (summary && summary.success) {
+      setDepartments(summary.departments || []);
+      setBalances(summary.departments || []);
+      setAdminBalance(summary.admin?.balance || 0);
+      setAdminBudget(summary.admin?.budget || 0);
+      setAlerts(summary.alerts || []);
+      setTotals(summary.totals || null);
+    } else {
+      setError(summary?.message || 'Failed to load dashboard data');
     }
   } catch (error) {
     console.error('Error fetching dashboard data:', error);
@@ -288,31 +333,10 @@ const fetchDashboardData = async () => {
     }
   };
 
-  const applyFilters = (items) => {
-    return items.filter((t) => {
-      const q = (search || '').trim().toLowerCase();
-      if (q) {
-        const hay = `${t.purpose || ''} ${t.fromDept || ''} ${t.toDept || ''} ${t.transaction_hash || ''}`.toLowerCase();
-        if (!hay.includes(q)) return false;
-      }
-      // Amounts are stored canonically in USD; convert entered min/max from selected currency to USD before comparing
-      const amount = Number(t.amount || 0);
-      const minVal = filters.minAmount !== '' && !isNaN(Number(filters.minAmount)) ? convertToUSD(Number(filters.minAmount), currency) : null;
-      const maxVal = filters.maxAmount !== '' && !isNaN(Number(filters.maxAmount)) ? convertToUSD(Number(filters.maxAmount), currency) : null;
-      if (minVal !== null && amount < minVal) return false;
-      if (maxVal !== null && amount > maxVal) return false;
-      if (filters.from && !(t.fromDept || '').toLowerCase().includes(filters.from.toLowerCase())) return false;
-      if (filters.to && !(t.toDept || '').toLowerCase().includes(filters.to.toLowerCase())) return false;
-      if (filters.status && (String(t.status || '').toLowerCase() !== String(filters.status || '').toLowerCase())) return false;
-      // Unified special filter
-      if (filters.special === "anomaly" && !t.anomaly) return false;
-      if (filters.special === "settled" && String(t.status).toLowerCase() !== "settled") return false;
-      if (filters.special === "rejected" && (String(t.status).toLowerCase() !== "rejected" || t.anomaly)) return false;
-      return true;
-    });
-  };
-
-  const filtered = applyFilters(transactions);
+  // Cards show ledger-wide totals from the summary until a filter narrows
+  // the list, then the server's totals over every matching row
+  const hasActiveFilters = Boolean(search.trim()) || Object.values(filters).some(Boolean);
+  const cardTotals = hasActiveFilters ? filteredTotals : totals;
 
   // Small sparkline implementation
   const Sparkline = ({ data = [], width = 120, height = 36, stroke = theme.palette.mode === 'dark' ? '#7dd3fc' : '#1976d2' }) => {
@@ -575,7 +599,7 @@ const fetchDashboardData = async () => {
                   Blockchain Transactions
                 </Typography>
                 <Typography variant="h4" sx={{ color: theme.palette.mode === 'dark' ? '#7dd3fc' : 'primary.main' }}>
-                  {filtered.length}
+                  {cardTotals ? cardTotals.transaction_count : transactions.length}
                 </Typography>
               </CardContent>
             </Card>
@@ -593,7 +617,7 @@ const fetchDashboardData = async () => {
                   Total Volume
                 </Typography>
                 <Typography variant="h4" sx={{ color: theme.palette.mode === 'dark' ? '#a7f3d0' : 'success.main' }}>
-                  {formatCurrency(filtered.reduce((sum, t) => sum + (t.amount || 0), 0))}
+                  {formatCurrency(cardTotals ? cardTotals.total_volume : transactions.reduce((sum, t) => sum + (t.amount || 0), 0))}
                 </Typography>
               </CardContent>
             </Card>
@@ -627,7 +651,7 @@ const fetchDashboardData = async () => {
                   Pending Approvals
                 </Typography>
                 <Typography variant="h4" sx={{ color: theme.palette.mode === 'dark' ? '#fbbf24' : 'warning.main' }}>
-                  {filtered.filter(t => String(t.status || '').toLowerCase() === 'pending').length}
+                  {cardTotals ? cardTotals.pending_count : transactions.filter(t => String(t.status || '').toLowerCase() === 'pending').length}
                 </Typography>
               </CardContent>
             </Card>
@@ -802,7 +826,7 @@ const fetchDashboardData = async () => {
             Recent Transactions
           </Typography>
 
-          {filtered.length > 0 ? (
+          {transactions.length > 0 ? (
             <TableContainer sx={{
               borderRadius: 2,
               border: theme.palette.mode === 'dark' ? '1px solid rgba(255,255,255,0.08)' : '1px solid rgba(0,0,0,0.08)',
@@ -835,7 +859,7 @@ const fetchDashboardData = async () => {
                   </TableRow>
                 </TableHead>
                 <TableBody>
-                  {filtered.slice(0, 20).map((transaction) => (
+                  {transactions.map((transaction) => (
                     <TableRow key={transaction.transaction_id} hover sx={{ cursor: 'pointer', '&:hover': { backgroundColor: theme.palette.mode === 'dark' ? 'rgba(125,211,252,0.06)' : 'rgba(99,102,241,0.06)' } }} onClick={() => openDetail(transaction)}>
                       <TableCell>{formatDate(transaction.created_at)}</TableCell>
                       <TableCell>
@@ -866,6 +890,13 @@ const fetchDashboardData = async () => {
                   ))}
                 </TableBody>
               </Table>
+              {nextCursor && (
+                <Box textAlign="center" py={2}>
+                  <Button variant="outlined" size="small" disabled={loadingMore} onClick={loadMoreTransactions}>
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </Button>
+                </Box>
+              )}
             </TableContainer>
           ) : (
             <Box textAlign="center" py={4}>
@@ -206,6 +206,9 @@ const PublicTransactions = () => {
     setFeedbackInput('');
     setFeedbackError('');
     setFeedbackOpen(true);
+    // Always fetch: the feed's feedback_count may come from a snapshot that
+    // trails recent comments by a few seconds
+    setFeedbacks([]);
     setFeedbackLoading(true);
     try {
       const res = await fetch(`http://localhost:5000/api/feedback/${tx.transaction_id}`);
@@ -232,9 +235,18 @@ const PublicTransactions = () => {
       const data = await res.json();
       if (data.success) {
         setFeedbackInput('');
-        // Refresh feedbacks
-        const fres = await fetch(`http://localhost:5000/api/feedback/${feedbackTx.transaction_id}`);
-        setFeedbacks(await fres.json());
+        // 201 returns the stored comment; 202 means it is queued and not yet numbered
+        const added = data.feedback || {
+          feedback_id: `pending-${Date.now()}`,
+          comment: feedbackInput.trim(),
+          created_at: new Date().toISOString()
+        };
+        setFeedbacks(prev => [added, ...prev]);
+        setTransactions(prev => prev.map(t => (
+          t.transaction_id === feedbackTx.transaction_id
+            ? { ...t, feedback_count: (t.feedback_count || 0) + 1, latest_feedback: added }
+            : t
+        )));
         setFeedbackError('');
       } else {
         setFeedbackError(data.message || 'Failed to submit feedback.');
@@ -759,13 +771,15 @@ const PublicTransactions = () => {
                         </Box>
                       </TableCell>
                       <TableCell>
-                        <Button
-                          size="small"
-                          variant="outlined"
-                          onClick={e => { e.stopPropagation(); openFeedback(transaction); }}
-                        >
-                          Feedback
-                        </Button>
+                        <Tooltip title={transaction.latest_feedback ? transaction.latest_feedback.comment : 'No feedback yet'}>
+                          <Button
+                            size="small"
+                            variant="outlined"
+                            onClick={e => { e.stopPropagation(); openFeedback(transaction); }}
+                          >
+                            Feedback{transaction.feedback_count ? ` (${transaction.feedback_count})` : ''}
+                          </Button>
+                        </Tooltip>
                       </TableCell>
                     </TableRow>
                   ))}